@@ -0,0 +1,99 @@
+"""
+Проверка аренды действий несколькими процессами на локальной замене sc-памяти (SqliteActionClaimStore), без sc-сервера.
+Все процессы пытаются обработать одни и те же действия; каждое должно быть обработано ровно одним процессом.
+Затем процесс "падает", не сняв заявку, и его действие перехватывается только после истечения аренды.
+
+    python benchmarks/action_claims_check.py --processes 4 --actions 200
+"""
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from sc_client.models import ScAddr  # noqa: E402
+
+from search_module.action_claims import ActionClaims, SqliteActionClaimStore  # noqa: E402
+
+CRASHED_ACTION = 10 ** 6
+
+
+def process_actions(claims_path: str, processed_path: str, actions_count: int, work_time: float) -> None:
+    claims = ActionClaims(SqliteActionClaimStore(claims_path), lease=5.0)
+    processed = sqlite3.connect(processed_path, timeout=30.0, isolation_level=None)
+    for action in range(1, actions_count + 1):
+        lease = claims.acquire(ScAddr(action))
+        if lease is None:
+            continue
+        with lease:
+            # Как и CallAgent, процесс пропускает действие, которое уже завершил другой процесс
+            if processed.execute("SELECT 1 FROM processed WHERE action = ?", (action,)).fetchone():
+                continue
+            time.sleep(work_time)
+            processed.execute("INSERT INTO processed (action, owner) VALUES (?, ?)", (action, claims.owner))
+
+
+def crash_while_processing(claims_path: str, lease: float) -> None:
+    claims = ActionClaims(SqliteActionClaimStore(claims_path), lease=lease)
+    claims.acquire(ScAddr(CRASHED_ACTION))
+    os._exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--actions", type=int, default=200)
+    parser.add_argument("--work-time", type=float, default=0.001)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        claims_path = os.path.join(directory, "claims.sqlite")
+        processed_path = os.path.join(directory, "processed.sqlite")
+        SqliteActionClaimStore(claims_path).close()
+        processed = sqlite3.connect(processed_path, isolation_level=None)
+        processed.execute("CREATE TABLE processed (action INTEGER, owner TEXT)")
+
+        context = multiprocessing.get_context("spawn")
+        workers = [
+            context.Process(target=process_actions, args=(claims_path, processed_path, args.actions, args.work_time))
+            for _ in range(args.processes)
+        ]
+        started_at = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started_at
+
+        counts = Counter(action for action, in processed.execute("SELECT action FROM processed"))
+        owners = Counter(owner for owner, in processed.execute("SELECT owner FROM processed"))
+        duplicated = [action for action, count in counts.items() if count > 1]
+        missing = [action for action in range(1, args.actions + 1) if action not in counts]
+        print(f"{args.processes} processes, {args.actions} actions: {elapsed:.2f} s, "
+              f"processed by {len(owners)} processes, duplicated {len(duplicated)}, missing {len(missing)}")
+
+        lease = 0.5
+        crashed = context.Process(target=crash_while_processing, args=(claims_path, lease))
+        crashed.start()
+        crashed.join()
+        claims = ActionClaims(SqliteActionClaimStore(claims_path), lease=lease)
+        claimed_before_expiry = claims.acquire(ScAddr(CRASHED_ACTION)) is not None
+        time.sleep(lease * 1.5)
+        expired = claims.store.expired_actions(time.time())
+        claimed_after_expiry = claims.acquire(ScAddr(CRASHED_ACTION)) is not None
+        print(f"crashed claim: reclaimed before expiry {claimed_before_expiry}, listed as expired "
+              f"{[action.value for action in expired] == [CRASHED_ACTION]}, reclaimed after expiry {claimed_after_expiry}")
+
+        ok = not duplicated and not missing and not claimed_before_expiry and claimed_after_expiry
+        print("OK" if ok else "FAILED")
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Сравнение обхода и нумерации этапов схемы: прежний алгоритм на списке (in / order.index) и SchemeGraph.
+Схема синтетическая, без sc-сервера: линейная последовательность операций, где каждый BRANCH_STEP-й узел -
+выбор с переходом вперёд и возвратом назад.
+
+    python benchmarks/scheme_graph_benchmark.py --nodes 10000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from search_module.scheme_graph import SchemeGraph  # noqa: E402
+
+BRANCH_STEP = 7
+
+
+def make_scheme(nodes_count: int, seed: int = 0) -> dict[int, list[int]]:
+    rng = random.Random(seed)
+    successors = {}
+    for node in range(nodes_count):
+        next_nodes = [node + 1] if node + 1 < nodes_count else []
+        if node % BRANCH_STEP == 0 and 0 < node < nodes_count - 2:
+            next_nodes.append(rng.randrange(node + 2, min(node + 50, nodes_count)))
+            next_nodes.append(rng.randrange(max(0, node - 50), node))
+        successors[node] = next_nodes
+    return successors
+
+
+def render_with_list(start, successors) -> list[str]:
+    scheme_dict = {}
+    order = []
+    stack = [start]
+    while stack:
+        current_node = stack.pop()
+        if current_node in order:
+            continue
+        order.append(current_node)
+        next_nodes = successors[current_node]
+        scheme_dict[current_node] = next_nodes
+        stack += next_nodes
+
+    result_strings = []
+    for i, node in enumerate(order):
+        if next_nodes := scheme_dict[node]:
+            result_strings.append(f"{i}: -> {', '.join(str(order.index(next_node)) for next_node in next_nodes)};")
+        else:
+            result_strings.append(f"{i}: .")
+    return result_strings
+
+
+def render_with_graph(start, successors) -> list[str]:
+    graph = SchemeGraph.from_successors(start, successors.__getitem__)
+    order = graph.dfs_order()
+    positions = graph.positions(order)
+
+    result_strings = []
+    for i, node_id in enumerate(order):
+        if next_ids := graph.successors[node_id]:
+            result_strings.append(f"{i}: -> {', '.join(str(positions[next_id]) for next_id in next_ids)};")
+        else:
+            result_strings.append(f"{i}: .")
+    return result_strings
+
+
+def measure(function, *args, repeat: int = 3) -> tuple[float, list[str]]:
+    best_time, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        best_time = min(best_time, time.perf_counter() - started)
+    return best_time, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    successors = make_scheme(args.nodes)
+    list_time, list_result = measure(render_with_list, 0, successors, repeat=args.repeat)
+    graph_time, graph_result = measure(render_with_graph, 0, successors, repeat=args.repeat)
+
+    if list_result != graph_result:
+        raise SystemExit("Нумерация этапов различается")
+    print(f"Узлов: {args.nodes}, этапов в обходе: {len(graph_result)}")
+    print(f"Список (in, order.index): {list_time * 1000:.1f} мс")
+    print(f"SchemeGraph:              {graph_time * 1000:.1f} мс ({list_time / graph_time:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
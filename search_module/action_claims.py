@@ -0,0 +1,298 @@
+import os
+import time
+import uuid
+import random
+import socket
+import sqlite3
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable
+
+from sc_client.models import ScAddr, ScTemplate, ScLinkContent, ScLinkContentType
+from sc_client.constants import sc_types
+from sc_client.client import template_search, get_link_content, set_link_contents, erase_elements
+from sc_kpm import ScKeynodes, ScResult
+from sc_kpm.identifiers import ActionStatus
+from sc_kpm.utils import generate_link, generate_non_role_relation
+from sc_kpm.utils.action_utils import check_action_class
+
+from .search_module_idtfs import SearchModuleIdentifiers
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+# Срок аренды действия по умолчанию; владелец продлевает её каждые lease / LEASE_RENEW_FRACTION секунд
+DEFAULT_LEASE = 60.0
+LEASE_RENEW_FRACTION = 3
+
+
+def default_owner() -> str:
+    """Идентификатор экземпляра: хост, процесс и случайный суффикс"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class ActionClaimStore(ABC):
+    """
+    Хранилище заявок на обработку действий. Заявка действует до expires_at (время time.time());
+    просроченную заявку может перехватить другой экземпляр.
+    """
+
+    @abstractmethod
+    def try_claim(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        """Ставит заявку owner, если у действия нет действующей заявки другого владельца"""
+
+    @abstractmethod
+    def renew(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        """Продлевает заявку owner; False, если её уже нет"""
+
+    @abstractmethod
+    def release(self, action: ScAddr, owner: str) -> None:
+        """Снимает заявку owner"""
+
+    @abstractmethod
+    def discard(self, action: ScAddr) -> None:
+        """Снимает все заявки на действие"""
+
+    @abstractmethod
+    def expired_actions(self, now: float) -> list[ScAddr]:
+        """Действия, у которых есть заявки и все они просрочены"""
+
+
+class ScActionClaimStore(ActionClaimStore):
+    """
+    Заявки в sc-памяти: действие => sc-ссылка "владелец|expires_at" по отношению nrel_action_claim.
+    Атомарной операции "проверить и записать" у sc-сервера нет, поэтому заявка ставится так:
+    экземпляр записывает свою заявку и перечитывает заявки действия. Если видна чужая действующая заявка,
+    своя удаляется и попытка повторяется после случайной задержки. Из двух экземпляров тот, кто записал
+    заявку позже, обязательно увидит более раннюю, поэтому оба выиграть не могут.
+    После последней неудачной попытки своя заявка не удаляется: если проиграли все экземпляры, их заявки
+    истекут, и действие обработает фоновая проверка просроченных заявок (ActionClaims.start_reclaim).
+    """
+
+    def __init__(self, max_attempts: int = 5, backoff: float = 0.05):
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.lock = threading.Lock()
+        self.claim_links: dict[tuple[ScAddr, str], ScAddr] = {}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def try_claim(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        for attempt in range(self.max_attempts):
+            now = time.time()
+            if self._has_other_live_claims(action, owner, now):
+                return False
+
+            link = generate_link(f"{owner}|{expires_at}")
+            generate_non_role_relation(action, link, ScKeynodes[SearchModuleIdentifiers.NREL_ACTION_CLAIM])
+            if not self._has_other_live_claims(action, owner, now):
+                with self.lock:
+                    self.claim_links[(action, owner)] = link
+                return True
+
+            if attempt == self.max_attempts - 1:
+                # Без заявки действие не попало бы в expired_actions и осталось бы незавершённым
+                self.logger.warning("Claims on action %s kept colliding, leaving it to the reclaim pass", action)
+                return False
+
+            # Заявки поставлены одновременно: обе снимаются, экземпляры повторяют попытку в разное время
+            erase_elements(link)
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        return False
+
+    def renew(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        with self.lock:
+            link = self.claim_links.get((action, owner))
+        if link is None:
+            return False
+        return set_link_contents(ScLinkContent(f"{owner}|{expires_at}", ScLinkContentType.STRING, link))
+
+    def release(self, action: ScAddr, owner: str) -> None:
+        with self.lock:
+            link = self.claim_links.pop((action, owner), None)
+        if link is not None:
+            erase_elements(link)
+
+    def discard(self, action: ScAddr) -> None:
+        links = [link for _, link, _, _ in self.search_claims(action)]
+        if links:
+            erase_elements(*links)
+
+    def expired_actions(self, now: float) -> list[ScAddr]:
+        claims_by_action: dict[ScAddr, list[float]] = {}
+        for action, _, _, expires_at in self.search_claims():
+            claims_by_action.setdefault(action, []).append(expires_at)
+        return [action for action, expirations in claims_by_action.items() if max(expirations) < now]
+
+    def search_claims(self, action: ScAddr | None = None) -> list[tuple[ScAddr, ScAddr, str, float]]:
+        """Заявки действия (или всех действий, если action не задано): (действие, sc-ссылка, владелец, expires_at)"""
+        claim_template = ScTemplate()
+        claim_template.quintuple(
+            action if action is not None else sc_types.NODE_VAR >> 'action',
+            sc_types.EDGE_D_COMMON_VAR,
+            sc_types.LINK_VAR >> 'claim_link',
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            ScKeynodes[SearchModuleIdentifiers.NREL_ACTION_CLAIM],
+        )
+        search_results = template_search(claim_template)
+        if not search_results:
+            return []
+
+        links = [result.get('claim_link') for result in search_results]
+        claims = []
+        for result, link, content in zip(search_results, links, get_link_content(*links)):
+            owner, _, expires_at = str(content.data).rpartition("|")
+            try:
+                claims.append((action if action is not None else result.get('action'), link, owner, float(expires_at)))
+            except ValueError:
+                continue
+        return claims
+
+    def _has_other_live_claims(self, action: ScAddr, owner: str, now: float) -> bool:
+        other_live_claims = False
+        for _, link, claim_owner, expires_at in self.search_claims(action):
+            if expires_at < now:
+                # Просроченная заявка - экземпляр, который её поставил, завершился, не закончив действие
+                erase_elements(link)
+            elif claim_owner != owner:
+                other_live_claims = True
+        return other_live_claims
+
+
+class SqliteActionClaimStore(ActionClaimStore):
+    """
+    Заявки в таблице SQLite - локальная замена sc-памяти для нескольких процессов на одной машине.
+    Заявка ставится одним UPSERT, который перезаписывает только просроченную заявку.
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db = sqlite3.connect(db_path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS action_claims ("
+            "action INTEGER PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def try_claim(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        with self.lock:
+            self.db.execute(
+                "INSERT INTO action_claims (action, owner, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (action) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE action_claims.expires_at < ? OR action_claims.owner = excluded.owner",
+                (action.value, owner, expires_at, time.time()),
+            )
+            row = self.db.execute("SELECT owner FROM action_claims WHERE action = ?", (action.value,)).fetchone()
+        return row is not None and row[0] == owner
+
+    def renew(self, action: ScAddr, owner: str, expires_at: float) -> bool:
+        with self.lock:
+            cursor = self.db.execute(
+                "UPDATE action_claims SET expires_at = ? WHERE action = ? AND owner = ?",
+                (expires_at, action.value, owner),
+            )
+        return cursor.rowcount > 0
+
+    def release(self, action: ScAddr, owner: str) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM action_claims WHERE action = ? AND owner = ?", (action.value, owner))
+
+    def discard(self, action: ScAddr) -> None:
+        with self.lock:
+            self.db.execute("DELETE FROM action_claims WHERE action = ?", (action.value,))
+
+    def expired_actions(self, now: float) -> list[ScAddr]:
+        with self.lock:
+            rows = self.db.execute("SELECT action FROM action_claims WHERE expires_at < ?", (now,)).fetchall()
+        return [ScAddr(action) for action, in rows]
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class ActionLease:
+    """Удерживаемая заявка на действие: пока блок with выполняется, заявка продлевается в фоновом потоке"""
+
+    def __init__(self, claims: "ActionClaims", action: ScAddr):
+        self.claims = claims
+        self.action = action
+        self.stopped = threading.Event()
+        self.renew_thread = threading.Thread(target=self._renew_until_stopped, name="action-lease", daemon=True)
+
+    def __enter__(self) -> "ActionLease":
+        self.renew_thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stopped.set()
+        self.renew_thread.join()
+        self.claims.store.release(self.action, self.claims.owner)
+
+    def _renew_until_stopped(self) -> None:
+        while not self.stopped.wait(self.claims.lease / LEASE_RENEW_FRACTION):
+            if not self.claims.store.renew(self.action, self.claims.owner, time.time() + self.claims.lease):
+                self.claims.logger.warning("Lease of action %s was lost", self.action)
+                return
+
+
+class ActionClaims:
+    """
+    Протокол аренды действий для нескольких экземпляров агента, подписанных на одно и то же действие:
+    обрабатывает действие только экземпляр, поставивший заявку, остальные возвращают ScResult.SKIP.
+    Заявка продлевается, пока действие обрабатывается; если экземпляр завершился, не закончив действие,
+    после истечения аренды его перехватывает фоновая проверка (start_reclaim) другого экземпляра.
+    """
+
+    def __init__(self, store: ActionClaimStore, owner: str | None = None, lease: float = DEFAULT_LEASE):
+        self.store = store
+        self.owner = owner if owner is not None else default_owner()
+        self.lease = lease
+        self.reclaim_stopped = threading.Event()
+        self.reclaim_thread: threading.Thread | None = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def acquire(self, action: ScAddr) -> ActionLease | None:
+        """Ставит заявку на действие; None, если его обрабатывает другой экземпляр"""
+        if not self.store.try_claim(action, self.owner, time.time() + self.lease):
+            return None
+        return ActionLease(self, action)
+
+    def start_reclaim(self, action_class: str, process_action: Callable[[ScAddr], ScResult],
+                      interval: float | None = None) -> None:
+        """Периодически ищет незавершённые действия action_class с просроченной арендой и обрабатывает их заново"""
+        if self.reclaim_thread is not None:
+            return
+        self.reclaim_stopped.clear()
+        self.reclaim_thread = threading.Thread(
+            target=self._reclaim_until_stopped, args=(action_class, process_action, interval or self.lease),
+            name="action-reclaim", daemon=True)
+        self.reclaim_thread.start()
+
+    def stop_reclaim(self) -> None:
+        if self.reclaim_thread is not None:
+            self.reclaim_stopped.set()
+            self.reclaim_thread.join()
+            self.reclaim_thread = None
+
+    def reclaim_expired(self, action_class: str, process_action: Callable[[ScAddr], ScResult]) -> int:
+        """Обрабатывает незавершённые действия action_class с просроченной арендой; возвращает их число"""
+        reclaimed = 0
+        for action in self.store.expired_actions(time.time()):
+            if not check_action_class(action_class, action):
+                continue
+            if check_action_class(ActionStatus.ACTION_FINISHED, action):
+                # Действие завершено, но заявка не была снята
+                self.store.discard(action)
+                continue
+            self.logger.warning("Lease of action %s expired, reclaiming it", action)
+            process_action(action)
+            reclaimed += 1
+        return reclaimed
+
+    def _reclaim_until_stopped(self, action_class, process_action, interval) -> None:
+        while not self.reclaim_stopped.wait(interval):
+            try:
+                self.reclaim_expired(action_class, process_action)
+            except Exception:
+                self.logger.exception("Reclaiming expired actions failed")
+
@@ -0,0 +1,43 @@
+from dataclasses import dataclass
+
+from sc_kpm import ScResult
+
+
+# Форматы ответов со списком результатов: тип запроса -> (подпись сущности, заголовок списка).
+# Совпадают с форматами, которые раньше задавались модели в промптах оформления ответа.
+LIST_ANSWER_FORMATS = {
+    "children_needed": ("Сущность", "Дочерние сущности"),
+    "parents_needed": ("Сущность", "Родительские сущности"),
+    "parent_decomposition_needed": ("Раздел", "Входит в декомпозиции"),
+    "max_class_needed": ("Сущность", "Максимальный класс"),
+    "not_max_class_needed": ("Сущность", "Более общий класс"),
+    "key_sc_element_needed": ("Сущность", "Ключевые SC-элементы"),
+}
+
+EMPTY_LIST_ITEM = "(пусто)"
+
+
+@dataclass
+class PreparedAnswer:
+    """Ответ, подготовленный обработчиком предметной области: готовый текст или промпт, по которому его сформирует модель"""
+    text: str | None = None
+    prompt: str | None = None
+
+
+def answer_result(answer) -> tuple[ScResult, str | None]:
+    """(ScResult, текст ответа) по результату выдачи ответа: тексту ответа или признаку неудачи"""
+    if isinstance(answer, str):
+        return ScResult.OK, answer
+    return ScResult.ERROR, None
+
+
+def render_list_answer(decision: str, entity_name: str, items: list[str]) -> str:
+    """
+    Формирует ответ вида "Сущность: X / Дочерние сущности: / - a / - b" без обращения к модели.
+    Пустой список выводится как "- (пусто)".
+    """
+    subject_label, list_label = LIST_ANSWER_FORMATS[decision]
+    items = [item.strip() for item in items if item.strip()] or [EMPTY_LIST_ITEM]
+    lines = [f"{subject_label}: {entity_name}", f"{list_label}:"]
+    lines.extend(f"- {item}" for item in items)
+    return "\n".join(lines)
@@ -0,0 +1,60 @@
+import time
+import logging
+
+from sc_client.models import ScAddr, ScLinkContent, ScLinkContentType
+from sc_client.client import set_link_contents
+from sc_kpm.utils import create_link
+from sc_kpm.utils.action_utils import generate_action_result
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+def print_token(token: str) -> None:
+    """Подписчик по умолчанию: выводит фрагмент ответа в консоль сразу, без буферизации"""
+    print(token, end="", flush=True)
+
+
+class AnswerLinkWriter:
+    """
+    Записывает ответ модели в sc-ссылку результата действия по мере генерации.
+    Ссылка создаётся при первом фрагменте; содержимое обновляется не чаще, чем раз в min_interval секунд,
+    чтобы не отправлять sc-серверу запрос на каждый токен.
+    """
+
+    def __init__(self, action_node: ScAddr, min_interval: float = 0.2):
+        self.action_node = action_node
+        self.min_interval = min_interval
+        self.link: ScAddr | None = None
+        self.parts: list[str] = []
+        self.is_dirty = False
+        self.last_flush_time = 0.0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def write(self, token: str) -> None:
+        self.parts.append(token)
+        self.is_dirty = True
+        if self.link is None:
+            self.link = create_link("".join(self.parts))
+            generate_action_result(self.action_node, self.link)
+            self.is_dirty = False
+            self.last_flush_time = time.monotonic()
+        elif time.monotonic() - self.last_flush_time >= self.min_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.link is None or not self.is_dirty:
+            return
+        set_link_contents(ScLinkContent("".join(self.parts), ScLinkContentType.STRING, self.link))
+        self.is_dirty = False
+        self.last_flush_time = time.monotonic()
+
+    def close(self) -> None:
+        """Записывает оставшиеся фрагменты; итоговое содержимое ссылки - ответ без пробелов по краям"""
+        if self.link is None:
+            return
+        answer = "".join(self.parts)
+        if answer != answer.strip() or self.is_dirty:
+            set_link_contents(ScLinkContent(answer.strip(), ScLinkContentType.STRING, self.link))
+            self.is_dirty = False
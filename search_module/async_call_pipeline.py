@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable
+
+from sc_client.models import ScAddr
+
+from sc_kpm import ScResult
+from sc_kpm.utils import get_link_content_data
+from sc_kpm.utils.action_utils import get_action_arguments
+
+from .async_llm_client import AsyncLLMClient
+from .answer_stream import AnswerLinkWriter, print_token
+from .answer_renderer import PreparedAnswer, answer_result
+from .query_router import normalize_query, route_by_indicators
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+class BackgroundEventLoop:
+    """Event loop в отдельном потоке: синхронный код передаёт в него корутины и ждёт их результата"""
+
+    def __init__(self, name: str = "async-call-pipeline"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_forever, name=name, daemon=True)
+        self.thread.start()
+
+    def _run_forever(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coroutine, timeout: float | None = None):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+
+    def stop(self) -> None:
+        if self.loop.is_closed():
+            return
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+class AsyncCallPipeline:
+    """
+    Асинхронный конвейер CallAgent: маршрутизация, поиск в базе знаний и ответ модели.
+    Запросы к модели идут через AsyncLLMClient, а синхронные обращения к sc-серверу выполняются
+    в пуле из max_kb_calls потоков, поэтому ожидание ответа модели не занимает поток.
+    Промпты, разбор ответов и поиск в базе знаний берутся у call_agent.
+    """
+
+    def __init__(self, call_agent, llm_client: AsyncLLMClient, max_kb_calls: int = 32):
+        self.call_agent = call_agent
+        self.llm_client = llm_client
+        self.kb_executor = ThreadPoolExecutor(max_workers=max_kb_calls, thread_name_prefix="kb-call")
+        self.event_loop: BackgroundEventLoop | None = None
+        self.event_loop_lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def run_sync(self, action_node: ScAddr) -> ScResult:
+        """Синхронная обёртка над run: выполняет конвейер в фоновом event loop"""
+        with self.event_loop_lock:
+            if self.event_loop is None:
+                self.event_loop = BackgroundEventLoop()
+        return self.event_loop.run(self.run(action_node))
+
+    def close(self) -> None:
+        if self.event_loop is not None:
+            self.event_loop.run(self.llm_client.close())
+            self.event_loop.stop()
+            self.event_loop = None
+        self.kb_executor.shutdown(wait=False)
+
+    async def call_kb(self, function, *args):
+        """Выполняет синхронное обращение к базе знаний в пуле потоков, не блокируя event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.kb_executor, functools.partial(function, *args))
+
+    async def run(self, action_node: ScAddr) -> ScResult:
+        call_agent = self.call_agent
+
+        link, = await self.call_kb(get_action_arguments, action_node, 1)
+        link_query = await self.call_kb(get_link_content_data, link)
+
+        (result, answer), joined = await call_agent.query_flights.do_async(
+            normalize_query(link_query), lambda: self.answer_query(action_node, link_query))
+        if not joined:
+            return result
+        self.logger.info("Ответ получен от одновременно выполнявшегося такого же запроса")
+        return await self.call_kb(call_agent.send_shared_answer, action_node, answer)
+
+    async def answer_query(self, action_node: ScAddr, link_query: str):
+        """Асинхронный аналог CallAgent.answer_query. Возвращает (ScResult, текст ответа или None)"""
+        call_agent = self.call_agent
+
+        route = None
+        if call_agent.fast_path_routing:
+            route = await self.call_kb(route_by_indicators, link_query, call_agent.resolve_entity_name)
+            if route is not None:
+                self.logger.info(f"Маршрут определён по фразам-индикаторам без LLM: {route}")
+            else:
+                prepared_answer = await self.call_kb(call_agent.prepare_multiple_list_answer, action_node, link_query)
+                if prepared_answer is not None:
+                    return answer_result(await self.deliver_answer(action_node, prepared_answer))
+
+        if route is None and call_agent.single_shot_routing:
+            routing_answer = await self.get_response(call_agent.build_routing_prompt(link_query))
+            route = call_agent.parse_routing_answer(routing_answer)
+            if route is None:
+                self.logger.warning("Не удалось определить маршрут одним запросом, используется двухэтапная маршрутизация")
+
+        if route is None:
+            # Двухэтапная маршрутизация - запасной путь, она выполняется синхронно целиком
+            return await self.call_kb(
+                call_agent.run_two_stage_routing, action_node, link_query, call_agent.llm_client)
+
+        return await self.answer_route(action_node, link_query, *route)
+
+    async def answer_route(self, action_node: ScAddr, link_query: str, area, decision, entity_name):
+        """Асинхронный аналог CallAgent.answer_route"""
+        call_agent = self.call_agent
+
+        entity_node = await self.call_kb(call_agent.lookup_route_entity_node, area, entity_name)
+
+        async def answer():
+            prepared_answer = await self.call_kb(
+                call_agent.prepare_route_answer, action_node, link_query, area, decision, entity_name, entity_node)
+            return await self.deliver_answer(action_node, prepared_answer)
+
+        answer_key = call_agent.get_answer_key(decision, entity_node)
+        if answer_key is None:
+            return answer_result(await answer())
+
+        answer, joined = await call_agent.answer_flights.do_async(answer_key, answer)
+        if joined:
+            self.logger.info(f"Ответ для {answer_key} получен от одновременно выполнявшегося запроса")
+            if isinstance(answer, str):
+                await self.call_kb(call_agent.send_answer, action_node, answer)
+        return answer_result(answer)
+
+    async def deliver_answer(self, action_node: ScAddr, prepared_answer):
+        """Асинхронный аналог CallAgent.deliver_answer"""
+        if not isinstance(prepared_answer, PreparedAnswer):
+            return prepared_answer
+        if prepared_answer.prompt is None:
+            return await self.call_kb(self.call_agent.send_answer, action_node, prepared_answer.text)
+        return await self.generate_answer(action_node, prepared_answer.prompt)
+
+    async def generate_answer(self, action_node: ScAddr, answer_prompt: str) -> str:
+        """Асинхронный аналог CallAgent.generate_answer"""
+        call_agent = self.call_agent
+        if not call_agent.stream_answers:
+            answer_response = (await self.get_response(answer_prompt)).strip()
+            print(answer_response)
+            return answer_response
+
+        link_writer = AnswerLinkWriter(action_node)
+
+        async def on_token(token):
+            await self.call_kb(link_writer.write, token)
+            call_agent.answer_subscriber(token)
+
+        try:
+            answer_response = await self.stream_response(answer_prompt, on_token)
+        finally:
+            await self.call_kb(link_writer.close)
+        if call_agent.answer_subscriber is print_token:
+            print()
+        return answer_response.strip()
+
+    async def get_response(self, prompt: str) -> str:
+        """Асинхронный аналог get_together_ai_response: ответы берутся из общего кэша клиента"""
+        cache = self.llm_client.cache
+        if cache is not None:
+            cached_response = cache.get(self.llm_client.model, prompt)
+            if cached_response is not None:
+                return cached_response
+
+        try:
+            response = await self.llm_client.chat(prompt)
+        except Exception as e:
+            return f"Error getting response from Together AI: {e}"
+
+        if cache is not None:
+            cache.set(self.llm_client.model, prompt, response)
+        return response
+
+    async def stream_response(self, prompt: str, on_token: Callable[[str], Awaitable[None]]) -> str:
+        """Асинхронный аналог stream_together_ai_response"""
+        cache = self.llm_client.cache
+        if cache is not None:
+            cached_response = cache.get(self.llm_client.model, prompt)
+            if cached_response is not None:
+                await on_token(cached_response)
+                return cached_response
+
+        parts = []
+        try:
+            async for token in self.llm_client.stream_chat(prompt):
+                parts.append(token)
+                await on_token(token)
+        except Exception as e:
+            error_message = f"Error getting response from Together AI: {e}"
+            await on_token(("\n" if parts else "") + error_message)
+            return "".join(parts) + error_message
+
+        response = "".join(parts)
+        if cache is not None:
+            cache.set(self.llm_client.model, prompt, response)
+        return response
@@ -0,0 +1,111 @@
+import json
+import asyncio
+import logging
+from typing import AsyncIterator
+
+import aiohttp
+
+from .llm_cache import LLMResponseCache
+from .llm_client import TOGETHER_AI_BASE_URL, TOGETHER_AI_MODEL, RETRY_STATUS_CODES, get_api_key
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+class AsyncLLMClient:
+    """
+    Асинхронный клиент chat-completions API Together AI на одной aiohttp-сессии.
+    Запрос, ожидающий ответа модели, не занимает поток, поэтому в одном процессе могут выполняться сотни запросов.
+    Сессия создаётся при первом запросе в том event loop, в котором клиент используется.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = TOGETHER_AI_BASE_URL,
+        model: str = TOGETHER_AI_MODEL,
+        pool_size: int = 100,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: LLMResponseCache | None = None,
+    ):
+        self.api_key = get_api_key(api_key)
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.cache = cache
+        self.session: aiohttp.ClientSession | None = None
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+                timeout=self.timeout,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+            )
+        return self.session
+
+    async def post(self, payload: dict) -> aiohttp.ClientResponse:
+        """Отправляет запрос, повторяя его при RETRY_STATUS_CODES с экспоненциальной задержкой или по Retry-After"""
+        session = self.get_session()
+        for attempt in range(self.max_retries + 1):
+            response = await session.post(f"{self.base_url}/chat/completions", json=payload)
+            if response.status not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                try:
+                    response.raise_for_status()
+                except aiohttp.ClientResponseError:
+                    # Соединение возвращается в пул до выдачи ошибки
+                    response.release()
+                    raise
+                return response
+
+            retry_after = response.headers.get("Retry-After")
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else self.backoff_factor * 2 ** attempt
+            response.release()
+            self.logger.warning("LLM request failed with status %d, retrying in %.1f s", response.status, delay)
+            await asyncio.sleep(delay)
+
+    async def chat(self, prompt: str, model: str | None = None) -> str:
+        """Отправляет один пользовательский запрос модели и возвращает текст ответа"""
+        response = await self.post({
+            "model": model or self.model,
+            "messages": [{"role": "user", "content": prompt}],
+        })
+        async with response:
+            answer_json = await response.json(content_type=None)
+        return answer_json["choices"][0]["message"]["content"]
+
+    async def stream_chat(self, prompt: str, model: str | None = None) -> AsyncIterator[str]:
+        """Отправляет запрос в потоковом режиме (server-sent events) и выдаёт фрагменты ответа по мере генерации"""
+        response = await self.post({
+            "model": model or self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+        })
+        async with response:
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").strip()
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                token = choices[0].get("delta", {}).get("content") if choices else None
+                if token:
+                    yield token
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
@@ -1,5 +1,8 @@
 import os
+import json
 import logging
+import functools
+from typing import Callable
 
 from sc_client.models import ScAddr, ScTemplate
 from sc_client.constants import sc_types
@@ -9,16 +12,37 @@ from sc_kpm import ScAgentClassic, ScResult
 from sc_kpm.sc_sets import ScStructure, ScSet
 from sc_kpm.utils import get_link_content_data, get_system_idtf
 from sc_kpm.utils.action_utils import (
+    check_action_class,
     finish_action_with_status,
     get_action_arguments,
     get_action_result,
     execute_agent,
 )
 from sc_kpm import ScKeynodes
-from sc_kpm.identifiers import CommonIdentifiers
-from together import Together  # Import TogetherAI library
+from sc_kpm.identifiers import ActionStatus, CommonIdentifiers
 
 from .search_module_idtfs import SearchModuleIdentifiers
+from .llm_client import LLMClient
+from .async_llm_client import AsyncLLMClient
+from .async_call_pipeline import AsyncCallPipeline
+from .answer_stream import AnswerLinkWriter, print_token
+from .answer_renderer import PreparedAnswer, answer_result, render_list_answer
+from .query_router import normalize_query, route_by_indicators, route_multiple_by_indicators
+from .query_executor import QUERY_MAX_IN_FLIGHT, run_in_order
+from .single_flight import SingleFlight
+from .action_claims import ActionClaims
+from .identifier_index import IdentifierIndex
+from .scheme_cache import SchemeCache
+from .find_info_batch_agent import search_elements_main_idtf_links, get_result_main_idtf_links
+from .find_description_agent import search_description_link
+from .find_included_children_agent import search_included_children
+from .find_included_in_parents_agent import search_included_in_parents
+from .find_in_decompositions_agent import search_decompositions
+from .find_max_class_agent import search_max_classes
+from .find_not_max_class_agent import search_not_max_classes
+from .find_key_sc_element_agent import search_key_sc_elements
+from .find_parent_decomposition_agent import search_parent_decompositions
+from .find_stages_graph_agent import build_stages_graph, stages_graph_to_json
 
 
 logging.basicConfig(
@@ -27,27 +51,167 @@ logging.basicConfig(
 # Global variable to store API key (for simplicity in this example, consider more secure methods in production)
 # TOGETHER_AI_API_KEY = os.environ.get("TOGETHER_AI_API_KEY") # No longer global, get inside run()
 
+# Функции поиска, которые CallAgent вызывает напрямую в своём процессе вместо execute_agent.
+# Действия этих агентов по-прежнему доступны для внешних вызовов.
+DIRECT_SEARCH_FUNCTIONS = {
+    SearchModuleIdentifiers.ACTION_FIND_INCLUDED_CHILDREN: search_included_children,
+    SearchModuleIdentifiers.ACTION_FIND_INCLUDED_IN_PARENTS: search_included_in_parents,
+    SearchModuleIdentifiers.ACTION_FIND_IN_DECOMPOSITIONS: search_decompositions,
+    SearchModuleIdentifiers.ACTION_FIND_MAX_CLASS: search_max_classes,
+    SearchModuleIdentifiers.ACTION_FIND_NOT_MAX_CLASS: search_not_max_classes,
+    SearchModuleIdentifiers.ACTION_FIND_KEY_SC_ELEMENT: search_key_sc_elements,
+    SearchModuleIdentifiers.ACTION_FIND_PARENT_DECOMPOSITION: search_parent_decompositions,
+}
+
+# Типы запросов, ответ на которые - список результатов одного агента поиска.
+# Запрос сразу о нескольких из них обрабатывается одновременными вызовами этих агентов.
+LIST_DECISION_AGENTS = {
+    "children_needed": SearchModuleIdentifiers.ACTION_FIND_INCLUDED_CHILDREN,
+    "parents_needed": SearchModuleIdentifiers.ACTION_FIND_INCLUDED_IN_PARENTS,
+    "parent_decomposition_needed": SearchModuleIdentifiers.ACTION_FIND_PARENT_DECOMPOSITION,
+    "max_class_needed": SearchModuleIdentifiers.ACTION_FIND_MAX_CLASS,
+    "not_max_class_needed": SearchModuleIdentifiers.ACTION_FIND_NOT_MAX_CLASS,
+    "key_sc_element_needed": SearchModuleIdentifiers.ACTION_FIND_KEY_SC_ELEMENT,
+}
+
+# Предметные области: метод CallAgent, который их обрабатывает, и допустимые в них типы запросов
+SUBJECT_AREAS = {
+    "Структура и Иерархия": (
+        "structure_and_hierarchy", ("children_needed", "parents_needed", "parent_decomposition_needed")),
+    "Описание и Характеристики": ("description_and_characteristics", ("description_needed",)),
+    "Классификация и Категоризация": (
+        "classification_and_categorization", ("max_class_needed", "not_max_class_needed")),
+    "Семантические Связи и Знания": ("semantic_relationships_and_knowledge", ("key_sc_element_needed",)),
+    "Схемы и Процессы": ("schemes_and_processes", ("scheme_steps_needed",)),
+    "Общие Запросы": ("general_questions", ("general_query",)),
+}
+GENERAL_QUESTIONS_AREA = "Общие Запросы"
+# Типы запросов, ответ на которые зависит от текста вопроса, а не только от сущности:
+# одновременные запросы о той же сущности их ответ не получают
+QUERY_DEPENDENT_DECISIONS = ("scheme_steps_needed",)
+
+# Нечёткое сопоставление названия сущности: сколько кандидатов смотреть, минимальная оценка
+# и насколько лучший кандидат должен опережать следующий
+FUZZY_MATCH_TOP_K = 5
+FUZZY_MATCH_THRESHOLD = 0.75
+FUZZY_MATCH_MARGIN = 0.05
+
+
+def parse_json_answer(answer: str) -> dict | None:
+    """Разбирает JSON-ответ модели, допуская обёртку ```json ... ```"""
+    answer = answer.strip()
+    if answer.startswith("```"):
+        answer = answer.strip("`").strip()
+        if answer.startswith("json"):
+            answer = answer[len("json"):]
+    try:
+        parsed = json.loads(answer)
+    except json.JSONDecodeError:
+        return None
+    return parsed if isinstance(parsed, dict) else None
+
 
-def get_together_ai_response(api_key, prompt):
+def get_together_ai_response(llm_client: LLMClient, prompt):
     """
-    Sends a prompt to Together AI API and returns the response.
+    Sends a prompt to Together AI API through the shared pooled client and returns the response.
+    Repeated prompts are answered from the client's response cache without an API call.
     """
+    cache = llm_client.cache
+    if cache is not None:
+        cached_response = cache.get(llm_client.model, prompt)
+        if cached_response is not None:
+            return cached_response
+
     try:
-        client = Together(api_key=api_key)
-        response = client.chat.completions.create(
-            model="meta-llama/Llama-3.3-70B-Instruct-Turbo",  # Or choose another model from Together AI
-            messages=[{"role": "user", "content": prompt}],
-        )
-        return response.choices[0].message.content
+        response = llm_client.chat(prompt)
     except Exception as e:
         return f"Error getting response from Together AI: {e}"
 
+    if cache is not None:
+        cache.set(llm_client.model, prompt, response)
+    return response
+
+
+def stream_together_ai_response(llm_client: LLMClient, prompt, on_token: Callable[[str], None]):
+    """
+    Streams a response from Together AI, passing each fragment to on_token as it arrives, and returns the full text.
+    A cached response is passed to on_token as a single fragment.
+    """
+    cache = llm_client.cache
+    if cache is not None:
+        cached_response = cache.get(llm_client.model, prompt)
+        if cached_response is not None:
+            on_token(cached_response)
+            return cached_response
+
+    parts = []
+    try:
+        for token in llm_client.stream_chat(prompt):
+            parts.append(token)
+            on_token(token)
+    except Exception as e:
+        error_message = f"Error getting response from Together AI: {e}"
+        on_token(("\n" if parts else "") + error_message)
+        return "".join(parts) + error_message
+
+    response = "".join(parts)
+    if cache is not None:
+        cache.set(llm_client.model, prompt, response)
+    return response
+
 
 class CallAgent(ScAgentClassic):
-    def __init__(self):
+    def __init__(self, llm_client: LLMClient | None = None, single_shot_routing: bool = True,
+                 fast_path_routing: bool = True, identifier_index: IdentifierIndex | None = None,
+                 stream_answers: bool = True, answer_subscriber: Callable[[str], None] | None = None,
+                 llm_answer_formatting: bool = False, scheme_cache: SchemeCache | None = None,
+                 async_llm_client: AsyncLLMClient | None = None, max_kb_calls: int = 32,
+                 query_max_in_flight: int = QUERY_MAX_IN_FLIGHT, action_claims: ActionClaims | None = None):
         super().__init__("action_call_agent")
+        self.llm_client = llm_client if llm_client is not None else LLMClient()
+        self.identifier_index = identifier_index
+        self.scheme_cache = scheme_cache
+        # Разбирать типовые запросы по фразам-индикаторам, не обращаясь к модели
+        self.fast_path_routing = fast_path_routing
+        # Определять предметную область, тип запроса и сущность одним запросом к модели.
+        # При неудаче используется прежняя двухэтапная маршрутизация.
+        self.single_shot_routing = single_shot_routing
+        # Передавать итоговый ответ по мере генерации: в sc-ссылку результата действия и подписчику
+        # (по умолчанию - в консоль)
+        self.stream_answers = stream_answers
+        self.answer_subscriber = answer_subscriber if answer_subscriber is not None else print_token
+        # Оформлять списки результатов моделью; по умолчанию они оформляются локально без лишнего запроса
+        self.llm_answer_formatting = llm_answer_formatting
+        # Сколько независимых вызовов агентов поиска в рамках одного запроса выполняется одновременно
+        self.query_max_in_flight = query_max_in_flight
+        # Одновременные одинаковые запросы обрабатываются один раз: по нормализованному тексту запроса
+        # и, после маршрутизации, по паре (тип запроса, узел сущности), если ответ не зависит от текста вопроса
+        self.query_flights = SingleFlight()
+        self.answer_flights = SingleFlight()
+        # Аренда действий, когда на action_call_agent подписано несколько экземпляров CallAgent
+        self.action_claims = action_claims
+        # С асинхронным клиентом запрос обрабатывается в AsyncCallPipeline, а run остаётся синхронной обёрткой
+        self.async_pipeline = (
+            AsyncCallPipeline(self, async_llm_client, max_kb_calls) if async_llm_client is not None else None)
 
     def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
+        return self.process_action(action_element)
+
+    def process_action(self, action_element: ScAddr) -> ScResult:
+        if self.action_claims is None:
+            return self.run_and_finish(action_element)
+
+        lease = self.action_claims.acquire(action_element)
+        if lease is None:
+            self.logger.info("Action %s is processed by another CallAgent instance", action_element)
+            return ScResult.SKIP
+        with lease:
+            # Заявка снимается после завершения действия, поэтому опоздавший экземпляр может получить её заново
+            if check_action_class(ActionStatus.ACTION_FINISHED, action_element):
+                return ScResult.SKIP
+            return self.run_and_finish(action_element)
+
+    def run_and_finish(self, action_element: ScAddr) -> ScResult:
         result = self.run(action_element)
         is_successful = result == ScResult.OK
         finish_action_with_status(action_element, is_successful)
@@ -56,17 +220,52 @@ class CallAgent(ScAgentClassic):
         return result
 
     def run(self, action_node: ScAddr) -> ScResult:
+        if self.async_pipeline is not None:
+            return self.async_pipeline.run_sync(action_node)
 
         link, = get_action_arguments(action_node, 1)
         link_query = get_link_content_data(link)
 
-        api_key = "814aaa3d65cd5cd6dedbab7f8685889419ad93285155ae2d7c1a94869343faa4"
-
-        if not api_key:
-            error_message = "TOGETHER_AI_API_KEY is not set in environment variables!"
-            self.logger.error(error_message)
+        llm_client = self.llm_client
+
+        (result, answer), joined = self.query_flights.do(
+            normalize_query(link_query), lambda: self.answer_query(action_node, link_query, llm_client))
+        if not joined:
+            return result
+        self.logger.info("Ответ получен от одновременно выполнявшегося такого же запроса")
+        return self.send_shared_answer(action_node, answer)
+
+    def answer_query(self, action_node, link_query, llm_client):
+        """Маршрутизирует запрос и отвечает на него. Возвращает (ScResult, текст ответа или None)"""
+        if self.fast_path_routing:
+            route = route_by_indicators(link_query, self.resolve_entity_name)
+            if route is not None:
+                self.logger.info(f"Маршрут определён по фразам-индикаторам без LLM: {route}")
+                return self.answer_route(action_node, link_query, llm_client, *route)
+            prepared_answer = self.prepare_multiple_list_answer(action_node, link_query)
+            if prepared_answer is not None:
+                return answer_result(self.deliver_answer(action_node, llm_client, prepared_answer))
+
+        if self.single_shot_routing:
+            route = self.route_query(link_query, llm_client)
+            if route is not None:
+                return self.answer_route(action_node, link_query, llm_client, *route)
+            self.logger.warning("Не удалось определить маршрут одним запросом, используется двухэтапная маршрутизация")
+
+        return self.run_two_stage_routing(action_node, link_query, llm_client)
+
+    def send_shared_answer(self, action_node, answer):
+        """Выдаёт ответ, полученный от одновременно выполнявшегося такого же запроса, в результат своего действия"""
+        if answer is None:
             return ScResult.ERROR
-        
+        self.send_answer(action_node, answer)
+        return ScResult.OK
+
+    def run_two_stage_routing(self, action_node, link_query, llm_client):
+        """
+        Прежняя маршрутизация: сначала предметная область, затем тип запроса и сущность отдельным запросом.
+        Возвращает (ScResult, текст ответа или None)
+        """
         subject_area_prompt = f"""
           Определи, к какой из следующих предметных областей относится запрос пользователя.  Выбери ТОЧНОЕ НАЗВАНИЕ ПРЕДМЕТНОЙ ОБЛАСТИ из списка и верни только это название в качестве ответа.
 
@@ -129,40 +328,269 @@ class CallAgent(ScAgentClassic):
 
           Ответ (верни только название предметной области):
               """
-        subject_area_prompt_answer = get_together_ai_response(api_key, subject_area_prompt).strip()
+        subject_area_prompt_answer = get_together_ai_response(llm_client, subject_area_prompt).strip()
 
         if subject_area_prompt_answer == "Структура и Иерархия":
-            self.structure_and_hierarchy(action_node, link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.structure_and_hierarchy(action_node, link_query, llm_client))
         elif subject_area_prompt_answer == "Описание и Характеристики":
-            self.description_and_characteristics(action_node, link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.description_and_characteristics(action_node, link_query, llm_client))
         elif subject_area_prompt_answer == "Классификация и Категоризация":
-            self.classification_and_categorization(action_node, link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.classification_and_categorization(action_node, link_query, llm_client))
         elif subject_area_prompt_answer == "Семантические Связи и Знания":
-            self.semantic_relationships_and_knowledge(action_node, link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.semantic_relationships_and_knowledge(action_node, link_query, llm_client))
         elif subject_area_prompt_answer == "Схемы и Процессы":
-            self.schemes_and_processes(action_node, link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.schemes_and_processes(action_node, link_query, llm_client))
         elif subject_area_prompt_answer == "Общие Запросы":
-            self.general_questions(link_query, api_key)
-            return ScResult.OK
+            return answer_result(self.general_questions(action_node, link_query, llm_client))
         else:
             print(f"ОШИБКА: Не задействована никакая предметная область. Ответ модели: {subject_area_prompt_answer}")
-            return ScResult.ERROR
-    
-    def find_entity_by_name(self, entity_name, action_node):
-        """Возвращает ноду по названию"""
-        node_idtf_link_search_result = search_links_by_contents(entity_name)[0]
+            return ScResult.ERROR, None
+
+    def route_query(self, link_query, llm_client):
+        """Определяет предметную область, тип запроса и сущность одним запросом к модели. Возвращает (area, decision, entity_name) или None"""
+        routing_answer = get_together_ai_response(llm_client, self.build_routing_prompt(link_query))
+        return self.parse_routing_answer(routing_answer)
+
+    def build_routing_prompt(self, link_query):
+        return f"""
+          Запрос пользователя: {link_query}
+
+          Ты - система маршрутизации запросов.  За один ответ определи предметную область запроса, тип запроса внутри неё и название сущности.
+
+          Предметные области и типы запросов:
+
+          1. "Структура и Иерархия" - из чего состоит сущность, частью чего она является, в какую декомпозицию входит раздел.
+              - "children_needed": дочерние элементы, состав сущности.  Индикаторы: "дочерние элементы", "входят в состав", "состоит из", "из чего состоит", "что включает", "что содержит", "подразделы", "компоненты", "части".
+              - "parents_needed": родительские элементы, частью чего является сущность.  Индикаторы: "родители", "является частью", "частью чего является", "к чему относится", "надсистема", "целое для".
+              - "parent_decomposition_needed": в какие декомпозиции входит раздел.  Индикаторы: "входит в декомпозицию", "в какой декомпозиции", "в составе какой декомпозиции", "к какой декомпозиции принадлежит", "декомпозиции для", "декомпозиция раздела".
+
+          2. "Описание и Характеристики" - описание или определение сущности.
+              - "description_needed".  Индикаторы: "описание", "что такое", "что из себя представляет", "охарактеризуйте", "расскажите о", "дефиниция", "дать определение".
+
+          3. "Классификация и Категоризация" - классы, к которым принадлежит сущность.
+              - "max_class_needed": максимальный (самый общий) класс.  Индикаторы: "максимальный класс", "высшая категория", "самый общий класс", "к какому классу относится".
+              - "not_max_class_needed": немаксимальный или более общий, но не самый общий класс.  Индикаторы: "не максимальный класс", "более общий класс", "промежуточная категория".
+
+          4. "Семантические Связи и Знания" - ключевые элементы знания о сущности.
+              - "key_sc_element_needed".  Индикаторы: "ключевые элементы", "SC-элементы", "ключевые характеристики", "важные аспекты", "семантические связи", "знания о".
+
+          5. "Схемы и Процессы" - этапы и последовательность шагов ТОЛЬКО для известных схем:
+              - "Схема аппаратной процедуры для приготовления творожной массы"
+              - "Схема технологического процесса производства кефира"
+              - "Схема автоматизированной линии розлива молока"
+              - "Схема контроля качества молочной продукции"
+              - "scheme_steps_needed".  Индикаторы: "этапы схемы", "последовательность действий", "последовательность шагов", "схема работы", "шаги процесса", "стадии схемы".
+
+          6. "Общие Запросы" - всё, что не требует поиска в базе знаний.
+              - "general_query", "entity_name" всегда пустой.
+
+          Извлечение сущности:
+
+          - Если в запросе ЕСТЬ текст в кавычках (любых), "entity_name" - это ВЕСЬ текст внутри кавычек БЕЗ ИЗМЕНЕНИЙ, включая первое слово ("Раздел.", "Объект.", "Сущность.") и точку в конце, если она есть.
+          - Если кавычек НЕТ, выдели полное название основной сущности так, как оно написано в запросе.
+          - Для "scheme_steps_needed" "entity_name" - ТОЧНОЕ название схемы из списка известных схем.  Если схема из списка не упомянута, запрос относится к "Общие Запросы".
+
+          Формат ответа:
+          {{
+            "area": "точное название предметной области из списка",
+            "decision": "тип запроса этой предметной области",
+            "entity_name": "название сущности / '' для общих запросов"
+          }}
+
+          Пример:
+          Запрос: "Из каких компонентов состоит рецепт?"
+          Ответ:
+          {{
+            "area": "Структура и Иерархия",
+            "decision": "children_needed",
+            "entity_name": "рецепт"
+          }}
 
-        if not node_idtf_link_search_result:
-            self.logger.error("Не найден идентификатор: '{}'" @ entity_name)
+          Твой ответ должен быть по структуре на указанный формат, но **НЕ НАДО УКАЗЫВАТЬ В ОТВЕТЕ ```json**.
+        """
+
+    def parse_routing_answer(self, routing_answer):
+        """Разбирает ответ модели на промпт маршрутизации. Возвращает (area, decision, entity_name) или None"""
+        routing_answer = routing_answer.strip()
+        self.logger.info(f"JSON ответ маршрутизации от LLM: {routing_answer}")
+
+        routing_json = parse_json_answer(routing_answer)
+        if routing_json is None:
+            self.logger.error(f"Ошибка разбора JSON ответа LLM: {routing_answer}")
+            return None
+
+        area = routing_json.get("area")
+        decision = routing_json.get("decision")
+        entity_name = routing_json.get("entity_name") or ""
+
+        if area not in SUBJECT_AREAS or decision not in SUBJECT_AREAS[area][1]:
+            self.logger.error(f"Модель вернула неизвестную пару области и типа запроса: '{area}', '{decision}'")
+            return None
+        if area != GENERAL_QUESTIONS_AREA and not entity_name:
+            self.logger.error(f"Модель не извлекла сущность для запроса области '{area}'")
+            return None
+
+        return area, decision, entity_name
+
+    def generate_answer(self, action_node, llm_client, answer_prompt):
+        """Получает итоговый ответ модели на answer_prompt, в потоковом режиме - выдавая его по мере генерации"""
+        if not self.stream_answers:
+            answer_response = get_together_ai_response(llm_client, answer_prompt).strip()
+            print(answer_response)
+            return answer_response
+
+        link_writer = AnswerLinkWriter(action_node)
+
+        def on_token(token):
+            link_writer.write(token)
+            self.answer_subscriber(token)
+
+        try:
+            answer_response = stream_together_ai_response(llm_client, answer_prompt, on_token)
+        finally:
+            link_writer.close()
+        if self.answer_subscriber is print_token:
+            print()
+        return answer_response.strip()
+
+    def send_answer(self, action_node, answer):
+        """Выдаёт ответ, сформированный без модели, по тем же каналам, что и generate_answer"""
+        if not self.stream_answers:
+            print(answer)
+            return answer
+
+        link_writer = AnswerLinkWriter(action_node)
+        link_writer.write(answer)
+        link_writer.close()
+        self.answer_subscriber(answer)
+        if self.answer_subscriber is print_token:
+            print()
+        return answer
+
+    def prepare_multiple_list_answer(self, action_node, link_query):
+        """
+        Готовит ответ на запрос сразу о нескольких списках сведений об одной сущности (например, дочерние
+        и родительские элементы). Возвращает None, если запрос не такой, и False, если поиск не удался.
+        """
+        route = route_multiple_by_indicators(link_query, LIST_DECISION_AGENTS, self.resolve_entity_name)
+        if route is None:
+            return None
+        decisions, entity_name = route
+        self.logger.info(f"Запрос о нескольких списках определён по фразам-индикаторам: {decisions}, '{entity_name}'")
+
+        results = self.call_agents_get_result_items(
+            entity_name, action_node, [LIST_DECISION_AGENTS[decision] for decision in decisions])
+        if results is None or any(result_items is None for result_items in results):
+            return False
+        return PreparedAnswer(text="\n\n".join(
+            render_list_answer(decision, entity_name, result_items)
+            for decision, result_items in zip(decisions, results)
+        ))
+
+    def deliver_answer(self, action_node, llm_client, prepared_answer):
+        """Выдаёт подготовленный ответ: готовый текст - через send_answer, промпт - через generate_answer"""
+        if not isinstance(prepared_answer, PreparedAnswer):
+            return prepared_answer
+        if prepared_answer.prompt is None:
+            return self.send_answer(action_node, prepared_answer.text)
+        return self.generate_answer(action_node, llm_client, prepared_answer.prompt)
+
+    def answer_route(self, action_node, link_query, llm_client, area, decision, entity_name):
+        """
+        Передаёт запрос с уже определёнными областью, типом и сущностью обработчику предметной области.
+        Возвращает (ScResult, текст ответа или None)
+        """
+        entity_node = self.lookup_route_entity_node(area, entity_name)
+
+        def answer():
+            prepared_answer = self.prepare_route_answer(action_node, link_query, area, decision, entity_name, entity_node)
+            return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+        answer_key = self.get_answer_key(decision, entity_node)
+        if answer_key is None:
+            return answer_result(answer())
+
+        answer, joined = self.answer_flights.do(answer_key, answer)
+        if joined:
+            self.logger.info(f"Ответ для {answer_key} получен от одновременно выполнявшегося запроса")
+            if isinstance(answer, str):
+                self.send_answer(action_node, answer)
+        return answer_result(answer)
+
+    def lookup_route_entity_node(self, area, entity_name):
+        """
+        Узел сущности запроса или None для общих запросов и не найденной сущности
+        """
+        if area == GENERAL_QUESTIONS_AREA:
+            return None
+        return self.lookup_entity_node(entity_name)
+
+    def get_answer_key(self, decision, entity_node):
+        """Ключ объединения одинаковых ответов или None, если ответ нельзя передать другому запросу"""
+        if entity_node is None or decision in QUERY_DEPENDENT_DECISIONS:
+            return None
+        return decision, entity_node
+
+    def prepare_route_answer(self, action_node, link_query, area, decision, entity_name, entity_node=None):
+        """
+        Готовит ответ на запрос с уже определёнными областью, типом и сущностью, не обращаясь к модели.
+        entity_node - уже найденный узел сущности, чтобы не искать его повторно
+        """
+        if area == GENERAL_QUESTIONS_AREA:
+            return self.prepare_general_answer(link_query)
+
+        area_handler_name, _ = SUBJECT_AREAS[area]
+        prepare_area_answer = getattr(self, f"prepare_{area_handler_name}_answer")
+        return prepare_area_answer(action_node, link_query, decision, entity_name, entity_node)
+
+    def extract_decision(self, action_node, llm_client, area_description_prompt):
+        """Отправляет промпт предметной области и возвращает (decision, entity_name) или None, если ответ не разобран"""
+        agent_answer = get_together_ai_response(llm_client, area_description_prompt).strip()
+
+        self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
+
+        decision_response_json = parse_json_answer(agent_answer)
+        if decision_response_json is None:
+            self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
             finish_action_with_status(action_node, False)
-            return ScResult.ERROR
+            return None
 
-        for node_idtf_link in node_idtf_link_search_result:
+        decision = decision_response_json.get("decision")
+        entity_name = decision_response_json.get("entity_name", "")
+        return decision, entity_name
+    
+    def resolve_entity_name(self, entity_name):
+        """Возвращает основной идентификатор сущности из базы знаний для названия из запроса или None"""
+        if self.identifier_index is not None and self.identifier_index.is_built:
+            if self.identifier_index.lookup(entity_name) is not None:
+                return entity_name
+            fuzzy_match = self.find_fuzzy_match(entity_name)
+            return fuzzy_match[1] if fuzzy_match is not None else None
+        return entity_name if search_links_by_contents(entity_name)[0] else None
+
+    def find_fuzzy_match(self, entity_name):
+        """
+        Возвращает (узел, идентификатор) для названия в другой форме ("творожной массы" -> "творожная масса")
+        или None, если уверенного кандидата нет
+        """
+        if self.identifier_index is None or not self.identifier_index.is_built:
+            return None
+        candidates = self.identifier_index.fuzzy_lookup(entity_name, top_k=FUZZY_MATCH_TOP_K)
+        if not candidates:
+            return None
+        self.logger.info("Кандидаты для '%s': %s", entity_name, [(idtf, round(score, 2)) for _, idtf, score in candidates])
+
+        node, idtf, score = candidates[0]
+        if score < FUZZY_MATCH_THRESHOLD:
+            return None
+        # Два близких по оценке кандидата - разных узла - считаются неоднозначностью
+        if len(candidates) > 1 and candidates[1][0] != node and score - candidates[1][2] < FUZZY_MATCH_MARGIN:
+            return None
+        return node, idtf
+
+    def search_entity_by_link_contents(self, entity_name):
+        """Ищет узел по точному содержимому ссылки основного идентификатора через sc-сервер"""
+        for node_idtf_link in search_links_by_contents(entity_name)[0]:
             search_node_template = ScTemplate()
             search_node_template.triple_with_relation(
                 sc_types.NODE_VAR >> 'node',
@@ -172,21 +600,74 @@ class CallAgent(ScAgentClassic):
                 ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF]
             )
 
-            search_node_result = template_search(search_node_template)[0]
-            if len(search_node_result) == 0:
-                continue
+            search_node_result = template_search(search_node_template)
+            if search_node_result:
+                return search_node_result[0].get('node')
+        return None
 
-            node = search_node_result.get('node')
+    def find_entity_by_name(self, entity_name, action_node, node=None):
+        """Возвращает ноду по названию; node - уже найденный по этому названию узел"""
+        if node is None:
+            node = self.lookup_entity_node(entity_name)
+        if node is not None:
             return node
-        else:
-            self.logger.error("Не найден узел с основным идентификатором: '{}'" @ entity_name)
-            finish_action_with_status(action_node, False)
-            return ScResult.ERROR
-        
-    def call_agent_get_string_result(self, entity_name, action_node, action_agent):
-        """Вызывает необходимого агента поиска информации и формирует строку для передачи в модель"""
+
+        self.logger.error("Не найден узел с основным идентификатором: '{}'".format(entity_name))
+        finish_action_with_status(action_node, False)
+        return ScResult.ERROR
+
+    def lookup_entity_node(self, entity_name):
+        """Ищет узел по названию: в индексе, по содержимому ссылок, затем нечётко. Возвращает узел или None"""
+        if self.identifier_index is not None and self.identifier_index.is_built:
+            node = self.identifier_index.lookup(entity_name)
+            if node is not None:
+                return node
+
+        node = self.search_entity_by_link_contents(entity_name)
+        if node is not None:
+            return node
+
+        fuzzy_match = self.find_fuzzy_match(entity_name)
+        if fuzzy_match is not None:
+            node, idtf = fuzzy_match
+            self.logger.info("Название '%s' сопоставлено с '%s'", entity_name, idtf)
+            return node
+        return None
+
+    def call_agent_get_result_items(self, entity_name, action_node, action_agent, entity_node=None):
+        """Вызывает необходимого агента поиска информации и возвращает идентификаторы найденных элементов или None"""
+        node = self.find_entity_by_name(entity_name, action_node, entity_node)
+        if not isinstance(node, ScAddr):
+            return None
+        return self.search_result_items(entity_name, node, action_node, action_agent)
+
+    def call_agents_get_result_items(self, entity_name, action_node, action_agents):
+        """
+        Вызывает несколько независимых агентов поиска для одной сущности одновременно (не больше query_max_in_flight)
+        и возвращает их результаты в порядке action_agents или None, если сущность не найдена
+        """
         node = self.find_entity_by_name(entity_name, action_node)
-            
+        if not isinstance(node, ScAddr):
+            return None
+        return run_in_order(
+            [functools.partial(self.search_result_items, entity_name, node, action_node, action_agent)
+             for action_agent in action_agents],
+            self.query_max_in_flight,
+        )
+
+    def search_result_items(self, entity_name, node, action_node, action_agent):
+        """Идентификаторы элементов, найденных агентом action_agent для уже найденного узла сущности"""
+        search_function = DIRECT_SEARCH_FUNCTIONS.get(action_agent)
+        if search_function is None:
+            return self.execute_agent_get_result_items(entity_name, node, action_node, action_agent)
+
+        # Поиск выполняется напрямую, без создания действия и ожидания события от sc-сервера
+        elements = search_function(node)
+        info_links = search_elements_main_idtf_links(elements)
+        return self.get_links_contents([info_links[element] for element in elements if element in info_links])
+
+    def execute_agent_get_result_items(self, entity_name, node, action_node, action_agent):
+        """Вызывает агента поиска информации через действие и возвращает идентификаторы найденных элементов"""
         find_template_action, find_template_result = execute_agent(
             {
                 node: False,
@@ -198,39 +679,40 @@ class CallAgent(ScAgentClassic):
         )
 
         if not find_template_result:
-            self.logger.error("Не найдено описание узла: '{}'" @ entity_name)
+            self.logger.error("Не найдено описание узла: '{}'".format(entity_name))
             finish_action_with_status(action_node, False)
-            return ScResult.ERROR
+            return None
         
         find_template_action_result = ScStructure(set_node=get_action_result(find_template_action))
         info_set = next(iter(find_template_action_result))
 
-        set_results = ScSet(set_node=info_set)
-
-        result_string = ""
-
-        for result in set_results:
+        # Идентификаторы всех найденных элементов ищутся одним действием, а не отдельным действием на каждый элемент
+        find_info_action, find_info_result = execute_agent(
+            {
+                info_set: False,
+            },
+            [
+                CommonIdentifiers.ACTION,
+                SearchModuleIdentifiers.ACTION_FIND_INFO_BATCH,
+            ]
+        )
 
-            find_lang_action, find_lang_result = execute_agent(
-                {
-                    result: False,
-                },
-                [
-                    CommonIdentifiers.ACTION,
-                    SearchModuleIdentifiers.ACTION_FIND_INFO,
-                ]
-            )
+        if not find_info_result:
+            self.logger.error("Не найдены идентификаторы результатов для: '{}'".format(entity_name))
+            finish_action_with_status(action_node, False)
+            return None
 
-            find_lang_action_result = ScStructure(set_node=get_action_result(find_lang_action))
-            info_link = next(iter(find_lang_action_result))
+        info_links = get_result_main_idtf_links(get_action_result(find_info_action))
+        elements = list(ScSet(set_node=info_set))
+        return self.get_links_contents([info_links[element] for element in elements if element in info_links])
 
-            answer = get_link_content_data(info_link)
+    def get_links_contents(self, info_links):
+        """Читает содержимое всех ссылок одним запросом"""
+        if not info_links:
+            return []
+        return [info_link_content.data for info_link_content in get_link_content(*info_links)]
 
-            result_string = result_string + answer + "; "
-
-        return result_string
-    
-    def structure_and_hierarchy(self, action_node, link_query, api_key):
+    def structure_and_hierarchy(self, action_node, link_query, llm_client):
         area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -379,26 +861,25 @@ class CallAgent(ScAgentClassic):
           Если термин **ЗАДАН В ЛЮБЫХ КАВЫЧКАХ, ЕГО МЕНЯТЬ НЕ НАДО. ОН ДОЛЖЕН БЫТЬ ТАК.**
         """
 
-        agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-
-        self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
-        
-        try:
-            import json
-            decision_response_json = json.loads(agent_answer)
-            decision = decision_response_json.get("decision")
-            entity_name = decision_response_json.get("entity_name", "") 
-        except json.JSONDecodeError:
-            self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
-            decision = "general_query" 
-            entity_name = "" 
-            finish_action_with_status(action_node, False)
+        route = self.extract_decision(action_node, llm_client, area_description_prompt)
+        if route is None:
             return ScResult.ERROR
 
+        decision, entity_name = route
+        prepared_answer = self.prepare_structure_and_hierarchy_answer(action_node, link_query, decision, entity_name)
+        return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+    def prepare_structure_and_hierarchy_answer(self, action_node, link_query, decision, entity_name, entity_node=None):
+        """Готовит ответ на запрос области "Структура и Иерархия" по уже известным decision и entity_name: готовый текст или промпт для модели"""
         if decision == "children_needed":
             self.logger.info(f"LLM решил вызвать агента для поиска дочерних сущностей. Сущность: '{entity_name}'")
 
-            result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_INCLUDED_CHILDREN)
+            result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_INCLUDED_CHILDREN, entity_node)
+            if result_items is None:
+                return False
+            if not self.llm_answer_formatting:
+                return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+            result_string = "".join(f"{item}; " for item in result_items)
 
             answer_prompt = f"""
                     Сущность: "{entity_name}"
@@ -444,14 +925,17 @@ class CallAgent(ScAgentClassic):
                     - (пусто)
                     """
             
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
 
         elif decision == "parents_needed":
             self.logger.info(f"LLM решил вызвать агента для поиска родительских сущностей. Сущность: '{entity_name}'")
 
-            result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_INCLUDED_IN_PARENTS)
+            result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_INCLUDED_IN_PARENTS, entity_node)
+            if result_items is None:
+                return False
+            if not self.llm_answer_formatting:
+                return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+            result_string = "".join(f"{item}; " for item in result_items)
 
             answer_prompt = f"""
                     Сущность: "{entity_name}"
@@ -495,14 +979,17 @@ class CallAgent(ScAgentClassic):
                     Родительские сущности:
                     - (пусто)
                     """
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
 
         elif decision == "parent_decomposition_needed":
             self.logger.info(f"LLM решил вызвать агента для поиска родительских декомпозиций. Сущность: '{entity_name}'")
 
-            result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_PARENT_DECOMPOSITION)
+            result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_PARENT_DECOMPOSITION, entity_node)
+            if result_items is None:
+                return False
+            if not self.llm_answer_formatting:
+                return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+            result_string = "".join(f"{item}; " for item in result_items)
 
             answer_prompt = f"""
                     Раздел: "{entity_name}"
@@ -546,16 +1033,14 @@ class CallAgent(ScAgentClassic):
                     - (пусто)
                     """
             
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
         else:
             print(f"""Предметная область: Структура и Иерархия.
                       ОШИБКА: Никакой агент не был вызван.
                   """)
             return False
         
-    def description_and_characteristics(self, action_node, link_query, api_key):
+    def description_and_characteristics(self, action_node, link_query, llm_client):
         area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -664,59 +1149,42 @@ class CallAgent(ScAgentClassic):
           Если термин **ЗАДАН В ЛЮБЫХ КАВЫЧКАХ, ЕГО МЕНЯТЬ НЕ НАДО. ОН ДОЛЖЕН БЫТЬ ТАК.**
         """
 
-        agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-
-        self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
-        
-        try:
-            import json
-            decision_response_json = json.loads(agent_answer)
-            decision = decision_response_json.get("decision")
-            entity_name = decision_response_json.get("entity_name", "") 
-        except json.JSONDecodeError:
-            self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
-            decision = "general_query" 
-            entity_name = "" 
-            finish_action_with_status(action_node, False)
+        route = self.extract_decision(action_node, llm_client, area_description_prompt)
+        if route is None:
             return ScResult.ERROR
-        
+
+        decision, entity_name = route
+        prepared_answer = self.prepare_description_and_characteristics_answer(action_node, link_query, decision, entity_name)
+        return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+    def prepare_description_and_characteristics_answer(self, action_node, link_query, decision, entity_name, entity_node=None):
+        """Готовит ответ на запрос области "Описание и Характеристики" по уже известным decision и entity_name: готовый текст или промпт для модели"""
         if decision == "description_needed":
             self.logger.info(f"LLM решил вызвать агента для описания сущности. Сущность: '{entity_name}'")
 
-            node = self.find_entity_by_name(entity_name, action_node)
-            
-            find_description_action, find_description_result = execute_agent(
-                {
-                    node: False,
-                },
-                [
-                    CommonIdentifiers.ACTION,
-                    SearchModuleIdentifiers.ACTION_FIND_DESCRIPTION,
-                ]
-            )
+            node = self.find_entity_by_name(entity_name, action_node, entity_node)
+            if not isinstance(node, ScAddr):
+                return ScResult.ERROR
 
-            if not find_description_result:
-                self.logger.error("Не найдено описание узла: '{}'" @ entity_name)
+            info_link = search_description_link(node)
+
+            if info_link is None:
+                self.logger.error("Не найдено описание узла: '{}'".format(entity_name))
                 finish_action_with_status(action_node, False)
                 return ScResult.ERROR
-            
-            find_description_action_result = ScStructure(set_node=get_action_result(find_description_action))
-            info_link = next(iter(find_description_action_result))
 
             answer = get_link_content_data(info_link)
 
             answer_prompt = f"""Можешь очистить полученный ответ от HTML тегов и вывести финальный ответ для польователя. Ответ, который нужно очистить: {answer}"""
 
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
         else:
           print(f"""Предметная область: Структура и Иерархия.
                     ОШИБКА: Никакой агент не был вызван.
                 """)
           return False
         
-    def classification_and_categorization(self, action_node, link_query, api_key):
+    def classification_and_categorization(self, action_node, link_query, llm_client):
       area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -829,26 +1297,25 @@ class CallAgent(ScAgentClassic):
           Если термин **ЗАДАН В ЛЮБЫХ КАВЫЧКАХ, ЕГО МЕНЯТЬ НЕ НАДО. ОН ДОЛЖЕН БЫТЬ ТАК.**
         """
       
-      agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-
-      self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
-      
-      try:
-          import json
-          decision_response_json = json.loads(agent_answer)
-          decision = decision_response_json.get("decision")
-          entity_name = decision_response_json.get("entity_name", "") 
-      except json.JSONDecodeError:
-          self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
-          decision = "general_query" 
-          entity_name = "" 
-          finish_action_with_status(action_node, False)
+      route = self.extract_decision(action_node, llm_client, area_description_prompt)
+      if route is None:
           return ScResult.ERROR
-      
+
+      decision, entity_name = route
+      prepared_answer = self.prepare_classification_and_categorization_answer(action_node, link_query, decision, entity_name)
+      return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+    def prepare_classification_and_categorization_answer(self, action_node, link_query, decision, entity_name, entity_node=None):
+      """Готовит ответ на запрос области "Классификация и Категоризация" по уже известным decision и entity_name: готовый текст или промпт для модели"""
       if decision == "max_class_needed":
           self.logger.info(f"LLM решил вызвать агента для поиска максимального класса объектов исследования. Сущность: '{entity_name}'")
 
-          result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_MAX_CLASS)
+          result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_MAX_CLASS, entity_node)
+          if result_items is None:
+              return False
+          if not self.llm_answer_formatting:
+              return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+          result_string = "".join(f"{item}; " for item in result_items)
 
           answer_prompt = f"""
                   Сущность: "{entity_name}"
@@ -892,14 +1359,16 @@ class CallAgent(ScAgentClassic):
                   - (пусто)
                   """
           
-          answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-
-          print(answer_response)
-          return True
+          return PreparedAnswer(prompt=answer_prompt)
       elif decision == "not_max_class_needed":
           self.logger.info(f"LLM решил вызвать агента для поиска немаксимального класса объектов исследования. Сущность: '{entity_name}'")
 
-          result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_NOT_MAX_CLASS)
+          result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_NOT_MAX_CLASS, entity_node)
+          if result_items is None:
+              return False
+          if not self.llm_answer_formatting:
+              return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+          result_string = "".join(f"{item}; " for item in result_items)
 
           answer_prompt = f"""
                   Сущность: "{entity_name}"
@@ -943,17 +1412,14 @@ class CallAgent(ScAgentClassic):
                   - (пусто)
                   """
           
-          answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-
-          print(answer_response)
-          return True
+          return PreparedAnswer(prompt=answer_prompt)
       else:
           print(f"""Предметная область: Структура и Иерархия.
                     ОШИБКА: Никакой агент не был вызван.
                 """)
           return False
       
-    def semantic_relationships_and_knowledge(self, action_node, link_query, api_key):
+    def semantic_relationships_and_knowledge(self, action_node, link_query, llm_client):
         area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -1062,26 +1528,25 @@ class CallAgent(ScAgentClassic):
           Если термин **ЗАДАН В ЛЮБЫХ КАВЫЧКАХ, ЕГО МЕНЯТЬ НЕ НАДО. ОН ДОЛЖЕН БЫТЬ ТАК.**
         """
 
-        agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-
-        self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
-        
-        try:
-            import json
-            decision_response_json = json.loads(agent_answer)
-            decision = decision_response_json.get("decision")
-            entity_name = decision_response_json.get("entity_name", "") 
-        except json.JSONDecodeError:
-            self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
-            decision = "general_query" 
-            entity_name = "" 
-            finish_action_with_status(action_node, False)
+        route = self.extract_decision(action_node, llm_client, area_description_prompt)
+        if route is None:
             return ScResult.ERROR
-        
+
+        decision, entity_name = route
+        prepared_answer = self.prepare_semantic_relationships_and_knowledge_answer(action_node, link_query, decision, entity_name)
+        return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+    def prepare_semantic_relationships_and_knowledge_answer(self, action_node, link_query, decision, entity_name, entity_node=None):
+        """Готовит ответ на запрос области "Семантические Связи и Знания" по уже известным decision и entity_name: готовый текст или промпт для модели"""
         if decision == "key_sc_element_needed":
             self.logger.info(f"LLM решил вызвать агента для поиска ключевых sc-элементов. Сущность: '{entity_name}'")
 
-            result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_KEY_SC_ELEMENT)
+            result_items = self.call_agent_get_result_items(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_KEY_SC_ELEMENT, entity_node)
+            if result_items is None:
+                return False
+            if not self.llm_answer_formatting:
+                return PreparedAnswer(text=render_list_answer(decision, entity_name, result_items))
+            result_string = "".join(f"{item}; " for item in result_items)
 
             answer_prompt = f"""
                     Сущность: "{entity_name}"
@@ -1127,17 +1592,14 @@ class CallAgent(ScAgentClassic):
                     - (пусто)
                     """
             
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
         else:
           print(f"""Предметная область: Структура и Иерархия.
                   ОШИБКА: Никакой агент не был вызван.
               """)
           return False
         
-    def schemes_and_processes(self, action_node, link_query, api_key):
+    def schemes_and_processes(self, action_node, link_query, llm_client):
         area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -1250,68 +1712,42 @@ class CallAgent(ScAgentClassic):
           Если термин **ЗАДАН В ЛЮБЫХ КАВЫЧКАХ, ЕГО МЕНЯТЬ НЕ НАДО. ОН ДОЛЖЕН БЫТЬ ТАК.**
         """
 
-        agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-
-        self.logger.info(f"JSON ответ решения от LLM: {agent_answer}")
-        
-        try:
-            import json
-            decision_response_json = json.loads(agent_answer)
-            decision = decision_response_json.get("decision")
-            entity_name = decision_response_json.get("entity_name", "") 
-        except json.JSONDecodeError:
-            self.logger.error(f"Ошибка разбора JSON ответа LLM: {agent_answer}")
-            decision = "general_query" 
-            entity_name = "" 
-            finish_action_with_status(action_node, False)
+        route = self.extract_decision(action_node, llm_client, area_description_prompt)
+        if route is None:
             return ScResult.ERROR
-        
+
+        decision, entity_name = route
+        prepared_answer = self.prepare_schemes_and_processes_answer(action_node, link_query, decision, entity_name)
+        return self.deliver_answer(action_node, llm_client, prepared_answer)
+
+    def prepare_schemes_and_processes_answer(self, action_node, link_query, decision, entity_name, entity_node=None):
+        """Готовит ответ на запрос области "Схемы и Процессы" по уже известным decision и entity_name: готовый текст или промпт для модели"""
         if decision == "scheme_steps_needed":
             self.logger.info(f"LLM решил вызвать агента для поиска ключевых sc-элементов. Сущность: '{entity_name}'")
 
-            node = self.find_entity_by_name(entity_name, action_node)
+            node = self.find_entity_by_name(entity_name, action_node, entity_node)
+            if not isinstance(node, ScAddr):
+                return ScResult.ERROR
 
             # Вызов агента 
             
-            find_template_action, find_template_result = execute_agent(
-                {
-                    node: False,
-                },
-                [
-                    CommonIdentifiers.ACTION,
-                    SearchModuleIdentifiers.ACTION_FIND_STAGES_LIST,
-                ]
-            )
+            stages_graph = build_stages_graph(node, self.scheme_cache)
 
-            if not find_template_result:
-                self.logger.error("Не найдено описание узла: '{}'" @ entity_name)
+            if stages_graph is None:
+                self.logger.error("Не найдены этапы схемы: '{}'".format(entity_name))
                 finish_action_with_status(action_node, False)
                 return ScResult.ERROR
-        
-            find_template_action_result = get_action_result(find_template_action)
-            find_template_action_result_struct = ScStructure(set_node=find_template_action_result)
-            result_string_link = next(iter(find_template_action_result_struct))
-            result_string = get_link_content_data(result_string_link)
 
             # Окончен вызов агента
 
-            # result_string = self.call_agent_get_string_result(entity_name, action_node, SearchModuleIdentifiers.ACTION_FIND_STAGES_LIST)
-
-            # print("РЕЗУЛЬТАТЫ ПОИСКА: " + result_string)
-
             answer_prompt = f"""
                     Запрос пользователя: "{link_query}"
-                    Полученная информация: "{result_string}"
-
-                    Сначала идет номер этапа. Затем идет название этапа. И потом номер этапа, на который идет переход
+                    Этапы схемы: {stages_graph_to_json(stages_graph)}
 
                     Ты система интеллектуальной поддержки сотрудников. Сформируй на основе полученной ифнормации ответ для пользователя. Используй только полученную информацию.
                     """
             
-            answer_response = get_together_ai_response(api_key, answer_prompt).strip()
-
-            print(answer_response)
-            return True
+            return PreparedAnswer(prompt=answer_prompt)
         else:
             print(f"""Предметная область: Схемы и Процессы.
                   ОШИБКА: Никакой агент не был вызван.
@@ -1319,7 +1755,10 @@ class CallAgent(ScAgentClassic):
             return False
             
         
-    def general_questions(self, link_query, api_key):
+    def general_questions(self, action_node, link_query, llm_client):
+        return self.deliver_answer(action_node, llm_client, self.prepare_general_answer(link_query))
+
+    def prepare_general_answer(self, link_query):
         area_description_prompt = f"""
           Запрос пользователя: {link_query}
 
@@ -1330,6 +1769,4 @@ class CallAgent(ScAgentClassic):
           Дай прямой ответ в виде обычного текста.
           """
         
-        agent_answer = get_together_ai_response(api_key, area_description_prompt).strip()
-        print(agent_answer)
-        return True
\ No newline at end of file
+        return PreparedAnswer(prompt=area_description_prompt)
\ No newline at end of file
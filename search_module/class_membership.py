@@ -0,0 +1,69 @@
+from typing import Iterable, TypeVar
+
+from sc_client.models import ScAddr, ScTemplate
+from sc_client.constants import sc_types
+from sc_client.client import template_search
+
+
+T = TypeVar("T")
+
+
+def search_class_members(class_node: ScAddr, scope_node: ScAddr | None = None) -> set[ScAddr]:
+    """Все узлы-элементы класса одним поиском; scope_node ограничивает их элементами заданного множества"""
+    members_template = ScTemplate()
+    if scope_node is not None:
+        members_template.triple(
+            scope_node,
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            sc_types.NODE_VAR >> "element"
+        )
+        members_template.triple(
+            class_node,
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            "element"
+        )
+    else:
+        members_template.triple(
+            class_node,
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            sc_types.NODE_VAR >> "element"
+        )
+    return {result.get("element") for result in template_search(members_template)}
+
+
+def search_element_tags(element: ScAddr, class_tags: dict[ScAddr, T]) -> T | None:
+    """Метка одного элемента: один поиск всех классов, в которые он входит"""
+    classes_template = ScTemplate()
+    classes_template.triple(
+        sc_types.NODE_VAR >> "class",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        element
+    )
+    element_classes = {result.get("class") for result in template_search(classes_template)}
+    return next((tag for class_node, tag in class_tags.items() if class_node in element_classes), None)
+
+
+def classify_elements(
+    elements: Iterable[ScAddr],
+    class_tags: dict[ScAddr, T],
+    scope_node: ScAddr | None = None,
+) -> dict[ScAddr, T]:
+    """
+    Помечает элементы по принадлежности небольшому набору классов: класс -> метка.
+    Каждый класс просматривается одним поиском, поэтому число запросов не зависит от числа элементов.
+    Если элемент входит в несколько классов, берётся метка класса, идущего в class_tags раньше.
+    """
+    elements = set(elements)
+    tags = {}
+    # Для нескольких элементов дешевле искать классы каждого элемента, чем элементы каждого класса
+    if len(elements) < len(class_tags):
+        for element in elements:
+            tag = search_element_tags(element, class_tags)
+            if tag is not None:
+                tags[element] = tag
+        return tags
+
+    for class_node, tag in class_tags.items():
+        for element in search_class_members(class_node, scope_node) & elements:
+            tags.setdefault(element, tag)
+    return tags
@@ -33,39 +33,48 @@ class FindDescriptionAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         entity, = get_action_arguments(action_node, 1)
 
-        entity_template = ScTemplate()
-        entity_template.triple_with_relation(
-            sc_types.NODE_VAR >> "empty_node_1",
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            entity,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['rrel_key_sc_element']
-        )
-        entity_template.triple_with_relation(
-            sc_types.NODE_VAR >> "empty_node_2",
-            sc_types.EDGE_D_COMMON_VAR,
-            'empty_node_1',
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['nrel_sc_text_translation']
-        )
-        entity_template.triple_with_relation(
-            'empty_node_2',
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.LINK_VAR >> "description_link",
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['rrel_example']
-        )
-        entity_template.triple(
-            ScKeynodes['lang_ru'],
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            'description_link'
-        )
-
         assert entity.is_valid()
 
-        search_results = template_search(entity_template)
-        info_link = search_results[0].get('description_link')
+        info_link = search_description_link(entity)
+        if info_link is None:
+            return ScResult.ERROR
 
         create_action_result(action_node, info_link)
 
         return ScResult.OK
+
+
+def search_description_link(entity: ScAddr) -> ScAddr | None:
+    """Возвращает ссылку с описанием сущности на русском языке"""
+    entity_template = ScTemplate()
+    entity_template.triple_with_relation(
+        sc_types.NODE_VAR >> "empty_node_1",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        entity,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['rrel_key_sc_element']
+    )
+    entity_template.triple_with_relation(
+        sc_types.NODE_VAR >> "empty_node_2",
+        sc_types.EDGE_D_COMMON_VAR,
+        'empty_node_1',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['nrel_sc_text_translation']
+    )
+    entity_template.triple_with_relation(
+        'empty_node_2',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.LINK_VAR >> "description_link",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['rrel_example']
+    )
+    entity_template.triple(
+        ScKeynodes['lang_ru'],
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        'description_link'
+    )
+
+    search_results = template_search(entity_template)
+    if not search_results:
+        return None
+    return search_results[0].get('description_link')
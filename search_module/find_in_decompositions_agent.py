@@ -35,26 +35,32 @@ class FindDecompositionsAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         recipe, = get_action_arguments(action_node, 1)
 
-        recipe_template = ScTemplate()
-        recipe_template.triple_with_relation(
-            sc_types.NODE_VAR >> 'tuple_node',
-            sc_types.EDGE_D_COMMON_VAR,
-            recipe,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['nrel_section_decomposition']
-        )
-        recipe_template.triple(
-            'tuple_node',
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.NODE_VAR >> 'decompositions'
-        )
-
-        search_results = template_search(recipe_template)
-
-        self.logger.info(f'{len(search_results)}')
-
-        result_set = ScSet(*(result.get('decompositions') for result in search_results))
+        decompositions = search_decompositions(recipe)
+
+        self.logger.info(f'{len(decompositions)}')
+
+        result_set = ScSet(*decompositions)
 
         create_action_result(action_node, result_set.set_node)
 
-        return ScResult.OK
\ No newline at end of file
+        return ScResult.OK
+
+
+def search_decompositions(recipe: ScAddr) -> list[ScAddr]:
+    """Возвращает элементы декомпозиции раздела по отношению nrel_section_decomposition"""
+    recipe_template = ScTemplate()
+    recipe_template.triple_with_relation(
+        sc_types.NODE_VAR >> 'tuple_node',
+        sc_types.EDGE_D_COMMON_VAR,
+        recipe,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['nrel_section_decomposition']
+    )
+    recipe_template.triple(
+        'tuple_node',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> 'decompositions'
+    )
+
+    search_results = template_search(recipe_template)
+    return [result.get('decompositions') for result in search_results]
@@ -35,21 +35,27 @@ class FindIncludedChildrenAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         recipe, = get_action_arguments(action_node, 1)
 
-        recipe_template = ScTemplate()
-        recipe_template.triple_with_relation(
-            recipe,
-            sc_types.EDGE_D_COMMON_VAR,
-            sc_types.NODE_VAR >> 'inclusions',
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['nrel_inclusion']
-        )
+        inclusions = search_included_children(recipe)
 
-        search_results = template_search(recipe_template)
+        self.logger.info(f'{len(inclusions)}')
 
-        self.logger.info(f'{len(search_results)}')
-
-        result_set = ScSet(*(result.get('inclusions') for result in search_results))
+        result_set = ScSet(*inclusions)
         create_action_result(action_node, result_set.set_node)
             
 
-        return ScResult.OK
\ No newline at end of file
+        return ScResult.OK
+
+
+def search_included_children(recipe: ScAddr) -> list[ScAddr]:
+    """Возвращает дочерние сущности узла по отношению nrel_inclusion"""
+    recipe_template = ScTemplate()
+    recipe_template.triple_with_relation(
+        recipe,
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> 'inclusions',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['nrel_inclusion']
+    )
+
+    search_results = template_search(recipe_template)
+    return [result.get('inclusions') for result in search_results]
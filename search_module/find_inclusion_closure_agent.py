@@ -0,0 +1,145 @@
+import json
+import logging
+from sc_client.models import ScAddr, ScTemplate
+from sc_client.constants import sc_types
+from sc_client.client import template_search, delete_elements
+from sc_kpm import ScAgentClassic, ScResult
+from sc_kpm.utils import create_link, get_link_content_data
+from sc_kpm.utils.action_utils import (
+    finish_action_with_status,
+    get_action_arguments,
+    generate_action_result
+)
+from sc_kpm import ScKeynodes
+from sc_kpm.sc_sets import ScSet
+
+from .search_module_idtfs import SearchModuleIdentifiers
+from .label_resolver import main_idtf_labels
+
+logging.basicConfig(
+    level=logging.INFO, 
+    format="%(asctime)s | %(name)s | %(message)s", 
+    datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+CLOSURE_DIRECTIONS = ("children", "parents")
+DEFAULT_MAX_DEPTH = 10
+
+
+class FindInclusionClosureAgent(ScAgentClassic):
+    def __init__(self):
+        super().__init__(SearchModuleIdentifiers.ACTION_FIND_INCLUSION_CLOSURE)
+
+    def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
+        result = self.run(action_element)
+        is_successful = result == ScResult.OK
+        finish_action_with_status(action_element, is_successful)
+        self.logger.info("Agent finished: %s", "success" if is_successful else "fail")
+        return result
+
+    def run(self, action_node: ScAddr) -> ScResult:
+        # Второй, необязательный аргумент - ссылка с параметрами, например {"direction": "parents", "max_depth": 3}
+        recipe, params_link = get_action_arguments(action_node, 2)
+
+        params = {}
+        if params_link.is_valid():
+            try:
+                params = json.loads(get_link_content_data(params_link))
+            except (TypeError, json.JSONDecodeError):
+                self.logger.error("Closure parameters are not valid JSON")
+                return ScResult.ERROR_INVALID_PARAMS
+
+        direction = params.get("direction", "children")
+        max_depth = params.get("max_depth", DEFAULT_MAX_DEPTH)
+        if direction not in CLOSURE_DIRECTIONS or not isinstance(max_depth, int) or max_depth < 1:
+            self.logger.error("Invalid closure parameters: %s", params)
+            return ScResult.ERROR_INVALID_PARAMS
+
+        closure = search_inclusion_closure(recipe, direction, max_depth)
+
+        self.logger.info(f'{len(closure)}')
+
+        link = create_link(json.dumps(closure_to_tree(recipe, direction, max_depth, closure), ensure_ascii=False, separators=(",", ":")))
+        generate_action_result(action_node, link)
+
+        return ScResult.OK
+
+
+def search_inclusion_closure(recipe: ScAddr, direction: str = "children", max_depth: int = DEFAULT_MAX_DEPTH) -> list[tuple[ScAddr, int, ScAddr]]:
+    """
+    Возвращает все сущности, достижимые из узла по nrel_inclusion (дочерние или родительские),
+    не глубже max_depth: (сущность, глубина, сущность уровнем выше). Уровень раскрывается одним поиском.
+    """
+    closure = []
+    visited = {recipe}
+    frontier = [recipe]
+    depth = 0
+    while frontier and depth < max_depth:
+        depth += 1
+        next_frontier = []
+        for source, target in search_inclusion_pairs(frontier, direction):
+            if target in visited:
+                continue
+            visited.add(target)
+            closure.append((target, depth, source))
+            next_frontier.append(target)
+        frontier = next_frontier
+    return closure
+
+
+def search_inclusion_pairs(nodes: list[ScAddr], direction: str) -> list[tuple[ScAddr, ScAddr]]:
+    """Пары (узел, соседняя сущность) по nrel_inclusion для всех узлов сразу"""
+    if len(nodes) > 1:
+        # Несколько узлов ищутся через временное множество, которое затем удаляется
+        nodes_set = ScSet(*nodes)
+        try:
+            return _search_inclusion_pairs(nodes_set.set_node, direction, is_set=True)
+        finally:
+            delete_elements(nodes_set.set_node)
+    return _search_inclusion_pairs(nodes[0], direction)
+
+
+def _search_inclusion_pairs(node: ScAddr, direction: str, is_set: bool = False) -> list[tuple[ScAddr, ScAddr]]:
+    inclusion_template = ScTemplate()
+    source = node
+    if is_set:
+        inclusion_template.triple(
+            node,
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            sc_types.NODE_VAR >> 'source'
+        )
+        source = 'source'
+
+    if direction == "children":
+        inclusion_template.triple_with_relation(
+            source,
+            sc_types.EDGE_D_COMMON_VAR,
+            sc_types.NODE_VAR >> 'inclusion',
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            ScKeynodes['nrel_inclusion']
+        )
+    else:
+        inclusion_template.triple_with_relation(
+            sc_types.NODE_VAR >> 'inclusion',
+            sc_types.EDGE_D_COMMON_VAR,
+            source,
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            ScKeynodes['nrel_inclusion']
+        )
+
+    search_results = template_search(inclusion_template)
+    return [(result.get('source') if is_set else node, result.get('inclusion')) for result in search_results]
+
+
+def closure_to_tree(recipe: ScAddr, direction: str, max_depth: int, closure: list[tuple[ScAddr, int, ScAddr]]) -> dict:
+    """Дерево для результата: сущности с основными идентификаторами, глубиной и ключом сущности уровнем выше"""
+    labels = main_idtf_labels.resolve_many([recipe, *(node for node, _, _ in closure)])
+    return {
+        "root": {"key": str(recipe.value), "label": labels.get(recipe)},
+        "direction": direction,
+        "max_depth": max_depth,
+        "nodes": [
+            {"key": str(node.value), "label": labels.get(node), "depth": depth, "parent": str(parent.value)}
+            for node, depth, parent in closure
+        ],
+    }
@@ -0,0 +1,105 @@
+import logging
+from sc_client.models import ScAddr, ScTemplate
+from sc_client.constants import sc_types
+from sc_client.client import template_search
+
+from sc_kpm import ScAgentClassic, ScResult
+from sc_kpm.sc_sets import ScSet
+from sc_kpm.utils.action_utils import (
+    create_action_result,
+    finish_action_with_status,
+    get_action_arguments,
+)
+from sc_kpm import ScKeynodes
+
+from .search_module_idtfs import SearchModuleIdentifiers
+from .label_resolver import DEFAULT_LANGUAGES, main_idtf_labels
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
+)
+
+
+class FindInfoBatchAgent(ScAgentClassic):
+    def __init__(self):
+        super().__init__(SearchModuleIdentifiers.ACTION_FIND_INFO_BATCH)
+
+    def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
+        result = self.run(action_element)
+        is_successful = result == ScResult.OK
+        finish_action_with_status(action_element, is_successful)
+        self.logger.info("FindInfoBatchAgent finished %s",
+                         "successfully" if is_successful else "unsuccessfully")
+        return result
+
+    def run(self, action_node: ScAddr) -> ScResult:
+        elements_set_node, = get_action_arguments(action_node, 1)
+
+        assert elements_set_node.is_valid()
+
+        elements = list(ScSet(set_node=elements_set_node))
+        info_links = search_elements_main_idtf_links(elements)
+
+        self.logger.info(f'{len(info_links)}')
+        if len(info_links) < len(elements):
+            self.logger.warning("%d elements have no main identifier in %s",
+                                len(elements) - len(info_links), ", ".join(DEFAULT_LANGUAGES))
+
+        # Результат - пары "элемент => sc-ссылка" по nrel_main_idtf, чтобы было видно, какая ссылка к какому элементу
+        pairs = search_main_idtf_pairs(elements_set_node, info_links)
+        create_action_result(
+            action_node, ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF], *(element for pair in pairs for element in pair))
+
+        return ScResult.OK
+
+
+def search_elements_main_idtf_links(elements: list[ScAddr], languages: tuple[str, ...] | None = None) -> dict[ScAddr, ScAddr]:
+    """
+    Возвращает ссылки с основными идентификаторами элементов (элемент -> sc-ссылка) на первом доступном языке
+    из languages (по умолчанию - lang_ru, затем lang_en). Подписи всех элементов ищутся одним поиском
+    """
+    return main_idtf_labels.resolve_many_links(elements, languages)
+
+
+def search_main_idtf_pairs(
+    elements_set_node: ScAddr, info_links: dict[ScAddr, ScAddr]
+) -> list[tuple[ScAddr, ScAddr, ScAddr, ScAddr]]:
+    """Конструкции "элемент => ссылка" для выбранных ссылок: (элемент, дуга, sc-ссылка, дуга от nrel_main_idtf)"""
+    pairs_template = ScTemplate()
+    pairs_template.triple(
+        elements_set_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> 'element'
+    )
+    pairs_template.quintuple(
+        'element',
+        sc_types.EDGE_D_COMMON_VAR >> 'idtf_arc',
+        sc_types.LINK_VAR >> 'info_link',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM >> 'relation_arc',
+        ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF],
+    )
+
+    pairs = []
+    for result in template_search(pairs_template):
+        element, info_link = result.get('element'), result.get('info_link')
+        if info_links.get(element) == info_link:
+            pairs.append((element, result.get('idtf_arc'), info_link, result.get('relation_arc')))
+    return pairs
+
+
+def get_result_main_idtf_links(result_node: ScAddr) -> dict[ScAddr, ScAddr]:
+    """Читает результат FindInfoBatchAgent: элемент -> sc-ссылка с основным идентификатором"""
+    pairs_template = ScTemplate()
+    pairs_template.quintuple(
+        sc_types.NODE_VAR >> 'element',
+        sc_types.EDGE_D_COMMON_VAR >> 'idtf_arc',
+        sc_types.LINK_VAR >> 'info_link',
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF],
+    )
+    pairs_template.triple(
+        result_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        'idtf_arc'
+    )
+    return {result.get('element'): result.get('info_link') for result in template_search(pairs_template)}
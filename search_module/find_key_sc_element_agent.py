@@ -36,27 +36,15 @@ class FindKeyScElementAgent(ScAgentClassic):
         # 1. Получаем входной узел (для которого ищем ключевой элемент)
         input_node, = get_action_arguments(action_node, 1)
 
-        # 2. Создаем шаблон для поиска ключевого элемента
-        key_sc_element_template = ScTemplate()
-        key_sc_element_template = ScTemplate()
-        key_sc_element_template.triple_with_relation(
-            input_node,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.NODE_VAR >> "key_element",  # Исходный узел
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,  # Дуга (направленная связь)
-            ScKeynodes['rrel_key_sc_element']  # Отношение "ключевой элемент"
-        )
+        key_elements = search_key_sc_elements(input_node)
 
-        # 3. Ищем совпадения в памяти
-        search_results = template_search(key_sc_element_template)
-
-        if not search_results:
+        if not key_elements:
             self.logger.warning("Key element not found for node %s", input_node)
             return ScResult.ERROR
 
-        self.logger.info(f'{len(search_results)}')
+        self.logger.info(f'{len(key_elements)}')
 
-        result_set = ScSet(*(result.get('key_element') for result in search_results))
+        result_set = ScSet(*key_elements)
         
         create_action_result(action_node, result_set.set_node)
 
@@ -71,3 +59,20 @@ class FindKeyScElementAgent(ScAgentClassic):
         #         self.logger.info(f'{get_element_system_identifier(trg)}') """
         
         return ScResult.OK
+
+
+def search_key_sc_elements(input_node: ScAddr) -> list[ScAddr]:
+    """Возвращает ключевые sc-элементы узла"""
+    # 2. Создаем шаблон для поиска ключевого элемента
+    key_sc_element_template = ScTemplate()
+    key_sc_element_template.triple_with_relation(
+        input_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> "key_element",  # Исходный узел
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,  # Дуга (направленная связь)
+        ScKeynodes['rrel_key_sc_element']  # Отношение "ключевой элемент"
+    )
+
+    # 3. Ищем совпадения в памяти
+    search_results = template_search(key_sc_element_template)
+    return [result.get('key_element') for result in search_results]
@@ -35,25 +35,15 @@ class FindMaxClassAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         input_node, = get_action_arguments(action_node, 1)
 
-        max_class_template = ScTemplate()
-        max_class_template = ScTemplate()
-        max_class_template.triple_with_relation(
-            input_node,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.NODE_VAR >> "max_class",  # Исходный узел
-            sc_types.EDGE_ACCESS_VAR_POS_PERM, 
-            ScKeynodes['rrel_maximum_studied_object_class']
-        )
+        max_classes = search_max_classes(input_node)
 
-        search_results = template_search(max_class_template)
-
-        if not search_results:
+        if not max_classes:
             self.logger.warning("Maximum studied object class not found for node %s", input_node)
             return ScResult.ERROR
 
-        self.logger.info(f'{len(search_results)}')
+        self.logger.info(f'{len(max_classes)}')
 
-        result_set = ScSet(*(result.get('max_class') for result in search_results))
+        result_set = ScSet(*max_classes)
         create_action_result(action_node, result_set.set_node)
 
         # for result in search_results:
@@ -67,3 +57,18 @@ class FindMaxClassAgent(ScAgentClassic):
         #         self.logger.info(f'{get_element_system_identifier(trg)}') """
         
         return ScResult.OK
+
+
+def search_max_classes(input_node: ScAddr) -> list[ScAddr]:
+    """Возвращает максимальные классы объектов исследования узла"""
+    max_class_template = ScTemplate()
+    max_class_template.triple_with_relation(
+        input_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> "max_class",  # Исходный узел
+        sc_types.EDGE_ACCESS_VAR_POS_PERM, 
+        ScKeynodes['rrel_maximum_studied_object_class']
+    )
+
+    search_results = template_search(max_class_template)
+    return [result.get('max_class') for result in search_results]
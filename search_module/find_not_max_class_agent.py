@@ -35,25 +35,15 @@ class FindNotMaxClassAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         input_node, = get_action_arguments(action_node, 1)
 
-        not_max_class_template = ScTemplate()
-        not_max_class_template = ScTemplate()
-        not_max_class_template.triple_with_relation(
-            input_node,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.NODE_VAR >> "not_max_class",  # Исходный узел
-            sc_types.EDGE_ACCESS_VAR_POS_PERM, 
-            ScKeynodes['rrel_not_maximum_studied_object_class']
-        )
+        not_max_classes = search_not_max_classes(input_node)
 
-        search_results = template_search(not_max_class_template)
-
-        if not search_results:
+        if not not_max_classes:
             self.logger.warning("Not maximum studied object class not found for node %s", input_node)
             return ScResult.ERROR
 
-        self.logger.info(f'{len(search_results)}')
+        self.logger.info(f'{len(not_max_classes)}')
 
-        result_set = ScSet(*(result.get('not_max_class') for result in search_results))
+        result_set = ScSet(*not_max_classes)
         create_action_result(action_node, result_set.set_node)
 
         # for result in search_results:
@@ -67,3 +57,18 @@ class FindNotMaxClassAgent(ScAgentClassic):
         #         self.logger.info(f'{get_element_system_identifier(trg)}') """
         
         return ScResult.OK
+
+
+def search_not_max_classes(input_node: ScAddr) -> list[ScAddr]:
+    """Возвращает немаксимальные классы объектов исследования узла"""
+    not_max_class_template = ScTemplate()
+    not_max_class_template.triple_with_relation(
+        input_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> "not_max_class",  # Исходный узел
+        sc_types.EDGE_ACCESS_VAR_POS_PERM, 
+        ScKeynodes['rrel_not_maximum_studied_object_class']
+    )
+
+    search_results = template_search(not_max_class_template)
+    return [result.get('not_max_class') for result in search_results]
@@ -35,29 +35,15 @@ class FindParentDecompositionAgent(ScAgentClassic):
     def run(self, action_node: ScAddr) -> ScResult:
         input_node, = get_action_arguments(action_node, 1)
 
-        parent_decomposition_template = ScTemplate()
-        parent_decomposition_template.triple(
-            sc_types.NODE_VAR >> "tuple_node",
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            input_node
-        )
-        parent_decomposition_template.triple_with_relation(
-            "tuple_node",
-            sc_types.EDGE_D_COMMON_VAR,
-            sc_types.NODE_VAR >> "parent_decomposition",
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['nrel_section_decomposition']
-        )
+        parent_decompositions = search_parent_decompositions(input_node)
 
-        search_results = template_search(parent_decomposition_template)
-
-        if not search_results:
+        if not parent_decompositions:
             self.logger.warning("Parent decomposition not found for node %s", input_node)
             return ScResult.ERROR
 
-        self.logger.info(f'{len(search_results)}')
+        self.logger.info(f'{len(parent_decompositions)}')
 
-        result_set = ScSet(*(result.get('parent_decomposition') for result in search_results))
+        result_set = ScSet(*parent_decompositions)
         create_action_result(action_node, result_set.set_node)
 
         # for result in search_results:
@@ -71,3 +57,23 @@ class FindParentDecompositionAgent(ScAgentClassic):
         #         self.logger.info(f'{get_element_system_identifier(trg)}') """
         
         return ScResult.OK
+
+
+def search_parent_decompositions(input_node: ScAddr) -> list[ScAddr]:
+    """Возвращает родительские декомпозиции раздела"""
+    parent_decomposition_template = ScTemplate()
+    parent_decomposition_template.triple(
+        sc_types.NODE_VAR >> "tuple_node",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        input_node
+    )
+    parent_decomposition_template.triple_with_relation(
+        "tuple_node",
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> "parent_decomposition",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes['nrel_section_decomposition']
+    )
+
+    search_results = template_search(parent_decomposition_template)
+    return [result.get('parent_decomposition') for result in search_results]
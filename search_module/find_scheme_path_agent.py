@@ -0,0 +1,148 @@
+import json
+import logging
+
+from sc_client.models import ScAddr
+from sc_kpm import ScAgentClassic, ScResult
+from sc_kpm.utils import create_link, get_link_content_data
+from sc_kpm.utils.action_utils import (
+    finish_action_with_status,
+    get_action_arguments,
+    generate_action_result,
+)
+
+from .search_module_idtfs import SearchModuleIdentifiers
+from .identifier_index import normalize_identifier
+from .scheme_cache import CompiledScheme, SchemeCache
+from .find_stages_list_agent import get_compiled_scheme
+from .find_stages_graph_agent import stages_graph_to_json
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(name)s | %(message)s",
+    datefmt="[%d-%b-%y %H:%M:%S]",
+)
+
+# Типы запросов и обязательные параметры: номер или подпись этапа ("from", "to") либо вид "start"/"finish"
+SCHEME_QUERY_PARAMS = {
+    "shortest_path": ("from", "to"),
+    "reachable": ("from",),
+    "successors": ("from",),
+    "predecessors": ("from",),
+    "branches": ("from",),
+}
+
+
+class FindSchemePathAgent(ScAgentClassic):
+    def __init__(self, scheme_cache: SchemeCache | None = None):
+        super().__init__(SearchModuleIdentifiers.ACTION_FIND_SCHEME_PATH)  # Регистрируем действие
+        self.scheme_cache = scheme_cache
+
+    def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
+        result = self.run(action_element)
+        is_successful = result == ScResult.OK
+        finish_action_with_status(action_element, is_successful)
+        self.logger.info("Agent finished: %s", "success" if is_successful else "fail")
+        return result
+
+    def run(self, action_node: ScAddr) -> ScResult:
+        # Аргументы: узел схемы и ссылка с запросом в JSON, например {"type": "shortest_path", "from": "start", "to": "finish"}
+        input_node, query_link = get_action_arguments(action_node, 2)
+
+        try:
+            query = json.loads(get_link_content_data(query_link))
+        except (TypeError, json.JSONDecodeError):
+            self.logger.error("Scheme query is not valid JSON")
+            return ScResult.ERROR_INVALID_PARAMS
+
+        compiled = get_compiled_scheme(input_node, self.scheme_cache)
+        if compiled is None:
+            return ScResult.ERROR_INVALID_PARAMS
+
+        query_result = query_scheme(compiled, query)
+        if query_result is None:
+            return ScResult.ERROR_INVALID_PARAMS
+
+        link = create_link(stages_graph_to_json(query_result))
+        generate_action_result(action_node, link)
+
+        return ScResult.OK
+
+
+def query_scheme(compiled: CompiledScheme, query: dict) -> dict | None:
+    """
+    Выполняет запрос к графу схемы. Возвращает номера найденных этапов ("result") и только затронутую
+    часть схемы ("stages") или None, если запрос некорректен.
+    """
+    query_type = query.get("type") if isinstance(query, dict) else None
+    if query_type not in SCHEME_QUERY_PARAMS:
+        logging.error(f"Unknown scheme query type: {query_type}")
+        return None
+
+    stage_ids = {}
+    for param in SCHEME_QUERY_PARAMS[query_type]:
+        stage_id = resolve_stage(compiled, query.get(param))
+        if stage_id is None:
+            logging.error(f"Stage not found for '{param}': {query.get(param)}")
+            return None
+        stage_ids[param] = stage_id
+
+    graph = compiled.graph
+    source_id = stage_ids["from"]
+    if query_type == "shortest_path":
+        result = graph.shortest_path(source_id, stage_ids["to"]) or []
+        subgraph_ids = set(result)
+    elif query_type == "reachable":
+        result = graph.reachable(source_id)
+        subgraph_ids = set(result)
+    elif query_type == "successors":
+        result = list(graph.successors[source_id])
+        subgraph_ids = {source_id, *result}
+    elif query_type == "predecessors":
+        result = list(graph.predecessors[source_id])
+        subgraph_ids = {source_id, *result}
+    else:
+        result = graph.branches(source_id)
+        subgraph_ids = {source_id, *(node_id for branch in result for node_id in branch)}
+
+    positions = compiled.positions
+    if query_type == "branches":
+        result = [[positions[node_id] for node_id in branch] for branch in result]
+    else:
+        result = [positions[node_id] for node_id in result]
+
+    return {
+        "type": query_type,
+        "result": result,
+        "stages": [
+            compiled.stage_dict(node_id, subgraph_ids)
+            for node_id in sorted(subgraph_ids, key=positions.__getitem__)
+        ],
+    }
+
+
+def resolve_stage(compiled: CompiledScheme, stage_ref) -> int | None:
+    """
+    Находит узел графа по номеру этапа (как в списке этапов), виду ("start", "finish")
+    или подписи этапа: сначала точное совпадение без учёта регистра, затем единственное вхождение
+    """
+    if isinstance(stage_ref, int) and not isinstance(stage_ref, bool):
+        return compiled.order[stage_ref] if 0 <= stage_ref < len(compiled.order) else None
+    if not isinstance(stage_ref, str) or not stage_ref.strip():
+        return None
+
+    stage_ref = normalize_identifier(stage_ref)
+    kind_matches, exact_matches, partial_matches = [], [], []
+    for node_id in compiled.order:
+        node = compiled.graph.nodes[node_id]
+        label = normalize_identifier(compiled.scheme.get_label(node) or "")
+        if stage_ref == compiled.stage_kind(node_id):
+            kind_matches.append(node_id)
+        if label == stage_ref:
+            exact_matches.append(node_id)
+        elif label and stage_ref in label:
+            partial_matches.append(node_id)
+
+    for matches in (exact_matches, kind_matches, partial_matches):
+        if len(matches) == 1:
+            return matches[0]
+    return None
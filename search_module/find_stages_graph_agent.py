@@ -0,0 +1,57 @@
+import json
+import logging
+
+from sc_client.models import ScAddr
+from sc_kpm import ScAgentClassic, ScResult
+from sc_kpm.utils import create_link
+from sc_kpm.utils.action_utils import (
+    finish_action_with_status,
+    get_action_arguments,
+    generate_action_result,
+)
+
+from .search_module_idtfs import SearchModuleIdentifiers
+from .scheme_cache import SchemeCache
+from .find_stages_list_agent import get_compiled_scheme
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s | %(name)s | %(message)s",
+    datefmt="[%d-%b-%y %H:%M:%S]",
+)
+
+
+class FindStagesGraphAgent(ScAgentClassic):
+    def __init__(self, scheme_cache: SchemeCache | None = None):
+        super().__init__(SearchModuleIdentifiers.ACTION_FIND_STAGES_GRAPH)  # Регистрируем действие
+        self.scheme_cache = scheme_cache
+
+    def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
+        result = self.run(action_element)
+        is_successful = result == ScResult.OK
+        finish_action_with_status(action_element, is_successful)
+        self.logger.info("Agent finished: %s", "success" if is_successful else "fail")
+        return result
+
+    def run(self, action_node: ScAddr) -> ScResult:
+        input_node, = get_action_arguments(action_node, 1)
+
+        stages_graph = build_stages_graph(input_node, self.scheme_cache)
+        if stages_graph is None:
+            return ScResult.ERROR_INVALID_PARAMS
+
+        link = create_link(stages_graph_to_json(stages_graph))
+        generate_action_result(action_node, link)
+
+        return ScResult.OK
+
+
+def build_stages_graph(input_node: ScAddr, scheme_cache: SchemeCache | None = None) -> dict | None:
+    """Возвращает этапы схемы в структурированном виде или None, если у схемы нет единственной точки начала"""
+    compiled = get_compiled_scheme(input_node, scheme_cache)
+    return compiled.to_dict() if compiled is not None else None
+
+
+def stages_graph_to_json(stages_graph: dict) -> str:
+    """Компактный JSON: без пробелов и без экранирования кириллицы"""
+    return json.dumps(stages_graph, ensure_ascii=False, separators=(",", ":"))
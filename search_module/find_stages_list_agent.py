@@ -1,20 +1,23 @@
+import json
 import logging
-from dataclasses import dataclass
 
 from sc_client.models import ScAddr, ScTemplate, ScLinkContent, ScLinkContentType, ScConstruction
 from sc_client.constants import sc_types, sc_type
 from sc_client.client import template_search, generate_elements
 from sc_kpm import ScKeynodes, ScAgentClassic, ScResult
-from sc_kpm.identifiers import Idtf
 from sc_kpm.sc_sets import ScSet, ScStructure
-from sc_kpm.utils import get_element_system_identifier, search_element_by_non_role_relation, get_link_content_data, create_link
+from sc_kpm.utils import search_element_by_non_role_relation, get_link_content_data, create_link
 from sc_kpm.utils.action_utils import (
     finish_action_with_status,
     get_action_arguments,
     generate_action_result,
 )
 
-from .search_module_idtfs import SearchModuleIdentifiers
+from .search_module_idtfs import SearchModuleIdentifiers, FindStagesListIdentifiers
+from .scheme_loader import load_scheme
+from .scheme_graph import SchemeGraph
+from .scheme_cache import CompiledScheme, SchemeCache
+from .scheme_versions import SchemeVersions
 
 logging.basicConfig(
     level=logging.DEBUG,
@@ -22,21 +25,15 @@ logging.basicConfig(
     datefmt="[%d-%b-%y %H:%M:%S]",
 )
 
-
-@dataclass(frozen=True)
-class FindStagesListIdentifiers:
-    PROCEDURE_STARTING_IMAGE: Idtf = "procedure_starting_image"
-    CHOICE_OF_EXECUTION_SEQUENCE_IMAGE: Idtf = "choice_of_execution_sequence_image"
-    OPERATION_IMAGE: Idtf = "operation_image"
-    PROCEDURE_FINISHING_IMAGE: Idtf = "procedure_finishing_image"
-    TRANSITION_CONDITION_IMAGE: Idtf = "transition_condition_image"
-    NREL_INCIDENCE: Idtf = "nrel_incidence"
-    NREL_IMAGE_SIGN: Idtf = "nrel_image_sign"
+# Сколько узлов вне структуры схемы загружать одновременно
+SCHEME_LOAD_MAX_IN_FLIGHT = 8
 
 
 class FindStagesListAgent(ScAgentClassic):
-    def __init__(self):
+    def __init__(self, scheme_cache: SchemeCache | None = None, scheme_versions: SchemeVersions | None = None):
         super().__init__(SearchModuleIdentifiers.ACTION_FIND_STAGES_LIST)  # Регистрируем действие
+        self.scheme_cache = scheme_cache
+        self.scheme_versions = scheme_versions if scheme_versions is not None else SchemeVersions()
 
     def on_event(self, event_element: ScAddr, event_edge: ScAddr, action_element: ScAddr) -> ScResult:
         result = self.run(action_element)
@@ -47,96 +44,23 @@ class FindStagesListAgent(ScAgentClassic):
 
     def run(self, action_node: ScAddr) -> ScResult:
         # 1. Получаем входной узел (для которого ищем ключевой элемент)
-        input_node, = get_action_arguments(action_node, 1)
-
-        scheme_structure = ScStructure(set_node=input_node)
-
-        start_image_template = ScTemplate()
-        start_image_template.triple(
-            scheme_structure.set_node,
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            sc_types.NODE_VAR >> "start_procedure_node"
-        )
-
-        start_image_template.triple(
-            ScKeynodes[FindStagesListIdentifiers.PROCEDURE_STARTING_IMAGE],
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            "start_procedure_node"
-        )
-
-        start_image_template_results = template_search(start_image_template)
-
-        if len(start_image_template_results) > 1:
-            logging.error("Слишком много точек начала процедуры.")
-            return ScResult.ERROR_INVALID_PARAMS
-        if len(start_image_template_results) < 1:
-            logging.error("Меньше 1 параметра начала процедуры.")
+        # Второй, необязательный аргумент - ссылка с токеном версии схемы, полученным ранее (или пустая):
+        # тогда результат - JSON с новым токеном и только изменениями с той версии
+        input_node, version_link = get_action_arguments(action_node, 2)
+
+        if version_link.is_valid():
+            compiled = get_compiled_scheme(input_node, self.scheme_cache)
+            if compiled is None:
+                return ScResult.ERROR_INVALID_PARAMS
+            base_version = (get_link_content_data(version_link) or "").strip()
+            changes = self.scheme_versions.changes_since(input_node, compiled, base_version)
+            link = create_link(json.dumps(changes, ensure_ascii=False, separators=(",", ":")))
+            generate_action_result(action_node, link)
+            return ScResult.OK
+
+        result_string = build_stages_list(input_node, self.scheme_cache)
+        if result_string is None:
             return ScResult.ERROR_INVALID_PARAMS
-        
-        start_image_node = start_image_template_results[0].get("start_procedure_node")
-
-        scheme_dict = {}
-        order = []
-        stack = [start_image_node]
-        
-        while stack:
-            current_node = stack.pop()
-
-            logging.debug(f'(---) Process node: {get_element_system_identifier(current_node)}')
-
-            if current_node in order:
-                continue
-
-            order.append(current_node)
-
-            next_node_template = ScTemplate()
-            next_node_template.quintuple(
-                current_node,
-                sc_types.EDGE_D_COMMON_VAR,
-                sc_types.NODE_VAR >> "connection_image_node",
-                sc_types.EDGE_ACCESS_VAR_POS_PERM,
-                ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
-            )
-
-            next_node_template.quintuple(
-                "connection_image_node",
-                sc_types.EDGE_D_COMMON_VAR,
-                sc_types.NODE_VAR >> "next_node",
-                sc_types.EDGE_ACCESS_VAR_POS_PERM,
-                ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
-            )
-
-            next_node_template_results = template_search(next_node_template)
-            next_nodes = [result.get("next_node") for result in next_node_template_results]
-            scheme_dict[current_node] = next_nodes
-            stack += next_nodes 
-
-        result_strings = []
-        for i, node in enumerate(order):
-            node_string = f'{i}: '
-            node_classes = get_node_classes(node)
-            
-            if ScKeynodes[FindStagesListIdentifiers.PROCEDURE_STARTING_IMAGE] in node_classes:
-                node_string += 'Начало'
-            if ScKeynodes[FindStagesListIdentifiers.CHOICE_OF_EXECUTION_SEQUENCE_IMAGE] in node_classes:
-                node_string += 'Выбор'
-            if ScKeynodes[FindStagesListIdentifiers.OPERATION_IMAGE] in node_classes:
-                node_string += get_idtf(node)
-            if ScKeynodes[FindStagesListIdentifiers.TRANSITION_CONDITION_IMAGE] in node_classes:
-                node_string += get_idtf(node)
-            if ScKeynodes[FindStagesListIdentifiers.PROCEDURE_FINISHING_IMAGE] in node_classes:
-                node_string += 'Завершение'
-
-            if next_nodes := scheme_dict[node]:
-                node_string += f' -> {', '.join(str(order.index(next_node)) for next_node in next_nodes)};'
-            else:
-                node_string += '.'
-
-            result_strings.append(node_string)
-
-        
-        result_string = '\n'.join(result_strings)
-        # print(result_string)
 
         link = create_link(result_string)
 
@@ -145,34 +69,78 @@ class FindStagesListAgent(ScAgentClassic):
         return ScResult.OK
     
 
-def get_node_classes(node: ScAddr):
-    class_template = ScTemplate()
-    class_template.triple(
-        sc_types.NODE_VAR_CLASS >> "class",
-        sc_types.EDGE_ACCESS_VAR_POS_PERM,
-        node 
-    )
-    class_template_results = template_search(class_template)
-    classes = [result.get("class") for result in class_template_results]
-    return classes
+def build_stages_list(input_node: ScAddr, scheme_cache: SchemeCache | None = None) -> str | None:
+    """Возвращает список этапов схемы в виде строки или None, если у схемы нет единственной точки начала"""
+    compiled = get_compiled_scheme(input_node, scheme_cache)
+    return compiled.stages if compiled is not None else None
+
+
+def get_compiled_scheme(input_node: ScAddr, scheme_cache: SchemeCache | None = None) -> CompiledScheme | None:
+    return scheme_cache.get(input_node, compile_scheme) if scheme_cache is not None else compile_scheme(input_node)
 
 
-def get_idtf(node: ScAddr, lang='lang_ru'):
-    description_template = ScTemplate()
-    description_template.quintuple(
-        node,
-        sc_types.EDGE_D_COMMON_VAR,
-        sc_types.LINK_VAR >> "description",
+def compile_scheme(input_node: ScAddr, max_in_flight: int = SCHEME_LOAD_MAX_IN_FLIGHT) -> CompiledScheme | None:
+    """Загружает схему, строит её граф и список этапов; None, если у схемы нет единственной точки начала"""
+    scheme_structure = ScStructure(set_node=input_node)
+
+    start_image_template = ScTemplate()
+    start_image_template.triple(
+        scheme_structure.set_node,
         sc_types.EDGE_ACCESS_VAR_POS_PERM,
-        ScKeynodes[FindStagesListIdentifiers.NREL_IMAGE_SIGN]
+        sc_types.NODE_VAR >> "start_procedure_node"
     )
-    description_template.triple(
-        ScKeynodes[lang],
+
+    start_image_template.triple(
+        ScKeynodes[FindStagesListIdentifiers.PROCEDURE_STARTING_IMAGE],
         sc_types.EDGE_ACCESS_VAR_POS_PERM,
-        "description"
+        "start_procedure_node"
     )
 
-    description_template_result = template_search(description_template)[0]
-    description_link = description_template_result.get("description")
-    description: str = get_link_content_data(description_link)
-    return description
+    start_image_template_results = template_search(start_image_template)
+
+    if len(start_image_template_results) > 1:
+        logging.error("Слишком много точек начала процедуры.")
+        return None
+    if len(start_image_template_results) < 1:
+        logging.error("Меньше 1 параметра начала процедуры.")
+        return None
+    
+    start_image_node = start_image_template_results[0].get("start_procedure_node")
+
+    # Связи, классы и подписи всех узлов схемы загружаются заранее; граф обходится локально
+    scheme = load_scheme(scheme_structure.set_node)
+    # Узлы, достижимые по переходам, но не включённые в структуру схемы, догружаются параллельно по уровням
+    scheme.expand(start_image_node, max_in_flight)
+
+    graph = SchemeGraph.from_successors(start_image_node, scheme.get_successors)
+    order = graph.dfs_order()
+    positions = graph.positions(order)
+
+    result_strings = []
+    for i, node_id in enumerate(order):
+        node = graph.nodes[node_id]
+        node_string = f'{i}: '
+        node_kind = scheme.get_kind(node)
+        
+        if node_kind == 'start':
+            node_string += 'Начало'
+        elif node_kind == 'choice':
+            node_string += 'Выбор'
+        elif node_kind in ('operation', 'condition'):
+            node_string += scheme.get_label(node)
+        elif node_kind == 'finish':
+            node_string += 'Завершение'
+
+        if next_ids := graph.successors[node_id]:
+            node_string += f' -> {', '.join(str(positions[next_id]) for next_id in next_ids)};'
+        else:
+            node_string += '.'
+
+        result_strings.append(node_string)
+
+    
+    result_string = '\n'.join(result_strings)
+    # print(result_string)
+
+    return CompiledScheme(scheme, graph, order, positions, result_string)
+
@@ -0,0 +1,116 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+
+from sc_client.models import ScAddr
+
+
+WORD_PATTERN = re.compile(r"\w+")
+VOWELS = set("аеёиоуыэюя")
+
+# Окончания для облегчённого стемминга русских слов, от длинных к коротким
+REFLEXIVE_ENDINGS = ("ся", "сь")
+ENDINGS = tuple(sorted((
+    # прилагательные и причастия
+    "ого", "его", "ому", "ему", "ыми", "ими", "ой", "ей", "ый", "ий", "ая", "яя", "ое", "ее", "ые", "ие",
+    "ых", "их", "ым", "им", "ую", "юю", "ом", "ем",
+    # существительные
+    "ами", "ями", "иями", "ием", "иях", "ией", "ах", "ях", "ов", "ев", "ам", "ям", "ия", "ию", "ии", "ью",
+    "а", "я", "о", "е", "у", "ю", "ы", "и", "ь", "й",
+    # глаголы
+    "ать", "ять", "ить", "еть", "уть", "ешь", "ет", "ют", "ут", "ит", "ат", "ят", "ал", "ил", "ла", "ли", "ло",
+), key=len, reverse=True))
+MIN_STEM_LENGTH = 3
+
+
+def stem_russian(word: str) -> str:
+    """Облегчённый стеммер: отрезает самое длинное окончание после первой гласной, оставляя не меньше MIN_STEM_LENGTH букв"""
+    word = word.casefold().replace("ё", "е")
+    first_vowel = next((i for i, char in enumerate(word) if char in VOWELS), None)
+    if first_vowel is None:
+        return word
+    min_length = max(first_vowel + 1, MIN_STEM_LENGTH)
+
+    for ending in REFLEXIVE_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= min_length:
+            word = word[:-len(ending)]
+            break
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= min_length:
+            return word[:-len(ending)]
+    return word
+
+
+def stem_text(text: str) -> list[str]:
+    text = unicodedata.normalize("NFC", text)
+    return [stem_russian(word) for word in WORD_PATTERN.findall(text)]
+
+
+def trigrams(stems: list[str]) -> set[str]:
+    padded = f"  {' '.join(stems)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(first: set, second: set) -> float:
+    if not first or not second:
+        return 0.0
+    return 2 * len(first & second) / (len(first) + len(second))
+
+
+class FuzzyIndex:
+    """
+    Нечёткий индекс идентификаторов: кандидаты отбираются по общим триграммам основ слов,
+    а оценка учитывает и триграммы, и совпадение основ (коэффициент Дайса).
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.entries: dict[ScAddr, tuple[ScAddr, str, set[str], set[str]]] = {}
+        self.links_by_trigram: dict[str, set[ScAddr]] = {}
+
+    def add(self, link: ScAddr, node: ScAddr, idtf: str) -> None:
+        stems = stem_text(idtf)
+        idtf_trigrams = trigrams(stems)
+        with self.lock:
+            self.remove(link)
+            self.entries[link] = (node, idtf, set(stems), idtf_trigrams)
+            for trigram in idtf_trigrams:
+                self.links_by_trigram.setdefault(trigram, set()).add(link)
+
+    def remove(self, link: ScAddr) -> None:
+        with self.lock:
+            entry = self.entries.pop(link, None)
+            if entry is None:
+                return
+            for trigram in entry[3]:
+                links = self.links_by_trigram.get(trigram)
+                if links is not None:
+                    links.discard(link)
+                    if not links:
+                        del self.links_by_trigram[trigram]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.links_by_trigram.clear()
+
+    def search(self, name: str, top_k: int = 5, max_candidates: int = 200) -> list[tuple[ScAddr, str, float]]:
+        """Возвращает до top_k пар (узел, идентификатор, оценка 0..1), лучшие первыми"""
+        stems = stem_text(name)
+        query_stems = set(stems)
+        query_trigrams = trigrams(stems)
+
+        with self.lock:
+            trigram_hits = Counter()
+            for trigram in query_trigrams:
+                trigram_hits.update(self.links_by_trigram.get(trigram, ()))
+
+            scored = []
+            for link, _ in trigram_hits.most_common(max_candidates):
+                node, idtf, idtf_stems, idtf_trigrams = self.entries[link]
+                score = (dice(query_trigrams, idtf_trigrams) + dice(query_stems, idtf_stems)) / 2
+                scored.append((node, idtf, score))
+
+        scored.sort(key=lambda candidate: candidate[2], reverse=True)
+        return scored[:top_k]
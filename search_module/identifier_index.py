@@ -0,0 +1,172 @@
+import re
+import logging
+import threading
+import unicodedata
+
+from sc_client.models import ScAddr, ScTemplate, ScEventSubscriptionParams
+from sc_client.constants import sc_types
+from sc_client.constants.common import ScEventType
+from sc_client.client import (
+    template_search,
+    get_link_content,
+    create_elementary_event_subscriptions,
+    destroy_elementary_event_subscriptions,
+)
+from sc_kpm import ScKeynodes
+
+from .search_module_idtfs import SearchModuleIdentifiers
+from .fuzzy_index import FuzzyIndex
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+# Сколько ссылок читать одним запросом get_link_content при построении индекса
+LINK_CONTENT_CHUNK_SIZE = 1000
+
+QUOTES_PATTERN = re.compile(r"[\"'«»“”„‘’`]")
+
+
+def normalize_identifier(text: str) -> str:
+    """Ключ индекса: NFC, без кавычек, без учёта регистра, со схлопнутыми пробелами"""
+    text = unicodedata.normalize("NFC", text)
+    text = QUOTES_PATTERN.sub("", text)
+    return " ".join(text.casefold().split())
+
+
+class IdentifierIndex:
+    """
+    Индекс основных идентификаторов (nrel_main_idtf) базы знаний: нормализованное название -> узлы.
+    Строится один раз при регистрации модуля и дополняется по sc-событиям на отношении nrel_main_idtf,
+    поэтому поиск сущности по названию не требует обращений к sc-серверу.
+    """
+
+    def __init__(self, languages: tuple[str, ...] = ('lang_ru', 'lang_en')):
+        self.languages = languages
+        self.lock = threading.RLock()
+        self.entries_by_name: dict[str, list[tuple[ScAddr, str]]] = {}
+        self.entries_by_link: dict[ScAddr, tuple[ScAddr, str]] = {}
+        self.fuzzy_index = FuzzyIndex()
+        self.event_subscriptions = []
+        self.is_built = False
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def build(self) -> None:
+        """Загружает все основные идентификаторы на языках self.languages"""
+        found_links = {}
+        for lang in self.languages:
+            idtf_template = ScTemplate()
+            idtf_template.quintuple(
+                sc_types.NODE_VAR >> 'node',
+                sc_types.EDGE_D_COMMON_VAR,
+                sc_types.LINK_VAR >> 'idtf_link',
+                sc_types.EDGE_ACCESS_VAR_POS_PERM,
+                ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF],
+            )
+            idtf_template.triple(
+                ScKeynodes[lang],
+                sc_types.EDGE_ACCESS_VAR_POS_PERM,
+                'idtf_link'
+            )
+            for result in template_search(idtf_template):
+                found_links[result.get('idtf_link')] = result.get('node')
+
+        links = list(found_links)
+        with self.lock:
+            self.entries_by_name.clear()
+            self.entries_by_link.clear()
+            self.fuzzy_index.clear()
+            for chunk_start in range(0, len(links), LINK_CONTENT_CHUNK_SIZE):
+                chunk = links[chunk_start:chunk_start + LINK_CONTENT_CHUNK_SIZE]
+                for link, content in zip(chunk, get_link_content(*chunk)):
+                    if isinstance(content.data, str):
+                        self._add(found_links[link], link, content.data)
+            self.is_built = True
+
+        self.logger.info("Identifier index built: %d identifiers", len(self.entries_by_link))
+
+    def subscribe(self) -> None:
+        """Подписывается на добавление и удаление пар отношения nrel_main_idtf"""
+        if self.event_subscriptions:
+            return
+        relation = ScKeynodes[SearchModuleIdentifiers.NREL_MAIN_IDTF]
+        self.event_subscriptions = create_elementary_event_subscriptions(
+            ScEventSubscriptionParams(relation, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_idtf_generated),
+            ScEventSubscriptionParams(relation, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_idtf_erased),
+        )
+
+    def unsubscribe(self) -> None:
+        if self.event_subscriptions:
+            destroy_elementary_event_subscriptions(*self.event_subscriptions)
+            self.event_subscriptions = []
+
+    def lookup(self, name: str) -> ScAddr | None:
+        """Возвращает узел по названию; при нескольких кандидатах предпочитается точное совпадение написания"""
+        with self.lock:
+            entries = self.entries_by_name.get(normalize_identifier(name))
+            if not entries:
+                return None
+            for node, idtf in entries:
+                if idtf == name:
+                    return node
+            return entries[0][0]
+
+    def fuzzy_lookup(self, name: str, top_k: int = 5) -> list[tuple[ScAddr, str, float]]:
+        """Кандидаты для названия, не найденного точно: с учётом падежных окончаний и опечаток"""
+        return self.fuzzy_index.search(name, top_k)
+
+    def names(self) -> list[tuple[ScAddr, str]]:
+        """Все проиндексированные пары (узел, идентификатор)"""
+        with self.lock:
+            return list(self.entries_by_link.values())
+
+    def _add(self, node: ScAddr, link: ScAddr, idtf: str) -> None:
+        self.entries_by_link[link] = (node, idtf)
+        self.fuzzy_index.add(link, node, idtf)
+        self.entries_by_name.setdefault(normalize_identifier(idtf), []).append((node, idtf))
+
+    def _remove(self, link: ScAddr) -> None:
+        entry = self.entries_by_link.pop(link, None)
+        if entry is None:
+            return
+        self.fuzzy_index.remove(link)
+        node, idtf = entry
+        key = normalize_identifier(idtf)
+        entries = [other for other in self.entries_by_name.get(key, []) if other != entry]
+        if entries:
+            self.entries_by_name[key] = entries
+        else:
+            self.entries_by_name.pop(key, None)
+
+    def _search_idtf_pair(self, idtf_arc: ScAddr) -> tuple[ScAddr, ScAddr] | None:
+        pair_template = ScTemplate()
+        pair_template.triple(
+            sc_types.NODE_VAR >> 'node',
+            idtf_arc,
+            sc_types.LINK_VAR >> 'idtf_link'
+        )
+        search_results = template_search(pair_template)
+        if not search_results:
+            return None
+        return search_results[0].get('node'), search_results[0].get('idtf_link')
+
+    def _on_idtf_generated(self, relation: ScAddr, access_arc: ScAddr, idtf_arc: ScAddr) -> None:
+        # Язык ссылки может быть добавлен позже самой пары, поэтому новые идентификаторы индексируются без проверки языка
+        pair = self._search_idtf_pair(idtf_arc)
+        if pair is None:
+            return
+        node, link = pair
+        idtf = get_link_content(link)[0].data
+        if not isinstance(idtf, str):
+            return
+        with self.lock:
+            self._remove(link)
+            self._add(node, link, idtf)
+
+    def _on_idtf_erased(self, relation: ScAddr, access_arc: ScAddr, idtf_arc: ScAddr) -> None:
+        pair = self._search_idtf_pair(idtf_arc)
+        if pair is None:
+            return
+        _, link = pair
+        with self.lock:
+            self._remove(link)
@@ -0,0 +1,262 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+
+from sc_client.models import ScAddr, ScTemplate, ScEventSubscriptionParams
+from sc_client.constants import sc_types
+from sc_client.constants.common import ScEventType
+from sc_client.client import (
+    template_search,
+    get_link_content,
+    delete_elements,
+    create_elementary_event_subscriptions,
+    destroy_elementary_event_subscriptions,
+)
+from sc_kpm import ScKeynodes
+from sc_kpm.sc_sets import ScSet
+
+from .search_module_idtfs import SearchModuleIdentifiers, FindStagesListIdentifiers
+
+
+# Языки, варианты на которых загружаются сразу, и порядок выбора по умолчанию
+DEFAULT_LANGUAGES = ('lang_ru', 'lang_en')
+
+# Сколько узлов хранится в памяти; дольше всех не запрашивавшиеся вытесняются
+LABELS_MAX_SIZE = 10000
+
+
+class LabelResolver:
+    """
+    Подписи узлов по отношению (nrel_main_idtf, nrel_image_sign) сразу на всех языках languages.
+    Для набора узлов все варианты загружаются одним поиском и хранятся в памяти,
+    поэтому смена языка отображения не требует обращений к базе знаний.
+    После subscribe запись узла сбрасывается по sc-событиям: при добавлении или удалении пары отношения
+    и при изменении содержимого загруженной sc-ссылки.
+    """
+
+    def __init__(self, relation_idtf: str, languages: tuple[str, ...] = DEFAULT_LANGUAGES,
+                 max_size: int = LABELS_MAX_SIZE):
+        self.relation_idtf = relation_idtf
+        self.languages = languages
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        # узел -> язык -> (sc-ссылка, текст), в порядке последнего обращения
+        self.labels: OrderedDict[ScAddr, dict[str, tuple[ScAddr, str]]] = OrderedDict()
+        # Номер поколения растёт при каждом сбросе, чтобы не сохранить подписи, прочитанные во время их изменения
+        self.generation = 0
+        self.relation_subscriptions = []
+        # sc-ссылка загруженной подписи -> её узел и подписка на изменение её содержимого
+        self.link_nodes: dict[ScAddr, ScAddr] = {}
+        self.link_subscriptions: dict[ScAddr, object] = {}
+
+    def resolve(self, node: ScAddr, languages: Iterable[str] | None = None) -> str | None:
+        """Текст подписи на первом доступном языке из languages (по умолчанию - self.languages)"""
+        label = self._choose(self.get_variants(node), languages)
+        return label[1] if label is not None else None
+
+    def resolve_link(self, node: ScAddr, languages: Iterable[str] | None = None) -> ScAddr | None:
+        """sc-ссылка с подписью на первом доступном языке"""
+        label = self._choose(self.get_variants(node), languages)
+        return label[0] if label is not None else None
+
+    def resolve_many(self, nodes: Iterable[ScAddr], languages: Iterable[str] | None = None) -> dict[ScAddr, str]:
+        return {node: label[1] for node, label in self._choose_many(nodes, languages).items()}
+
+    def resolve_many_links(self, nodes: Iterable[ScAddr], languages: Iterable[str] | None = None) -> dict[ScAddr, ScAddr]:
+        """Узел -> sc-ссылка с подписью на первом доступном языке; узлы без подписи пропускаются"""
+        return {node: label[0] for node, label in self._choose_many(nodes, languages).items()}
+
+    def get_variants(self, node: ScAddr) -> dict[str, tuple[ScAddr, str]]:
+        """Все языковые варианты подписи узла: язык -> (sc-ссылка, текст)"""
+        return self.load([node])[node]
+
+    def load(self, nodes: Iterable[ScAddr]) -> dict[ScAddr, dict[str, tuple[ScAddr, str]]]:
+        """Варианты подписей узлов; недостающие в памяти загружаются одним поиском"""
+        variants = {}
+        with self.lock:
+            for node in nodes:
+                if node in self.labels:
+                    self.labels.move_to_end(node)
+                    variants[node] = self.labels[node]
+                else:
+                    variants.setdefault(node, None)
+            missing = [node for node, node_variants in variants.items() if node_variants is None]
+            generation = self.generation
+            is_subscribed = bool(self.relation_subscriptions)
+        if not missing:
+            return variants
+
+        if len(missing) == 1:
+            found_links = self._search_links(missing[0])
+        else:
+            # Для нескольких узлов поиск идёт по временному множеству, которое затем удаляется
+            nodes_set = ScSet(*missing)
+            try:
+                found_links = self._search_links(nodes_set.set_node, is_set=True)
+            finally:
+                delete_elements(nodes_set.set_node)
+
+        # Подписка создаётся до чтения содержимого, поэтому изменение во время чтения не будет пропущено
+        new_subscriptions = self._subscribe_links(set(found_links.values())) if is_subscribed else {}
+
+        for node in missing:
+            variants[node] = {}
+        if found_links:
+            keys = list(found_links)
+            for (node, lang), content in zip(keys, get_link_content(*(found_links[key] for key in keys))):
+                if isinstance(content.data, str):
+                    variants[node][lang] = (found_links[(node, lang)], content.data)
+
+        with self.lock:
+            if generation == self.generation:
+                for node in missing:
+                    self.labels[node] = variants[node]
+                    self.link_nodes.update((link, node) for link, _ in variants[node].values())
+                self.link_subscriptions.update(new_subscriptions)
+                new_subscriptions = {}
+            unused_subscriptions = list(new_subscriptions.values()) + self._evict()
+        if unused_subscriptions:
+            destroy_elementary_event_subscriptions(*unused_subscriptions)
+        return variants
+
+    def invalidate(self, node: ScAddr | None = None) -> None:
+        with self.lock:
+            self.generation += 1
+            if node is None:
+                self.labels.clear()
+                self.link_nodes.clear()
+                unused_subscriptions = list(self.link_subscriptions.values())
+                self.link_subscriptions.clear()
+            else:
+                variants = self.labels.pop(node, {})
+                unused_subscriptions = self._pop_link_subscriptions(variants)
+        if unused_subscriptions:
+            destroy_elementary_event_subscriptions(*unused_subscriptions)
+
+    def subscribe(self) -> None:
+        """Подписывается на изменения пар отношения; на ссылки подписки создаются при загрузке подписей"""
+        if self.relation_subscriptions:
+            return
+        relation = ScKeynodes[self.relation_idtf]
+        self.relation_subscriptions = create_elementary_event_subscriptions(
+            ScEventSubscriptionParams(relation, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_relation_changed),
+            ScEventSubscriptionParams(relation, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_relation_changed),
+        )
+        # Подписи, загруженные без подписки на события, могли устареть
+        self.invalidate()
+
+    def unsubscribe(self) -> None:
+        subscriptions = list(self.relation_subscriptions)
+        self.relation_subscriptions = []
+        if subscriptions:
+            destroy_elementary_event_subscriptions(*subscriptions)
+        self.invalidate()
+
+    def _subscribe_links(self, links: set[ScAddr]) -> dict[ScAddr, object]:
+        with self.lock:
+            links = [link for link in links if link not in self.link_subscriptions]
+        if not links:
+            return {}
+        subscriptions = create_elementary_event_subscriptions(*(
+            ScEventSubscriptionParams(link, ScEventType.BEFORE_CHANGE_LINK_CONTENT, self._on_link_changed)
+            for link in links
+        ))
+        return dict(zip(links, subscriptions))
+
+    def _evict(self) -> list:
+        """Вытесняет лишние записи; возвращает подписки вытесненных ссылок (вызывается под self.lock)"""
+        evicted_subscriptions = []
+        while len(self.labels) > self.max_size:
+            _, variants = self.labels.popitem(last=False)
+            evicted_subscriptions.extend(self._pop_link_subscriptions(variants))
+        return evicted_subscriptions
+
+    def _pop_link_subscriptions(self, variants: dict[str, tuple[ScAddr, str]]) -> list:
+        subscriptions = []
+        for link, _ in variants.values():
+            self.link_nodes.pop(link, None)
+            subscription = self.link_subscriptions.pop(link, None)
+            if subscription is not None:
+                subscriptions.append(subscription)
+        return subscriptions
+
+    def _search_pair_node(self, pair_arc: ScAddr) -> ScAddr | None:
+        pair_template = ScTemplate()
+        pair_template.triple(
+            sc_types.NODE_VAR >> "node",
+            pair_arc,
+            sc_types.LINK_VAR
+        )
+        search_results = template_search(pair_template)
+        return search_results[0].get("node") if search_results else None
+
+    def _on_relation_changed(self, relation: ScAddr, access_arc: ScAddr, pair_arc: ScAddr) -> None:
+        # Если узел пары не найден, сбрасываются все подписи
+        self.invalidate(self._search_pair_node(pair_arc))
+
+    def _on_link_changed(self, link: ScAddr, connector: ScAddr, other_element: ScAddr) -> None:
+        with self.lock:
+            node = self.link_nodes.get(link)
+            if node is None:
+                # Ссылка ещё загружается: её подписи не будут сохранены
+                self.generation += 1
+                return
+        self.invalidate(node)
+
+    def _search_links(self, node: ScAddr, is_set: bool = False) -> dict[tuple[ScAddr, str], ScAddr]:
+        """(узел, язык) -> sc-ссылка для узла или, если is_set, для всех элементов множества node"""
+        label_template = ScTemplate()
+        if is_set:
+            label_template.triple(
+                node,
+                sc_types.EDGE_ACCESS_VAR_POS_PERM,
+                sc_types.NODE_VAR >> "node"
+            )
+            node = "node"
+        label_template.quintuple(
+            node,
+            sc_types.EDGE_D_COMMON_VAR,
+            sc_types.LINK_VAR >> "label_link",
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            ScKeynodes[self.relation_idtf]
+        )
+        label_template.triple(
+            sc_types.NODE_VAR >> "lang",
+            sc_types.EDGE_ACCESS_VAR_POS_PERM,
+            "label_link"
+        )
+
+        languages_by_node = {ScKeynodes[lang]: lang for lang in self.languages}
+        found_links = {}
+        for result in template_search(label_template):
+            lang = languages_by_node.get(result.get("lang"))
+            if lang is None:
+                continue
+            labeled_node = result.get("node") if is_set else node
+            # На одном языке может быть несколько подписей, берётся первая, как и раньше
+            found_links.setdefault((labeled_node, lang), result.get("label_link"))
+        return found_links
+
+    def _choose_many(self, nodes: Iterable[ScAddr], languages: Iterable[str] | None):
+        variants = self.load(nodes)
+        chosen = {}
+        for node, node_variants in variants.items():
+            label = self._choose(node_variants, languages)
+            if label is not None:
+                chosen[node] = label
+        return chosen
+
+    def _choose(self, variants: dict[str, tuple[ScAddr, str]], languages: Iterable[str] | None):
+        for lang in (languages if languages is not None else self.languages):
+            if lang in variants:
+                return variants[lang]
+        return None
+
+
+main_idtf_labels = LabelResolver(SearchModuleIdentifiers.NREL_MAIN_IDTF)
+image_sign_labels = LabelResolver(FindStagesListIdentifiers.NREL_IMAGE_SIGN)
+
+
+def fallback_languages(lang: str, languages: tuple[str, ...] = DEFAULT_LANGUAGES) -> tuple[str, ...]:
+    """Порядок выбора: сначала lang, затем остальные языки по умолчанию"""
+    return (lang, *(other for other in languages if other != lang))
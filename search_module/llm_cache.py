@@ -0,0 +1,134 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from cachetools import TTLCache
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Приводит промпт к каноническому виду: Unicode NFC и схлопнутые пробельные символы.
+    Регистр не меняется: названия сущностей в базе знаний чувствительны к регистру.
+    """
+    return " ".join(unicodedata.normalize("NFC", prompt).split())
+
+
+class LLMResponseCache:
+    """
+    Кэш ответов модели по ключу (модель, нормализованный промпт).
+    Первый уровень - LRU-кэш в памяти с TTL, второй (необязательный) - таблица SQLite на диске.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 3600.0,
+        db_path: str | None = None,
+        disk_ttl: float | None = None,
+        disk_maxsize: int = 100_000,
+    ):
+        self.ttl = ttl
+        self.disk_ttl = disk_ttl if disk_ttl is not None else ttl
+        self.disk_maxsize = disk_maxsize
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self.db = None
+        if db_path:
+            self.db = sqlite3.connect(db_path, check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self.db.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed_at ON llm_cache (accessed_at)")
+            self.db.commit()
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(f"{model}\0{normalize_prompt(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str) -> str | None:
+        key = self.make_key(model, prompt)
+        with self.lock:
+            response = self.memory.get(key)
+            if response is not None:
+                self.hits += 1
+                return response
+
+            response = self._disk_get(key)
+            if response is not None:
+                self.disk_hits += 1
+                self.memory[key] = response
+                return response
+
+            self.misses += 1
+            return None
+
+    def set(self, model: str, prompt: str, response: str) -> None:
+        key = self.make_key(model, prompt)
+        with self.lock:
+            self.memory[key] = response
+            self._disk_set(key, response)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM llm_cache")
+                self.db.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "size": len(self.memory),
+            }
+
+    def close(self) -> None:
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+    def _disk_get(self, key: str) -> str | None:
+        if self.db is None:
+            return None
+        now = time.time()
+        row = self.db.execute(
+            "SELECT response FROM llm_cache WHERE key = ? AND created_at >= ?", (key, now - self.disk_ttl)
+        ).fetchone()
+        if row is None:
+            return None
+        self.db.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self.db.commit()
+        return row[0]
+
+    def _disk_set(self, key: str, response: str) -> None:
+        if self.db is None:
+            return
+        now = time.time()
+        self.db.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, response, now, now),
+        )
+        # Устаревшие записи и записи сверх лимита удаляются, начиная с давно не использованных
+        self.db.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.disk_ttl,))
+        self.db.execute(
+            "DELETE FROM llm_cache WHERE key IN ("
+            "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_maxsize,),
+        )
+        self.db.commit()
@@ -0,0 +1,116 @@
+import os
+import json
+import logging
+from typing import Iterator
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .llm_cache import LLMResponseCache
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+TOGETHER_AI_BASE_URL = "https://api.together.xyz/v1"
+TOGETHER_AI_MODEL = "meta-llama/Llama-3.3-70B-Instruct-Turbo"
+
+# Ошибки, после которых запрос к модели имеет смысл повторить
+RETRY_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def get_api_key(api_key: str | None = None) -> str:
+    """Ключ API: переданный явно или из переменной окружения TOGETHER_AI_API_KEY"""
+    api_key = api_key if api_key is not None else os.environ.get("TOGETHER_AI_API_KEY")
+    if not api_key:
+        raise ValueError("TOGETHER_AI_API_KEY is not set in environment variables!")
+    return api_key
+
+
+class LLMClient:
+    """
+    Долгоживущий клиент chat-completions API Together AI.
+    Держит пул keep-alive соединений, поэтому TLS-рукопожатие выполняется один раз на соединение, а не на каждый запрос.
+    base_url можно направить на локальный HTTP-сервер с тем же API, например для тестов.
+    """
+
+    def __init__(
+        self,
+        api_key: str | None = None,
+        base_url: str = TOGETHER_AI_BASE_URL,
+        model: str = TOGETHER_AI_MODEL,
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 120.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: LLMResponseCache | None = None,
+    ):
+        self.api_key = get_api_key(api_key)
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.cache = cache
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        retry = Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=frozenset({"POST"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        # pool_size соединений на хост; при pool_block лишние запросы ждут свободное соединение, а не открывают новое
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry, pool_block=True)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        })
+
+    def chat(self, prompt: str, model: str | None = None) -> str:
+        """Отправляет один пользовательский запрос модели и возвращает текст ответа"""
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            json={
+                "model": model or self.model,
+                "messages": [{"role": "user", "content": prompt}],
+            },
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"]
+
+    def stream_chat(self, prompt: str, model: str | None = None) -> Iterator[str]:
+        """Отправляет запрос в потоковом режиме (server-sent events) и выдаёт фрагменты ответа по мере генерации"""
+        with self.session.post(
+            f"{self.base_url}/chat/completions",
+            json={
+                "model": model or self.model,
+                "messages": [{"role": "user", "content": prompt}],
+                "stream": True,
+            },
+            timeout=self.timeout,
+            stream=True,
+        ) as response:
+            response.raise_for_status()
+            # Без charset в Content-Type requests декодировал бы text/event-stream как ISO-8859-1
+            response.encoding = "utf-8"
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                token = choices[0].get("delta", {}).get("content") if choices else None
+                if token:
+                    yield token
+
+    def close(self) -> None:
+        self.session.close()
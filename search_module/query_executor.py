@@ -0,0 +1,22 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Sequence, TypeVar
+
+
+T = TypeVar("T")
+
+# Сколько независимых обращений к sc-серверу в рамках одного запроса выполняется одновременно
+QUERY_MAX_IN_FLIGHT = 8
+
+
+def run_in_order(calls: Sequence[Callable[[], T]], max_in_flight: int = QUERY_MAX_IN_FLIGHT) -> list[T]:
+    """
+    Выполняет независимые вызовы одновременно, не больше max_in_flight сразу, и возвращает их результаты
+    в исходном порядке. Время выполнения определяется самым долгим вызовом, а не их суммой.
+    Если вызов завершился исключением, оно пробрасывается после завершения остальных вызовов.
+    """
+    if len(calls) <= 1 or max_in_flight <= 1:
+        return [call() for call in calls]
+
+    with ThreadPoolExecutor(max_workers=min(max_in_flight, len(calls))) as executor:
+        futures = [executor.submit(call) for call in calls]
+    return [future.result() for future in futures]
@@ -0,0 +1,164 @@
+import re
+import unicodedata
+from typing import Callable
+
+
+# Фразы-индикаторы из промптов CallAgent: тип запроса -> (предметная область, фразы)
+INDICATOR_PHRASES = {
+    "children_needed": ("Структура и Иерархия", (
+        "дочерние элементы", "дочерние сущности", "входят в состав", "состоит из", "из чего состоит",
+        "что включает", "что содержит", "подразделы", "компоненты", "составные части",
+    )),
+    "parents_needed": ("Структура и Иерархия", (
+        "родители", "родительские элементы", "родительские сущности", "является частью", "частью чего является",
+        "к чему относится", "надсистема",
+    )),
+    "parent_decomposition_needed": ("Структура и Иерархия", (
+        "входит в декомпозицию", "в какой декомпозиции", "в какую декомпозицию", "является частью декомпозиции",
+        "в составе какой декомпозиции", "к какой декомпозиции принадлежит", "декомпозиции для",
+        "декомпозиция раздела", "подразделы раздела",
+    )),
+    "description_needed": ("Описание и Характеристики", (
+        "описание", "что такое", "что из себя представляет", "охарактеризуйте", "расскажите о", "дефиниция",
+        "дать определение",
+    )),
+    "max_class_needed": ("Классификация и Категоризация", (
+        "максимальный класс", "максимальные классы", "высшая категория", "самый общий класс",
+    )),
+    "not_max_class_needed": ("Классификация и Категоризация", (
+        "не максимальный класс", "немаксимальный класс", "не высшая категория", "более общий класс",
+        "промежуточная категория",
+    )),
+    "key_sc_element_needed": ("Семантические Связи и Знания", (
+        "ключевые элементы", "ключевые sc-элементы", "sc-элементы", "ключевые характеристики",
+    )),
+    "scheme_steps_needed": ("Схемы и Процессы", (
+        "этапы схемы", "последовательность действий", "последовательность шагов", "шаги процесса", "стадии схемы",
+    )),
+}
+
+# Список известных схем из промпта области "Схемы и Процессы"
+KNOWN_SCHEMES = (
+    "Схема аппаратной процедуры для приготовления творожной массы",
+    "Схема технологического процесса производства кефира",
+    "Схема автоматизированной линии розлива молока",
+    "Схема контроля качества молочной продукции",
+)
+
+# Слова, которые окружают название сущности в запросе, но не входят в него
+FILLER_WORDS = {
+    "найди", "найти", "покажи", "показать", "выведи", "перечисли", "назови", "дай", "мне", "пожалуйста",
+    "какие", "какой", "какая", "каковы", "кто", "что", "есть", "у", "для", "в", "о", "об", "из", "и", "раздел", "раздела",
+}
+
+QUOTED_TEXT_PATTERN = re.compile(r'"([^"]+)"|\'([^\']+)\'|«([^»]+)»|“([^”]+)”')
+
+_INDICATOR_PATTERNS = [
+    (decision, area, re.compile(r"(?<!\w)" + re.escape(phrase) + r"(?!\w)"))
+    for decision, (area, phrases) in INDICATOR_PHRASES.items()
+    for phrase in phrases
+]
+
+
+def normalize_query(query: str) -> str:
+    """Ключ для сравнения запросов: NFC, без учёта регистра, со схлопнутыми пробелами и без знаков в конце"""
+    query = unicodedata.normalize("NFC", query)
+    return " ".join(query.casefold().split()).rstrip(" ?!.")
+
+
+def route_by_indicators(query: str, resolve_entity: Callable[[str], str | None] | None = None):
+    """
+    Определяет тип запроса и сущность по фразам-индикаторам без обращения к модели.
+    Возвращает (area, decision, entity_name) или None, если запрос неоднозначен и нужен LLM.
+    Название сущности без кавычек принимается, только если resolve_entity находит его в базе знаний;
+    в ответ попадает найденное им название (например, в начальной форме).
+    """
+    matches = find_indicator_matches(query)
+    decisions = {(decision, area) for _, _, decision, area in matches}
+    if len(decisions) != 1:
+        return None
+    (decision, area), = decisions
+
+    if decision == "scheme_steps_needed":
+        entity_name = find_known_scheme(query)
+        return (area, decision, entity_name) if entity_name else None
+
+    entity_name = extract_entity_name(query, matches, resolve_entity)
+    return (area, decision, entity_name) if entity_name else None
+
+
+def route_multiple_by_indicators(
+    query: str, allowed_decisions, resolve_entity: Callable[[str], str | None] | None = None
+):
+    """
+    Разбирает запрос сразу о нескольких типах сведений об одной сущности ("дочерние элементы и родители ...").
+    Возвращает (decisions, entity_name), если найдено больше одного типа запроса и все они из allowed_decisions;
+    decisions идут в порядке упоминания в запросе. Иначе возвращает None.
+    """
+    matches = find_indicator_matches(query)
+    decisions = []
+    for _, _, decision, _ in sorted(matches):
+        if decision not in decisions:
+            decisions.append(decision)
+    if len(decisions) < 2 or not all(decision in allowed_decisions for decision in decisions):
+        return None
+
+    entity_name = extract_entity_name(query, matches, resolve_entity)
+    return (tuple(decisions), entity_name) if entity_name else None
+
+
+def find_indicator_matches(query: str) -> list[tuple[int, int, str, str]]:
+    """Находит в запросе фразы-индикаторы: (начало, конец, тип запроса, предметная область)"""
+    lowered_query = query.lower()
+
+    matches = []
+    for decision, area, pattern in _INDICATOR_PATTERNS:
+        for match in pattern.finditer(lowered_query):
+            matches.append((match.start(), match.end(), decision, area))
+
+    # Фраза, вложенная в более длинную ("максимальный класс" в "не максимальный класс"), не учитывается
+    return [
+        match for match in matches
+        if not any(
+            other[0] <= match[0] and match[1] <= other[1] and (other[1] - other[0]) > (match[1] - match[0])
+            for other in matches
+        )
+    ]
+
+
+def extract_entity_name(query: str, matches, resolve_entity: Callable[[str], str | None] | None = None) -> str | None:
+    """Название сущности: текст в кавычках или, если кавычек нет, остаток запроса, найденный resolve_entity"""
+    quoted_texts = [next(group for group in match.groups() if group) for match in QUOTED_TEXT_PATTERN.finditer(query)]
+    if len(quoted_texts) == 1:
+        return quoted_texts[0]
+    if quoted_texts:
+        return None
+
+    entity_name = strip_indicators(query, matches)
+    if not entity_name or resolve_entity is None:
+        return None
+    return resolve_entity(entity_name)
+
+
+def find_known_scheme(query: str) -> str | None:
+    """Ищет в запросе одну из известных схем; первое слово ("Схема") может стоять в любом падеже"""
+    lowered_query = query.lower()
+    for scheme_name in KNOWN_SCHEMES:
+        _, scheme_tail = scheme_name.split(" ", 1)
+        if scheme_tail.lower() in lowered_query:
+            return scheme_name
+    return None
+
+
+def strip_indicators(query: str, matches) -> str:
+    """Убирает из запроса фразы-индикаторы и служебные слова по краям и возвращает оставшееся название"""
+    chars = list(query)
+    for start, end, _, _ in matches:
+        chars[start:end] = [" "] * (end - start)
+    words = "".join(chars).strip(" \t\n?!.,:;").split()
+
+    while words and words[0].lower().strip("?!.,:;") in FILLER_WORDS:
+        words.pop(0)
+    while words and words[-1].lower().strip("?!.,:;") in FILLER_WORDS:
+        words.pop()
+    return " ".join(words).strip("?!,:;")
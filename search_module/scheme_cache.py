@@ -0,0 +1,185 @@
+import logging
+import threading
+from array import array
+from dataclasses import dataclass
+from typing import Callable
+
+from sc_client.models import ScAddr, ScEventSubscriptionParams
+from sc_client.constants.common import ScEventType
+from sc_client.client import create_elementary_event_subscriptions, destroy_elementary_event_subscriptions
+from sc_kpm import ScKeynodes
+
+from .search_module_idtfs import FindStagesListIdentifiers
+from .scheme_loader import SchemeData
+from .label_resolver import image_sign_labels
+from .scheme_graph import SchemeGraph
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+@dataclass
+class CompiledScheme:
+    """Загруженная схема, её граф, порядок обхода и готовый список этапов"""
+    scheme: SchemeData
+    graph: SchemeGraph
+    order: array
+    positions: array
+    stages: str
+
+    def to_dict(self) -> dict:
+        """
+        Структурированный вид схемы: этапы с номерами в порядке обхода (как в текстовом списке),
+        видом этапа, подписью и номерами этапов, на которые есть переход
+        """
+        return {"start": 0, "stages": [self.stage_dict(node_id) for node_id in self.order]}
+
+    def stage_kind(self, node_id: int) -> str | None:
+        return self.scheme.get_kind(self.graph.nodes[node_id])
+
+    def stage_dict(self, node_id: int, next_ids=None) -> dict:
+        """Этап по номеру узла графа; next_ids ограничивает переходы, например, частью схемы"""
+        node = self.graph.nodes[node_id]
+        return {
+            "id": self.positions[node_id],
+            "kind": self.stage_kind(node_id),
+            "label": self.scheme.get_label(node),
+            "next": [
+                self.positions[next_id] for next_id in self.graph.successors[node_id]
+                if next_ids is None or next_id in next_ids
+            ],
+        }
+
+
+class SchemeCache:
+    """
+    Кэш скомпилированных схем по узлу схемы.
+    Запись сбрасывается по sc-событиям: при добавлении или удалении элементов структуры схемы
+    и при изменении содержимого подписей её этапов, а весь кэш - при изменении пар отношений
+    nrel_incidence и nrel_image_sign.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries: dict[ScAddr, CompiledScheme] = {}
+        # Номер поколения растёт при каждом сбросе, чтобы не сохранить схему, собранную во время её изменения
+        self.generations: dict[ScAddr, int] = {}
+        self.global_generation = 0
+        self.scheme_subscriptions: dict[ScAddr, list] = {}
+        self.relation_subscriptions = []
+        # sc-ссылка подписи этапа -> этап и схемы, в которые он входит
+        self.label_links: dict[ScAddr, tuple[ScAddr, set[ScAddr]]] = {}
+        self.label_subscriptions = []
+        self.hits = 0
+        self.misses = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def get(self, scheme_node: ScAddr, compile_scheme: Callable[[ScAddr], CompiledScheme | None]) -> CompiledScheme | None:
+        """Возвращает схему из кэша или компилирует её через compile_scheme и сохраняет"""
+        with self.lock:
+            compiled = self.entries.get(scheme_node)
+            if compiled is not None:
+                self.hits += 1
+                return compiled
+            self.misses += 1
+            generation = self._generation(scheme_node)
+
+        self.subscribe_scheme(scheme_node)
+        compiled = compile_scheme(scheme_node)
+        if compiled is None:
+            return None
+        self.subscribe_labels(scheme_node, compiled.scheme)
+
+        with self.lock:
+            if generation == self._generation(scheme_node):
+                self.entries[scheme_node] = compiled
+        return compiled
+
+    def invalidate(self, scheme_node: ScAddr) -> None:
+        with self.lock:
+            self.generations[scheme_node] = self.generations.get(scheme_node, 0) + 1
+            if self.entries.pop(scheme_node, None) is not None:
+                self.logger.info("Scheme cache entry invalidated")
+
+    def clear(self) -> None:
+        with self.lock:
+            self.global_generation += 1
+            self.entries.clear()
+
+    def subscribe(self) -> None:
+        """Подписывается на изменения переходов и подписей этапов во всех схемах"""
+        if self.relation_subscriptions:
+            return
+        params = []
+        for relation_idtf in (FindStagesListIdentifiers.NREL_INCIDENCE, FindStagesListIdentifiers.NREL_IMAGE_SIGN):
+            relation = ScKeynodes[relation_idtf]
+            params.append(ScEventSubscriptionParams(relation, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_relation_changed))
+            params.append(ScEventSubscriptionParams(relation, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_relation_changed))
+        self.relation_subscriptions = create_elementary_event_subscriptions(*params)
+
+    def subscribe_scheme(self, scheme_node: ScAddr) -> None:
+        """Подписывается на изменение состава структуры схемы (один раз на схему)"""
+        with self.lock:
+            if scheme_node in self.scheme_subscriptions:
+                return
+            self.scheme_subscriptions[scheme_node] = []
+        self.scheme_subscriptions[scheme_node] = create_elementary_event_subscriptions(
+            ScEventSubscriptionParams(scheme_node, ScEventType.AFTER_GENERATE_OUTGOING_ARC, self._on_scheme_changed),
+            ScEventSubscriptionParams(scheme_node, ScEventType.BEFORE_ERASE_OUTGOING_ARC, self._on_scheme_changed),
+        )
+
+    def subscribe_labels(self, scheme_node: ScAddr, scheme: SchemeData) -> None:
+        """Подписывается на изменение содержимого подписей этапов схемы на всех языках"""
+        links = {
+            link: node
+            for node, variants in image_sign_labels.load(scheme.members).items()
+            for link, _ in variants.values()
+        }
+        with self.lock:
+            new_links = [link for link in links if link not in self.label_links]
+            for link, node in links.items():
+                self.label_links.setdefault(link, (node, set()))[1].add(scheme_node)
+        if new_links:
+            self.label_subscriptions.extend(create_elementary_event_subscriptions(*(
+                ScEventSubscriptionParams(link, ScEventType.BEFORE_CHANGE_LINK_CONTENT, self._on_label_changed)
+                for link in new_links
+            )))
+
+    def unsubscribe(self) -> None:
+        subscriptions = list(self.relation_subscriptions) + list(self.label_subscriptions)
+        for scheme_subscriptions in self.scheme_subscriptions.values():
+            subscriptions.extend(scheme_subscriptions)
+        if subscriptions:
+            destroy_elementary_event_subscriptions(*subscriptions)
+        self.relation_subscriptions = []
+        self.scheme_subscriptions = {}
+        self.label_subscriptions = []
+        self.label_links = {}
+        self.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def _generation(self, scheme_node: ScAddr) -> tuple[int, int, int]:
+        # Поколение подписей учитывается, потому что подпись могла измениться до подписки на её ссылку
+        return self.global_generation, self.generations.get(scheme_node, 0), image_sign_labels.generation
+
+    def _on_scheme_changed(self, scheme_node: ScAddr, access_arc: ScAddr, element: ScAddr) -> None:
+        self.invalidate(scheme_node)
+
+    def _on_relation_changed(self, relation: ScAddr, access_arc: ScAddr, pair_arc: ScAddr) -> None:
+        # Переход или подпись могут относиться к любой схеме, а меняются редко, поэтому сбрасывается весь кэш
+        if relation == ScKeynodes[FindStagesListIdentifiers.NREL_IMAGE_SIGN]:
+            image_sign_labels.invalidate()
+        self.clear()
+
+    def _on_label_changed(self, link: ScAddr, connector: ScAddr, other_element: ScAddr) -> None:
+        with self.lock:
+            node, scheme_nodes = self.label_links.get(link, (None, set()))
+            scheme_nodes = list(scheme_nodes)
+        if node is not None:
+            image_sign_labels.invalidate(node)
+        for scheme_node in scheme_nodes:
+            self.invalidate(scheme_node)
@@ -0,0 +1,131 @@
+from array import array
+from collections import deque
+from typing import Callable, Hashable
+
+
+class SchemeGraph:
+    """
+    Компактный граф схемы: узлам присваиваются плотные целочисленные номера (в порядке обнаружения от начала),
+    списки переходов хранятся массивами номеров, посещённые узлы отмечаются в битовой карте.
+    Узлы могут быть любыми хешируемыми значениями, обычно ScAddr.
+    """
+
+    def __init__(self):
+        self.ids: dict[Hashable, int] = {}
+        self.nodes: list[Hashable] = []
+        self.successors: list[array] = []
+        self._predecessors: list[array] | None = None
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @classmethod
+    def from_successors(cls, start_node: Hashable, get_successors: Callable[[Hashable], list]) -> "SchemeGraph":
+        """Строит граф всех узлов, достижимых из start_node; get_successors вызывается один раз на узел"""
+        graph = cls()
+        graph.add_node(start_node)
+        node_id = 0
+        while node_id < len(graph.nodes):
+            graph.successors[node_id] = array('l', (graph.add_node(next_node)
+                                                    for next_node in get_successors(graph.nodes[node_id])))
+            node_id += 1
+        return graph
+
+    def add_node(self, node: Hashable) -> int:
+        node_id = self.ids.get(node)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.ids[node] = node_id
+            self.nodes.append(node)
+            self.successors.append(array('l'))
+            self._predecessors = None
+        return node_id
+
+    def dfs_order(self, start_id: int = 0) -> array:
+        """
+        Порядок обхода в глубину с явным стеком: переходы узла кладутся в стек по порядку,
+        а номер узел получает, когда впервые снимается со стека
+        """
+        visited = bytearray(len(self.nodes))
+        order = array('l')
+        stack = array('l', (start_id,))
+        while stack:
+            node_id = stack.pop()
+            if visited[node_id]:
+                continue
+            visited[node_id] = 1
+            order.append(node_id)
+            stack.extend(self.successors[node_id])
+        return order
+
+    def positions(self, order: array) -> array:
+        """Позиция каждого узла в order (-1 для узлов, не вошедших в обход)"""
+        positions = array('l', [-1]) * len(self.nodes)
+        for position, node_id in enumerate(order):
+            positions[node_id] = position
+        return positions
+
+    @property
+    def predecessors(self) -> list[array]:
+        """Обратные списки переходов; строятся один раз при первом обращении"""
+        if self._predecessors is None or len(self._predecessors) != len(self.nodes):
+            predecessors = [array('l') for _ in self.nodes]
+            for node_id, next_ids in enumerate(self.successors):
+                for next_id in next_ids:
+                    predecessors[next_id].append(node_id)
+            self._predecessors = predecessors
+        return self._predecessors
+
+    def shortest_path(self, source_id: int, target_id: int) -> list[int] | None:
+        """Кратчайший по числу переходов путь (поиск в ширину) или None, если target_id недостижим"""
+        parents = array('l', [-1]) * len(self.nodes)
+        visited = bytearray(len(self.nodes))
+        visited[source_id] = 1
+        queue = deque((source_id,))
+        while queue:
+            node_id = queue.popleft()
+            if node_id == target_id:
+                path = [node_id]
+                while path[-1] != source_id:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            for next_id in self.successors[node_id]:
+                if not visited[next_id]:
+                    visited[next_id] = 1
+                    parents[next_id] = node_id
+                    queue.append(next_id)
+        return None
+
+    def reachable(self, source_id: int) -> list[int]:
+        """Все узлы, достижимые из source_id (включая его), в порядке поиска в ширину"""
+        visited = bytearray(len(self.nodes))
+        visited[source_id] = 1
+        result = [source_id]
+        queue = deque((source_id,))
+        while queue:
+            for next_id in self.successors[queue.popleft()]:
+                if not visited[next_id]:
+                    visited[next_id] = 1
+                    result.append(next_id)
+                    queue.append(next_id)
+        return result
+
+    def branches(self, node_id: int) -> list[list[int]]:
+        """
+        Ветви, начинающиеся в узле: для каждого перехода - цепочка узлов до следующего ветвления,
+        слияния (узла с несколькими входами), конца схемы или уже пройденного узла
+        """
+        predecessors = self.predecessors
+        branches = []
+        for next_id in self.successors[node_id]:
+            branch = [next_id]
+            seen = {node_id, next_id}
+            current_id = next_id
+            while len(self.successors[current_id]) == 1:
+                current_id = self.successors[current_id][0]
+                if current_id in seen or len(predecessors[current_id]) > 1:
+                    break
+                seen.add(current_id)
+                branch.append(current_id)
+            branches.append(branch)
+        return branches
@@ -0,0 +1,180 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from sc_client.models import ScAddr, ScTemplate
+from sc_client.constants import sc_types
+from sc_client.client import template_search
+from sc_kpm import ScKeynodes
+
+from .search_module_idtfs import FindStagesListIdentifiers
+from .class_membership import classify_elements
+from .label_resolver import image_sign_labels, fallback_languages
+
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]")
+
+
+# Классы изображений этапов и соответствующие им виды этапов в структурированном выводе
+STAGE_KIND_CLASSES = (
+    (FindStagesListIdentifiers.PROCEDURE_STARTING_IMAGE, "start"),
+    (FindStagesListIdentifiers.CHOICE_OF_EXECUTION_SEQUENCE_IMAGE, "choice"),
+    (FindStagesListIdentifiers.OPERATION_IMAGE, "operation"),
+    (FindStagesListIdentifiers.TRANSITION_CONDITION_IMAGE, "condition"),
+    (FindStagesListIdentifiers.PROCEDURE_FINISHING_IMAGE, "finish"),
+)
+
+
+def get_stage_kind_classes() -> dict[ScAddr, str]:
+    """Узлы классов изображений этапов -> вид этапа, в порядке приоритета"""
+    return {ScKeynodes[class_idtf]: kind for class_idtf, kind in STAGE_KIND_CLASSES}
+
+
+@dataclass
+class SchemeData:
+    """Связи, виды и подписи (nrel_image_sign) узлов схемы, загруженные из базы знаний"""
+    scheme_node: ScAddr
+    lang: str = 'lang_ru'
+    members: set[ScAddr] = field(default_factory=set)
+    successors: dict[ScAddr, list[ScAddr]] = field(default_factory=dict)
+    kinds: dict[ScAddr, str] = field(default_factory=dict)
+    labels: dict[ScAddr, str] = field(default_factory=dict)
+
+    def get_successors(self, node: ScAddr) -> list[ScAddr]:
+        if node not in self.successors:
+            self.load_node(node)
+        return self.successors[node]
+
+    def get_kind(self, node: ScAddr) -> str | None:
+        if node not in self.successors:
+            self.load_node(node)
+        return self.kinds.get(node)
+
+    def get_label(self, node: ScAddr) -> str:
+        if node not in self.successors:
+            self.load_node(node)
+        return self.labels.get(node, '')
+
+    def load_node(self, node: ScAddr) -> None:
+        """Загружает узел, не входящий в структуру схемы, отдельными запросами, как раньше"""
+        self.store_node(node, *fetch_node(node, self.lang))
+
+    def store_node(self, node: ScAddr, successors: list[ScAddr], kind: str | None, label: str | None) -> None:
+        self.successors[node] = successors
+        if kind is not None:
+            self.kinds[node] = kind
+        if label is not None:
+            self.labels[node] = label
+
+    def expand(self, start_node: ScAddr, max_in_flight: int = 8) -> None:
+        """
+        Догружает узлы, достижимые из start_node, но не входящие в структуру схемы.
+        Обход в ширину по уровням: все незагруженные узлы уровня запрашиваются параллельно,
+        не больше max_in_flight одновременно, поэтому время зависит от глубины схемы, а не от её размера.
+        """
+        executor = None
+        frontier = [start_node]
+        seen = {start_node}
+        try:
+            while frontier:
+                missing = [node for node in frontier if node not in self.successors]
+                if len(missing) == 1:
+                    self.load_node(missing[0])
+                elif missing:
+                    if executor is None:
+                        executor = ThreadPoolExecutor(max_workers=max_in_flight)
+                    # map возвращает результаты в порядке узлов, так что содержимое графа не зависит от порядка ответов
+                    for node, fetched in zip(missing, executor.map(lambda node: fetch_node(node, self.lang), missing)):
+                        self.store_node(node, *fetched)
+
+                next_frontier = []
+                for node in frontier:
+                    for next_node in self.successors[node]:
+                        if next_node not in seen:
+                            seen.add(next_node)
+                            next_frontier.append(next_node)
+                frontier = next_frontier
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+
+def fetch_node(node: ScAddr, lang='lang_ru') -> tuple[list[ScAddr], str | None, str | None]:
+    """Переходы, вид и подпись одного узла отдельными запросами"""
+    kind = classify_elements([node], get_stage_kind_classes()).get(node)
+    return search_next_nodes(node), kind, image_sign_labels.resolve(node, fallback_languages(lang))
+
+
+def load_scheme(scheme_node: ScAddr, lang='lang_ru') -> SchemeData:
+    """
+    Загружает все переходы nrel_incidence, виды и подписи элементов структуры схемы
+    несколькими поисками по всей структуре вместо нескольких поисков на каждый узел
+    """
+    scheme = SchemeData(scheme_node, lang)
+
+    members_template = ScTemplate()
+    members_template.triple(
+        scheme_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> "node"
+    )
+    scheme.members = {result.get("node") for result in template_search(members_template)}
+    for node in scheme.members:
+        scheme.successors[node] = []
+
+    connections_template = ScTemplate()
+    connections_template.triple(
+        scheme_node,
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        sc_types.NODE_VAR >> "node"
+    )
+    connections_template.quintuple(
+        "node",
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> "connection_image_node",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
+    )
+    connections_template.quintuple(
+        "connection_image_node",
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> "next_node",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
+    )
+    for result in template_search(connections_template):
+        scheme.successors[result.get("node")].append(result.get("next_node"))
+
+    scheme.kinds = classify_elements(scheme.members, get_stage_kind_classes(), scheme_node)
+
+    # Подписи всех элементов загружаются одним поиском на всех языках, выбор - в том же порядке, что у get_idtf
+    scheme.labels.update(image_sign_labels.resolve_many(scheme.members, fallback_languages(lang)))
+
+    logging.debug(f"Scheme loaded: {len(scheme.members)} nodes, {len(scheme.labels)} labels")
+    return scheme
+
+
+def search_next_nodes(node: ScAddr) -> list[ScAddr]:
+    next_node_template = ScTemplate()
+    next_node_template.quintuple(
+        node,
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> "connection_image_node",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
+    )
+    next_node_template.quintuple(
+        "connection_image_node",
+        sc_types.EDGE_D_COMMON_VAR,
+        sc_types.NODE_VAR >> "next_node",
+        sc_types.EDGE_ACCESS_VAR_POS_PERM,
+        ScKeynodes[FindStagesListIdentifiers.NREL_INCIDENCE]
+    )
+    return [result.get("next_node") for result in template_search(next_node_template)]
+
+
+def get_idtf(node: ScAddr, lang='lang_ru'):
+    """Подпись (nrel_image_sign) на языке lang, а если её нет - на другом известном языке"""
+    description: str = image_sign_labels.resolve(node, fallback_languages(lang))
+    return description
@@ -0,0 +1,90 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+from sc_client.models import ScAddr
+
+from .scheme_cache import CompiledScheme
+
+
+def stage_key(node) -> str:
+    """Ключ этапа, не зависящий от нумерации: адрес узла в sc-памяти"""
+    return str(getattr(node, "value", node))
+
+
+def scheme_snapshot(compiled: CompiledScheme) -> dict[str, dict]:
+    """Снимок схемы: ключ этапа -> номер, вид, подпись и ключи этапов, на которые есть переход"""
+    snapshot = {}
+    for node_id in compiled.order:
+        stage = compiled.stage_dict(node_id)
+        stage["next"] = [stage_key(compiled.graph.nodes[next_id]) for next_id in compiled.graph.successors[node_id]]
+        snapshot[stage_key(compiled.graph.nodes[node_id])] = stage
+    return snapshot
+
+
+def snapshot_version(snapshot: dict[str, dict]) -> str:
+    """Токен версии - хеш содержимого снимка, поэтому неизменённая схема сохраняет версию и после перезапуска"""
+    canonical = json.dumps(snapshot, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def diff_snapshots(old: dict[str, dict], new: dict[str, dict]) -> dict:
+    """Добавленные, удалённые и изменённые (вид или подпись) этапы и добавленные и удалённые переходы"""
+    def stage_entry(key, stage):
+        return {"key": key, "id": stage["id"], "kind": stage["kind"], "label": stage["label"]}
+
+    def edges(snapshot):
+        return {(key, next_key) for key, stage in snapshot.items() for next_key in stage["next"]}
+
+    old_edges, new_edges = edges(old), edges(new)
+    return {
+        "added_stages": [stage_entry(key, stage) for key, stage in new.items() if key not in old],
+        "removed_stages": [stage_entry(key, stage) for key, stage in old.items() if key not in new],
+        "relabeled_stages": [
+            stage_entry(key, stage) for key, stage in new.items()
+            if key in old and (old[key]["kind"], old[key]["label"]) != (stage["kind"], stage["label"])
+        ],
+        "added_edges": [list(edge) for edge in sorted(new_edges - old_edges)],
+        "removed_edges": [list(edge) for edge in sorted(old_edges - new_edges)],
+    }
+
+
+class SchemeVersions:
+    """Последние снимки каждой схемы по токену версии; для сравнения хранится не больше max_versions снимков на схему"""
+
+    def __init__(self, max_versions: int = 16):
+        self.max_versions = max_versions
+        self.lock = threading.Lock()
+        self.snapshots: dict[ScAddr, OrderedDict[str, dict]] = {}
+
+    def record(self, scheme_node: ScAddr, compiled: CompiledScheme) -> tuple[str, dict[str, dict]]:
+        snapshot = scheme_snapshot(compiled)
+        version = snapshot_version(snapshot)
+        with self.lock:
+            versions = self.snapshots.setdefault(scheme_node, OrderedDict())
+            versions[version] = snapshot
+            versions.move_to_end(version)
+            while len(versions) > self.max_versions:
+                versions.popitem(last=False)
+        return version, snapshot
+
+    def get(self, scheme_node: ScAddr, version: str) -> dict[str, dict] | None:
+        with self.lock:
+            return self.snapshots.get(scheme_node, {}).get(version)
+
+    def changes_since(self, scheme_node: ScAddr, compiled: CompiledScheme, base_version: str | None) -> dict:
+        """
+        Ответ для вызывающего с токеном base_version: только изменения, если этот снимок известен,
+        иначе полный список этапов ("full": true)
+        """
+        base_snapshot = self.get(scheme_node, base_version) if base_version else None
+        version, snapshot = self.record(scheme_node, compiled)
+        if base_snapshot is None:
+            return {
+                "version": version,
+                "base_version": base_version or None,
+                "full": True,
+                "stages": [dict(stage, key=key) for key, stage in snapshot.items()],
+            }
+        return {"version": version, "base_version": base_version, "full": False, **diff_snapshots(base_snapshot, snapshot)}
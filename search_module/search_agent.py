@@ -1,19 +1,17 @@
 import logging
-from sc_client.models import ScAddr, ScTemplate
-from sc_client.constants import sc_types
-from sc_client.client import template_search
+from sc_client.models import ScAddr
 
 from sc_kpm import ScAgentClassic, ScResult
 from sc_kpm.sc_sets import ScSet
-from sc_kpm.utils import get_link_content_data
+from sc_kpm.utils import get_link_content_data, get_element_system_identifier
 from sc_kpm.utils.action_utils import (
     create_action_result,
     finish_action_with_status,
     get_action_arguments,
 )
-from sc_kpm import ScKeynodes
 
 from .search_module_idtfs import SearchModuleIdentifiers
+from .label_resolver import main_idtf_labels, fallback_languages
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s | %(name)s | %(message)s", datefmt="[%d-%b-%y %H:%M:%S]"
@@ -33,26 +31,18 @@ class SearchAgent(ScAgentClassic):
         return result
 
     def run(self, action_node: ScAddr) -> ScResult:
-        recipe, = get_action_arguments(action_node, 1)
-
-        recipe_template = ScTemplate()
-        recipe_template.triple_with_relation(
-            recipe,
-            sc_types.EDGE_D_COMMON_VAR,
-            sc_types.LINK_VAR >> 'info_link',
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            ScKeynodes['nrel_main_idtf'],
-        )
-        recipe_template.triple(
-            ScKeynodes['lang_ru'],
-            sc_types.EDGE_ACCESS_VAR_POS_PERM,
-            'info_link'
-        )
+        # Второй, необязательный аргумент - язык (например, lang_en); если идентификатора на нём нет, берётся другой
+        recipe, lang_node = get_action_arguments(action_node, 2)
 
         assert recipe.is_valid()
 
-        search_results = template_search(recipe_template)
-        info_link = search_results[0].get('info_link')
+        languages = None
+        if lang_node.is_valid():
+            languages = fallback_languages(get_element_system_identifier(lang_node))
+
+        info_link = search_main_idtf_link(recipe, languages)
+        if info_link is None:
+            return ScResult.ERROR
 
         create_action_result(action_node, info_link)
 
@@ -61,3 +51,8 @@ class SearchAgent(ScAgentClassic):
         # print(info)
 
         return ScResult.OK
+
+
+def search_main_idtf_link(recipe: ScAddr, languages: tuple[str, ...] | None = None) -> ScAddr | None:
+    """Возвращает ссылку с основным идентификатором узла на первом доступном языке из languages (по умолчанию - lang_ru, lang_en)"""
+    return main_idtf_labels.resolve_link(recipe, languages)
@@ -1,29 +1,132 @@
+import os
+from typing import Iterable
+
 from sc_kpm import ScModule
 from .search_agent import SearchAgent
+from .find_info_batch_agent import FindInfoBatchAgent
 from .find_description_agent import FindDescriptionAgent
 from .find_included_children_agent import FindIncludedChildrenAgent
 from .find_included_in_parents_agent import FindIncludedInParentsAgent
+from .find_inclusion_closure_agent import FindInclusionClosureAgent
 from .find_in_decompositions_agent import FindDecompositionsAgent
 from .find_max_class_agent import FindMaxClassAgent
 from .find_not_max_class_agent import FindNotMaxClassAgent
 from .find_key_sc_element_agent import FindKeyScElementAgent
 from .find_parent_decomposition_agent import FindParentDecompositionAgent
 from .find_stages_list_agent import FindStagesListAgent
+from .find_stages_graph_agent import FindStagesGraphAgent
+from .find_scheme_path_agent import FindSchemePathAgent
 from .call_agent import CallAgent
+from .llm_client import LLMClient
+from .async_llm_client import AsyncLLMClient
+from .llm_cache import LLMResponseCache
+from .identifier_index import IdentifierIndex
+from .scheme_cache import SchemeCache
+from .label_resolver import main_idtf_labels, image_sign_labels
+from .action_claims import ActionClaims
+from .search_module_idtfs import SearchModuleIdentifiers
+
+
+# Агенты модуля в порядке регистрации. server.py в режиме нескольких процессов распределяет их по воркерам
+AGENT_NAMES = (
+    "SearchAgent",
+    "FindInfoBatchAgent",
+    "FindDescriptionAgent",
+    "CallAgent",
+    "FindIncludedInParentsAgent",
+    "FindInclusionClosureAgent",
+    "FindDecompositionsAgent",
+    "FindIncludedChildrenAgent",
+    "FindMaxClassAgent",
+    "FindNotMaxClassAgent",
+    "FindKeyScElementAgent",
+    "FindParentDecompositionAgent",
+    "FindStagesListAgent",
+    "FindStagesGraphAgent",
+    "FindSchemePathAgent",
+)
+
+# Агенты, которым нужен общий кэш скомпилированных схем
+SCHEME_CACHE_AGENTS = {"CallAgent", "FindStagesListAgent", "FindStagesGraphAgent", "FindSchemePathAgent"}
 
 
 class SearchModule(ScModule):
-    def __init__(self):
-        super().__init__(
-            SearchAgent(),
-            FindDescriptionAgent(),
-            CallAgent(),
-            FindIncludedInParentsAgent(),
-            FindDecompositionsAgent(),
-            FindIncludedChildrenAgent(),
-            FindMaxClassAgent(),
-            FindNotMaxClassAgent(),
-            FindKeyScElementAgent(),
-            FindParentDecompositionAgent(),
-            FindStagesListAgent()
-        )
+    def __init__(self, agent_names: Iterable[str] | None = None, action_claims: ActionClaims | None = None,
+                 async_call_pipeline: bool = True):
+        """
+        agent_names - подмножество AGENT_NAMES, которое регистрирует этот модуль; по умолчанию все агенты.
+        action_claims - аренда действий CallAgent, если он запущен в нескольких экземплярах.
+        async_call_pipeline - обрабатывать запросы CallAgent в AsyncCallPipeline. Обработчик события
+        всё равно ждёт ответа в своём потоке, но поиск в базе знаний и запросы к модели выполняются асинхронно.
+        """
+        self.agent_names = set(AGENT_NAMES if agent_names is None else agent_names)
+        unknown_agent_names = self.agent_names - set(AGENT_NAMES)
+        if unknown_agent_names:
+            raise ValueError(f"Unknown agents: {', '.join(sorted(unknown_agent_names))}")
+
+        self.action_claims = action_claims
+        self.call_agent = None
+        self.identifier_index = None
+        if "CallAgent" in self.agent_names:
+            # Один клиент с пулом соединений на модуль, его разделяют все запросы CallAgent.
+            # LLM_CACHE_PATH включает хранение кэша ответов модели на диске между перезапусками.
+            self.llm_cache = LLMResponseCache(db_path=os.environ.get("LLM_CACHE_PATH"))
+            self.llm_client = LLMClient(cache=self.llm_cache)
+            # CallAgent обращается к модели асинхронно; синхронный клиент остаётся для двухэтапной маршрутизации
+            self.async_llm_client = AsyncLLMClient(cache=self.llm_cache) if async_call_pipeline else None
+            self.identifier_index = IdentifierIndex()
+        # Скомпилированные схемы общие для CallAgent и агентов схем
+        self.scheme_cache = SchemeCache() if self.agent_names & SCHEME_CACHE_AGENTS else None
+
+        agent_factories = {
+            "SearchAgent": SearchAgent,
+            "FindInfoBatchAgent": FindInfoBatchAgent,
+            "FindDescriptionAgent": FindDescriptionAgent,
+            "CallAgent": self.create_call_agent,
+            "FindIncludedInParentsAgent": FindIncludedInParentsAgent,
+            "FindInclusionClosureAgent": FindInclusionClosureAgent,
+            "FindDecompositionsAgent": FindDecompositionsAgent,
+            "FindIncludedChildrenAgent": FindIncludedChildrenAgent,
+            "FindMaxClassAgent": FindMaxClassAgent,
+            "FindNotMaxClassAgent": FindNotMaxClassAgent,
+            "FindKeyScElementAgent": FindKeyScElementAgent,
+            "FindParentDecompositionAgent": FindParentDecompositionAgent,
+            "FindStagesListAgent": lambda: FindStagesListAgent(self.scheme_cache),
+            "FindStagesGraphAgent": lambda: FindStagesGraphAgent(self.scheme_cache),
+            "FindSchemePathAgent": lambda: FindSchemePathAgent(self.scheme_cache),
+        }
+        super().__init__(*(agent_factories[name]() for name in AGENT_NAMES if name in self.agent_names))
+
+    def create_call_agent(self) -> CallAgent:
+        self.call_agent = CallAgent(
+            self.llm_client, identifier_index=self.identifier_index, scheme_cache=self.scheme_cache,
+            async_llm_client=self.async_llm_client, action_claims=self.action_claims)
+        return self.call_agent
+
+    def _register(self) -> None:
+        super()._register()
+        # Подписи узлов кэшируются в каждом процессе, поэтому каждый процесс сам следит за их изменениями
+        main_idtf_labels.subscribe()
+        image_sign_labels.subscribe()
+        if self.identifier_index is not None:
+            # Индекс идентификаторов строится один раз при регистрации и дальше обновляется по sc-событиям
+            self.identifier_index.subscribe()
+            self.identifier_index.build()
+        if self.scheme_cache is not None:
+            self.scheme_cache.subscribe()
+        if self.call_agent is not None and self.action_claims is not None:
+            # Действия экземпляров, завершившихся посреди обработки, перехватываются после истечения аренды
+            self.action_claims.start_reclaim(SearchModuleIdentifiers.ACTION_CALL_AGENT, self.call_agent.process_action)
+
+    def _unregister(self) -> None:
+        if self.action_claims is not None:
+            self.action_claims.stop_reclaim()
+        if self.identifier_index is not None:
+            self.identifier_index.unsubscribe()
+        if self.scheme_cache is not None:
+            self.scheme_cache.unsubscribe()
+        main_idtf_labels.unsubscribe()
+        image_sign_labels.unsubscribe()
+        super()._unregister()
+        if self.call_agent is not None and self.call_agent.async_pipeline is not None:
+            self.call_agent.async_pipeline.close()
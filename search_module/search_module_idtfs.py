@@ -10,10 +10,26 @@ class SearchModuleIdentifiers:
     ACTION_FIND_DESCRIPTION: Idtf = "action_find_description"
     ACTION_FIND_INCLUDED_CHILDREN: Idtf = "action_find_included_children"
     ACTION_FIND_INFO: Idtf = "action_find_info"
+    ACTION_FIND_INFO_BATCH: Idtf = "action_find_info_batch"
     ACTION_FIND_INCLUDED_IN_PARENTS: Idtf = "action_find_included_in_parents"
+    ACTION_FIND_INCLUSION_CLOSURE: Idtf = "action_find_inclusion_closure"
     ACTION_FIND_IN_DECOMPOSITIONS: Idtf = "action_find_in_decompositions"
     ACTION_FIND_MAX_CLASS: Idtf = "action_find_max_class"
     ACTION_FIND_NOT_MAX_CLASS: Idtf = "action_find_not_max_class"
     ACTION_FIND_KEY_SC_ELEMENT: Idtf = "action_find_key_sc_element"
     ACTION_FIND_PARENT_DECOMPOSITION: Idtf = "action_find_parent_decomposition"
     ACTION_FIND_STAGES_LIST: Idtf = "action_find_stages_list"   
+    ACTION_FIND_STAGES_GRAPH: Idtf = "action_find_stages_graph"
+    ACTION_FIND_SCHEME_PATH: Idtf = "action_find_scheme_path"
+    NREL_ACTION_CLAIM: Idtf = "nrel_action_claim"
+
+
+@dataclass(frozen=True)
+class FindStagesListIdentifiers:
+    PROCEDURE_STARTING_IMAGE: Idtf = "procedure_starting_image"
+    CHOICE_OF_EXECUTION_SEQUENCE_IMAGE: Idtf = "choice_of_execution_sequence_image"
+    OPERATION_IMAGE: Idtf = "operation_image"
+    PROCEDURE_FINISHING_IMAGE: Idtf = "procedure_finishing_image"
+    TRANSITION_CONDITION_IMAGE: Idtf = "transition_condition_image"
+    NREL_INCIDENCE: Idtf = "nrel_incidence"
+    NREL_IMAGE_SIGN: Idtf = "nrel_image_sign"
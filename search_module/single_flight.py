@@ -0,0 +1,66 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Callable, Hashable
+
+
+class SingleFlight:
+    """
+    Объединение одновременных одинаковых вычислений: пока вычисление по ключу выполняется, остальные вызовы
+    с тем же ключом не запускают своё, а ждут его результата (или исключения).
+    Можно использовать и из потоков (do), и из корутин (do_async); ожидающие корутины не блокируют event loop.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight: dict[Hashable, Future] = {}
+        self.shared_calls = 0
+
+    def do(self, key: Hashable, function: Callable[[], object]) -> tuple[object, bool]:
+        """Возвращает (результат, joined); joined - результат получен от уже выполнявшегося вычисления"""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return future.result(), True
+        try:
+            result = function()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    async def do_async(self, key: Hashable, coroutine_function: Callable[[], Awaitable[object]]) -> tuple[object, bool]:
+        """Асинхронный аналог do"""
+        future, is_leader = self._join(key)
+        if not is_leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            result = await coroutine_function()
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result)
+        return result, False
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"in_flight": len(self.in_flight), "shared_calls": self.shared_calls}
+
+    def _join(self, key: Hashable) -> tuple[Future, bool]:
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.shared_calls += 1
+                return future, False
+            future = Future()
+            self.in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, result=None, error: BaseException | None = None) -> None:
+        # Ключ снимается до выдачи результата: следующий запрос после этого момента вычисляется заново
+        with self.lock:
+            self.in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
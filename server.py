@@ -29,8 +29,13 @@ SC_SERVER_HOST_DEFAULT = "localhost"
 SC_SERVER_PORT_DEFAULT = "8090"
 
 import argparse
+import logging
+import multiprocessing
+import signal
 from sc_kpm import ScServer
 from search_module import SearchModule
+from search_module.search_module import AGENT_NAMES
+from search_module.action_claims import ActionClaims, ScActionClaimStore, SqliteActionClaimStore
 
 
 from pathlib import Path
@@ -42,21 +47,99 @@ SC_SERVER_PORT = "port"
 SC_SERVER_PROTOCOL_DEFAULT = "ws"
 SC_SERVER_HOST_DEFAULT = "localhost"
 SC_SERVER_PORT_DEFAULT = "8090"
-
-
-def main(args: dict):
+SC_SERVER_WORKERS = "workers"
+SC_SERVER_SHARDS = "shards"
+SC_SERVER_CLAIMS = "claims"
+SC_SERVER_ASYNC_PIPELINE = "async_pipeline"
+
+SC_SERVER_WORKERS_DEFAULT = 1
+
+# Агенты, которые при аренде действий (--claims) могут работать в нескольких экземплярах
+REPLICABLE_AGENTS = ("CallAgent",)
+
+
+def build_shards(workers: int, shards_spec: str | None, replicable_agents=()) -> list[list[str] | None]:
+    """
+    Распределяет агентов SearchModule по процессам-воркерам. Каждый агент, кроме replicable_agents, должен работать
+    ровно в одном процессе, иначе на одно действие отреагирует несколько его копий.
+    shards_spec - агенты воркеров через ";", агенты одного воркера через ",", например
+    "CallAgent;SearchAgent,FindInfoBatchAgent,...". Без него CallAgent получает отдельный процесс,
+    а остальные агенты распределяются по остальным воркерам по очереди.
+    """
+    if shards_spec:
+        shards = [[name.strip() for name in shard.split(",") if name.strip()] for shard in shards_spec.split(";")]
+        if workers not in (SC_SERVER_WORKERS_DEFAULT, len(shards)):
+            raise ValueError(f"--shards describes {len(shards)} workers, but --workers is {workers}")
+        assigned = [name for shard in shards for name in shard]
+        unknown = sorted(set(assigned) - set(AGENT_NAMES))
+        if unknown:
+            raise ValueError(f"Unknown agents in --shards: {', '.join(unknown)}")
+        duplicated = sorted({
+            name for name in assigned if assigned.count(name) > 1 and name not in replicable_agents})
+        if duplicated:
+            raise ValueError(f"Agents assigned to several workers: {', '.join(duplicated)}")
+        missing = [name for name in AGENT_NAMES if name not in assigned]
+        if missing:
+            logging.getLogger(__name__).warning("Agents not assigned to any worker: %s", ", ".join(missing))
+        return shards
+
+    if workers <= 1:
+        return [None]
+    shards = [["CallAgent"]] + [[] for _ in range(workers - 1)]
+    other_agents = [name for name in AGENT_NAMES if name != "CallAgent"]
+    for i, name in enumerate(other_agents):
+        shards[1 + i % (workers - 1)].append(name)
+    return shards
+
+
+def create_action_claims(claims_spec: str | None) -> ActionClaims | None:
+    """--claims: "sc" - заявки в sc-памяти, "sqlite:ПУТЬ" - в файле SQLite для процессов на одной машине"""
+    if not claims_spec:
+        return None
+    if claims_spec == "sc":
+        return ActionClaims(ScActionClaimStore())
+    if claims_spec.startswith("sqlite:"):
+        return ActionClaims(SqliteActionClaimStore(claims_spec[len("sqlite:"):]))
+    raise ValueError(f"Unknown claim store: {claims_spec}")
+
+
+def serve_worker(args: dict, agent_names: list[str] | None = None):
+    """Подключается к sc-серверу и обслуживает агентов agent_names (по умолчанию - всех) до SIGINT"""
     server = ScServer(
         f"{args[SC_SERVER_PROTOCOL]}://{args[SC_SERVER_HOST]}:{args[SC_SERVER_PORT]}")
 
     with server.connect():
         modules = [
-            SearchModule()
+            SearchModule(agent_names, create_action_claims(args[SC_SERVER_CLAIMS]), args[SC_SERVER_ASYNC_PIPELINE])
         ]
         server.add_modules(*modules)
         with server.register_modules():
             server.serve()
 
 
+def main(args: dict):
+    replicable_agents = REPLICABLE_AGENTS if args[SC_SERVER_CLAIMS] else ()
+    shards = build_shards(args[SC_SERVER_WORKERS], args[SC_SERVER_SHARDS], replicable_agents)
+    if len(shards) == 1:
+        serve_worker(args, shards[0])
+        return
+
+    # У каждого воркера своё подключение к sc-серверу и свой интерпретатор, поэтому агенты не делят один GIL
+    context = multiprocessing.get_context("spawn")
+    workers = [
+        context.Process(target=serve_worker, args=(args, shard), name=f"search-worker-{i}")
+        for i, shard in enumerate(shards)
+    ]
+    for worker, shard in zip(workers, shards):
+        worker.start()
+        logging.getLogger(__name__).info("Started %s (pid %d): %s", worker.name, worker.pid, ", ".join(shard))
+
+    # ^C получают все процессы группы: воркеры сами снимают регистрацию агентов, основной процесс их дожидается
+    signal.signal(signal.SIGINT, lambda *_: None)
+    for worker in workers:
+        worker.join()
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument(
@@ -65,6 +148,18 @@ if __name__ == '__main__':
         '--host', type=str, dest=SC_SERVER_HOST, default=SC_SERVER_HOST_DEFAULT, help="Sc-server host")
     parser.add_argument(
         '--port', type=int, dest=SC_SERVER_PORT, default=SC_SERVER_PORT_DEFAULT, help="Sc-server port")
+    parser.add_argument(
+        '--workers', type=int, dest=SC_SERVER_WORKERS, default=SC_SERVER_WORKERS_DEFAULT,
+        help="Number of worker processes, each with its own sc-server connection")
+    parser.add_argument(
+        '--shards', type=str, dest=SC_SERVER_SHARDS, default=None,
+        help="Agents per worker: workers separated by ';', agents by ',' (e.g. 'CallAgent;SearchAgent,...')")
+    parser.add_argument(
+        '--claims', type=str, dest=SC_SERVER_CLAIMS, default=None,
+        help="Claim CallAgent actions so that several instances can serve them: 'sc' or 'sqlite:PATH'")
+    parser.add_argument(
+        '--no-async-pipeline', dest=SC_SERVER_ASYNC_PIPELINE, action='store_false',
+        help="Process CallAgent queries synchronously instead of in the asyncio pipeline")
     args = parser.parse_args()
 
     main(vars(args))
\ No newline at end of file
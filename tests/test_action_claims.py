@@ -0,0 +1,29 @@
+import pytest
+
+from sc_client.models import ScAddr
+
+from search_module import action_claims
+from search_module.action_claims import ActionClaimStore, ScActionClaimStore
+from search_module.search_module_idtfs import SearchModuleIdentifiers
+
+
+def test_claim_store_is_abstract():
+    with pytest.raises(TypeError):
+        ActionClaimStore()
+
+
+def test_colliding_claim_is_kept_after_last_attempt(monkeypatch):
+    store = ScActionClaimStore(max_attempts=3, backoff=0)
+    links = iter(ScAddr(link) for link in range(100, 200))
+    erased = []
+    monkeypatch.setattr(action_claims, "generate_link", lambda content: next(links))
+    monkeypatch.setattr(action_claims, "generate_non_role_relation", lambda *elements: None)
+    monkeypatch.setattr(action_claims, "erase_elements", lambda *elements: erased.extend(elements))
+    monkeypatch.setattr(action_claims, "ScKeynodes", {SearchModuleIdentifiers.NREL_ACTION_CLAIM: ScAddr(1)})
+    # Перед записью чужих заявок нет, после записи каждый раз видна заявка другого экземпляра
+    checks = iter([False, True] * store.max_attempts)
+    monkeypatch.setattr(store, "_has_other_live_claims", lambda action, owner, now: next(checks))
+
+    assert not store.try_claim(ScAddr(10), "owner", 0.0)
+    # Заявки первых попыток сняты, заявка последней оставлена до истечения аренды
+    assert erased == [ScAddr(100), ScAddr(101)]
@@ -0,0 +1,172 @@
+import time
+import logging
+import threading
+
+import pytest
+
+from sc_client.models import ScAddr
+from sc_kpm import ScResult
+
+from search_module import call_agent as call_agent_module
+from search_module.answer_renderer import PreparedAnswer
+from search_module.call_agent import CallAgent
+from search_module.single_flight import SingleFlight
+
+
+def make_call_agent():
+    # Конструктор ScAgentClassic обращается к sc-серверу, поэтому агент создаётся без него
+    call_agent = CallAgent.__new__(CallAgent)
+    call_agent.logger = logging.getLogger(CallAgent.__name__)
+    return call_agent
+
+
+def test_call_agent_get_result_items_uses_found_node(monkeypatch):
+    call_agent = make_call_agent()
+    node = ScAddr(5)
+    searched = []
+    monkeypatch.setattr(call_agent, "find_entity_by_name", lambda entity_name, action_node, entity_node=None: node, raising=False)
+    monkeypatch.setattr(
+        call_agent, "search_result_items",
+        lambda entity_name, found_node, action_node, action_agent: searched.append(found_node) or ["элемент"],
+        raising=False)
+
+    assert call_agent.call_agent_get_result_items("рецепт", ScAddr(1), "action_find_included_children") == ["элемент"]
+    assert searched == [node]
+
+
+def test_call_agent_get_result_items_without_node(monkeypatch):
+    call_agent = make_call_agent()
+    monkeypatch.setattr(
+        call_agent, "find_entity_by_name", lambda entity_name, action_node, entity_node=None: ScResult.ERROR, raising=False)
+
+    assert call_agent.call_agent_get_result_items("рецепт", ScAddr(1), "action_find_included_children") is None
+
+
+def test_call_agents_get_result_items_uses_found_node(monkeypatch):
+    call_agent = make_call_agent()
+    call_agent.query_max_in_flight = 2
+    node = ScAddr(5)
+    monkeypatch.setattr(call_agent, "find_entity_by_name", lambda entity_name, action_node, entity_node=None: node, raising=False)
+    monkeypatch.setattr(
+        call_agent, "search_result_items",
+        lambda entity_name, found_node, action_node, action_agent: [action_agent, found_node.value], raising=False)
+
+    assert call_agent.call_agents_get_result_items("рецепт", ScAddr(1), ["children", "parents"]) == [
+        ["children", 5], ["parents", 5]]
+
+
+def test_prepare_schemes_and_processes_answer_uses_found_node(monkeypatch):
+    call_agent = make_call_agent()
+    call_agent.scheme_cache = None
+    node = ScAddr(5)
+    monkeypatch.setattr(call_agent, "find_entity_by_name", lambda entity_name, action_node, entity_node=None: node, raising=False)
+    monkeypatch.setattr(
+        call_agent_module, "build_stages_graph", lambda scheme_node, scheme_cache: {"scheme": scheme_node.value})
+    monkeypatch.setattr(call_agent_module, "stages_graph_to_json", lambda stages_graph: str(stages_graph))
+
+    prepared_answer = call_agent.prepare_schemes_and_processes_answer(
+        ScAddr(1), "этапы схемы", "scheme_steps_needed", "схема")
+    assert isinstance(prepared_answer, PreparedAnswer)
+    assert "{'scheme': 5}" in prepared_answer.prompt
+
+
+def test_prepare_description_answer_without_node(monkeypatch):
+    call_agent = make_call_agent()
+    monkeypatch.setattr(
+        call_agent, "find_entity_by_name", lambda entity_name, action_node, entity_node=None: ScResult.ERROR, raising=False)
+    monkeypatch.setattr(call_agent_module, "search_description_link", lambda node: pytest.fail("поиск без узла"))
+
+    assert call_agent.prepare_description_and_characteristics_answer(
+        ScAddr(1), "что такое рецепт", "description_needed", "рецепт") == ScResult.ERROR
+
+
+def test_answer_route_looks_up_entity_once(monkeypatch):
+    call_agent = make_call_agent()
+    call_agent.answer_flights = SingleFlight()
+    node = ScAddr(5)
+    lookups = []
+    prepared_nodes = []
+    monkeypatch.setattr(
+        call_agent, "lookup_entity_node", lambda entity_name: lookups.append(entity_name) or node, raising=False)
+    monkeypatch.setattr(
+        call_agent, "prepare_route_answer",
+        lambda action_node, link_query, area, decision, entity_name, entity_node: prepared_nodes.append(entity_node)
+        or PreparedAnswer(text="ответ"),
+        raising=False)
+    monkeypatch.setattr(call_agent, "send_answer", lambda action_node, answer: answer, raising=False)
+
+    assert call_agent.answer_route(
+        ScAddr(1), "дочерние элементы рецепта", None, "Структура и Иерархия", "children_needed", "рецепт") == (
+        ScResult.OK, "ответ")
+    assert lookups == ["рецепт"]
+    assert prepared_nodes == [node]
+
+
+def test_joined_query_shares_two_stage_answer(monkeypatch):
+    call_agent = make_call_agent()
+    call_agent.async_pipeline = None
+    call_agent.llm_client = None
+    call_agent.fast_path_routing = False
+    call_agent.single_shot_routing = False
+    call_agent.query_flights = SingleFlight()
+    monkeypatch.setattr(call_agent_module, "get_action_arguments", lambda action_node, count: [action_node])
+    monkeypatch.setattr(call_agent_module, "get_link_content_data", lambda link: "Как приготовить борщ?")
+
+    two_stage_calls = []
+
+    def run_two_stage_routing(action_node, link_query, llm_client):
+        two_stage_calls.append(action_node)
+        # Ведущий запрос ждёт, пока к нему присоединится второй
+        while call_agent.query_flights.stats()["shared_calls"] == 0:
+            time.sleep(0.01)
+        return ScResult.OK, "ответ"
+
+    sent_answers = []
+    monkeypatch.setattr(call_agent, "run_two_stage_routing", run_two_stage_routing, raising=False)
+    monkeypatch.setattr(
+        call_agent, "send_answer", lambda action_node, answer: sent_answers.append((action_node, answer)),
+        raising=False)
+
+    results = {}
+    threads = [
+        threading.Thread(target=lambda action: results.setdefault(action, call_agent.run(ScAddr(action))), args=(action,))
+        for action in (1, 2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert results == {1: ScResult.OK, 2: ScResult.OK}
+    assert len(two_stage_calls) == 1
+    assert len(sent_answers) == 1 and sent_answers[0][1] == "ответ"
+
+
+def test_different_scheme_questions_are_not_coalesced(monkeypatch):
+    call_agent = make_call_agent()
+    call_agent.answer_flights = SingleFlight()
+    monkeypatch.setattr(call_agent, "lookup_entity_node", lambda entity_name: ScAddr(5), raising=False)
+    both_preparing = threading.Barrier(2, timeout=5)
+
+    def prepare_route_answer(action_node, link_query, area, decision, entity_name, entity_node):
+        # Оба запроса готовят ответ одновременно; объединённый запрос сюда бы не попал
+        both_preparing.wait()
+        return PreparedAnswer(text=f"ответ на '{link_query}'")
+
+    monkeypatch.setattr(call_agent, "prepare_route_answer", prepare_route_answer, raising=False)
+    monkeypatch.setattr(call_agent, "send_answer", lambda action_node, answer: answer, raising=False)
+
+    questions = {1: "Какие этапы у схемы?", 2: "Какой этап идёт после фильтрации?"}
+    results = {}
+    threads = [
+        threading.Thread(target=lambda action: results.setdefault(action, call_agent.answer_route(
+            ScAddr(action), questions[action], None, "Схемы и Процессы", "scheme_steps_needed", "схема")),
+            args=(action,))
+        for action in questions
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == {action: (ScResult.OK, f"ответ на '{question}'") for action, question in questions.items()}
@@ -0,0 +1,27 @@
+from types import SimpleNamespace
+
+from sc_client.models import ScAddr
+
+from search_module import find_info_batch_agent, label_resolver
+from search_module.label_resolver import LabelResolver
+from search_module.find_info_batch_agent import search_elements_main_idtf_links
+
+
+def test_main_idtf_links_fall_back_to_other_languages(monkeypatch):
+    resolver = LabelResolver("nrel_main_idtf")
+    # У первого элемента есть подписи на обоих языках, у второго - только на английском, у третьего - нет
+    found_links = {
+        (ScAddr(1), "lang_ru"): ScAddr(11),
+        (ScAddr(1), "lang_en"): ScAddr(12),
+        (ScAddr(2), "lang_en"): ScAddr(22),
+    }
+    monkeypatch.setattr(resolver, "_search_links", lambda node, is_set=False: found_links)
+    monkeypatch.setattr(label_resolver, "ScSet", lambda *elements: SimpleNamespace(set_node=ScAddr(100)))
+    monkeypatch.setattr(label_resolver, "delete_elements", lambda *elements: None)
+    monkeypatch.setattr(
+        label_resolver, "get_link_content", lambda *links: [SimpleNamespace(data=f"label {link.value}") for link in links])
+    monkeypatch.setattr(find_info_batch_agent, "main_idtf_labels", resolver)
+
+    assert search_elements_main_idtf_links([ScAddr(1), ScAddr(2), ScAddr(3)]) == {
+        ScAddr(1): ScAddr(11), ScAddr(2): ScAddr(22)}
+    assert search_elements_main_idtf_links([ScAddr(1)], ("lang_en", "lang_ru")) == {ScAddr(1): ScAddr(12)}
@@ -0,0 +1,67 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sc_client.models import ScAddr
+
+from search_module import label_resolver
+from search_module.label_resolver import LabelResolver
+
+
+def make_resolver(monkeypatch, contents, max_size=100):
+    """Подписи узла n - ссылка 10 * n на русском; содержимое ссылок берётся из contents"""
+    resolver = LabelResolver("nrel_main_idtf", max_size=max_size)
+    subscriptions = {}
+    monkeypatch.setattr(
+        resolver, "_search_links", lambda node, is_set=False: {(node, "lang_ru"): ScAddr(node.value * 10)})
+    monkeypatch.setattr(
+        label_resolver, "get_link_content", lambda *links: [SimpleNamespace(data=contents[link]) for link in links])
+    monkeypatch.setattr(label_resolver, "ScKeynodes", defaultdict(lambda: ScAddr(999)))
+    monkeypatch.setattr(
+        label_resolver, "create_elementary_event_subscriptions",
+        lambda *params: [subscriptions.setdefault(params_item.addr, object()) for params_item in params])
+    monkeypatch.setattr(
+        label_resolver, "destroy_elementary_event_subscriptions",
+        lambda *destroyed: [subscriptions.pop(link) for link, subscription in list(subscriptions.items())
+                            if subscription in destroyed])
+    resolver.subscribe()
+    return resolver, subscriptions
+
+
+def test_changed_link_content_is_reloaded(monkeypatch):
+    contents = {ScAddr(10): "рецепт"}
+    resolver, subscriptions = make_resolver(monkeypatch, contents)
+
+    assert resolver.resolve(ScAddr(1)) == "рецепт"
+    assert ScAddr(10) in subscriptions
+    contents[ScAddr(10)] = "рецепт борща"
+    resolver._on_link_changed(ScAddr(10), ScAddr(0), ScAddr(0))
+    assert resolver.resolve(ScAddr(1)) == "рецепт борща"
+
+
+def test_labels_changed_during_load_are_not_kept(monkeypatch):
+    contents = {ScAddr(10): "рецепт"}
+    resolver, subscriptions = make_resolver(monkeypatch, contents)
+    read_content = label_resolver.get_link_content
+
+    def get_link_content(*links):
+        # Подпись меняется, пока её содержимое читается
+        result = read_content(*links)
+        resolver._on_link_changed(ScAddr(10), ScAddr(0), ScAddr(0))
+        return result
+
+    monkeypatch.setattr(label_resolver, "get_link_content", get_link_content)
+    assert resolver.resolve(ScAddr(1)) == "рецепт"
+    assert ScAddr(1) not in resolver.labels
+    assert ScAddr(10) not in subscriptions
+
+
+def test_least_recently_used_labels_are_evicted(monkeypatch):
+    contents = {ScAddr(10): "один", ScAddr(20): "два", ScAddr(30): "три"}
+    resolver, subscriptions = make_resolver(monkeypatch, contents, max_size=2)
+
+    resolver.resolve(ScAddr(1))
+    resolver.resolve(ScAddr(2))
+    resolver.resolve(ScAddr(1))
+    resolver.resolve(ScAddr(3))
+    assert list(resolver.labels) == [ScAddr(1), ScAddr(3)]
+    assert set(subscriptions) - {ScAddr(999)} == {ScAddr(10), ScAddr(30)}
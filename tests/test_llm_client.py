@@ -0,0 +1,104 @@
+import json
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+
+from search_module.async_llm_client import AsyncLLMClient
+from search_module.llm_client import LLMClient
+
+
+class ChatCompletionsHandler(BaseHTTPRequestHandler):
+    """Локальная замена chat-completions API: отвечает ответами из очереди server.responses"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append((self.headers["Authorization"], payload))
+        status, content_type, body = self.server.responses.pop(0)
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if status == 503:
+            self.send_header("Retry-After", "0")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def llm_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ChatCompletionsHandler)
+    server.requests = []
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def chat_response(content):
+    return 200, "application/json", json.dumps({"choices": [{"message": {"content": content}}]}).encode("utf-8")
+
+
+def make_client(server, **kwargs):
+    return LLMClient(api_key="test-key", base_url=f"http://127.0.0.1:{server.server_port}/v1", **kwargs)
+
+
+def test_chat(llm_server):
+    llm_server.responses.append(chat_response("Ответ модели"))
+    client = make_client(llm_server)
+
+    assert client.chat("Вопрос") == "Ответ модели"
+    authorization, payload = llm_server.requests[0]
+    assert authorization == "Bearer test-key"
+    assert payload["messages"] == [{"role": "user", "content": "Вопрос"}]
+
+
+def test_chat_retries_unavailable_server(llm_server):
+    llm_server.responses.extend([(503, "text/plain", b"busy"), chat_response("Ответ модели")])
+    client = make_client(llm_server, backoff_factor=0)
+
+    assert client.chat("Вопрос") == "Ответ модели"
+    assert len(llm_server.requests) == 2
+
+
+@pytest.mark.parametrize("client_class", [LLMClient, AsyncLLMClient])
+def test_missing_api_key(monkeypatch, client_class):
+    monkeypatch.delenv("TOGETHER_AI_API_KEY", raising=False)
+
+    with pytest.raises(ValueError, match="TOGETHER_AI_API_KEY"):
+        client_class()
+
+
+def test_stream_chat_decodes_utf8_without_charset(llm_server):
+    events = [{"choices": [{"delta": {"content": token}}]} for token in ("Этапы", " схемы")]
+    body = "".join(f"data: {json.dumps(event, ensure_ascii=False)}\n\n" for event in events) + "data: [DONE]\n\n"
+    llm_server.responses.append((200, "text/event-stream", body.encode("utf-8")))
+    client = make_client(llm_server)
+
+    assert list(client.stream_chat("Вопрос")) == ["Этапы", " схемы"]
+
+
+def test_async_chat_releases_connection_after_error(llm_server):
+    llm_server.responses.extend([(404, "text/plain", b"not found"), chat_response("Ответ модели")])
+    client = AsyncLLMClient(
+        api_key="test-key", base_url=f"http://127.0.0.1:{llm_server.server_port}/v1", pool_size=1, max_retries=0)
+
+    async def chat_twice():
+        try:
+            # Ошибка хранится, пока выполняется второй запрос, поэтому ответ не освобождается сборщиком мусора
+            with pytest.raises(aiohttp.ClientResponseError) as error_info:
+                await client.chat("Вопрос")
+            # Единственное соединение пула должно вернуться в пул после ошибки
+            answer = await asyncio.wait_for(client.chat("Вопрос"), timeout=2)
+            assert error_info.value.status == 404
+            return answer
+        finally:
+            await client.close()
+
+    assert asyncio.run(chat_twice()) == "Ответ модели"
@@ -0,0 +1,51 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sc_client.models import ScAddr
+
+from search_module import label_resolver, scheme_cache
+from search_module.label_resolver import LabelResolver
+from search_module.scheme_cache import SchemeCache
+
+
+def make_scheme_cache(monkeypatch):
+    """Схема 50 из одного этапа 1, подписанного ссылкой 10"""
+    resolver = LabelResolver("nrel_image_sign")
+    monkeypatch.setattr(resolver, "_search_links", lambda node, is_set=False: {(ScAddr(1), "lang_ru"): ScAddr(10)})
+    monkeypatch.setattr(
+        label_resolver, "get_link_content", lambda *links: [SimpleNamespace(data="фильтрация") for link in links])
+    monkeypatch.setattr(label_resolver, "ScKeynodes", defaultdict(lambda: ScAddr(999)))
+    monkeypatch.setattr(scheme_cache, "image_sign_labels", resolver)
+    subscribed = []
+    monkeypatch.setattr(
+        scheme_cache, "create_elementary_event_subscriptions",
+        lambda *params: [subscribed.append(params_item.addr) for params_item in params])
+    return SchemeCache(), resolver, subscribed
+
+
+def compile_scheme(scheme_node):
+    return SimpleNamespace(scheme=SimpleNamespace(members={ScAddr(1)}))
+
+
+def test_changed_stage_label_invalidates_scheme(monkeypatch):
+    cache, resolver, subscribed = make_scheme_cache(monkeypatch)
+
+    compiled = cache.get(ScAddr(50), compile_scheme)
+    assert cache.get(ScAddr(50), compile_scheme) is compiled
+    assert ScAddr(10) in subscribed
+
+    cache._on_label_changed(ScAddr(10), ScAddr(0), ScAddr(0))
+    assert ScAddr(1) not in resolver.labels
+    assert cache.get(ScAddr(50), compile_scheme) is not compiled
+
+
+def test_scheme_with_label_changed_during_compile_is_not_kept(monkeypatch):
+    cache, resolver, subscribed = make_scheme_cache(monkeypatch)
+
+    def compile_changed_scheme(scheme_node):
+        # Подпись меняется до того, как кэш подписался на её ссылку
+        resolver.invalidate(ScAddr(1))
+        return compile_scheme(scheme_node)
+
+    compiled = cache.get(ScAddr(50), compile_changed_scheme)
+    assert cache.get(ScAddr(50), compile_scheme) is not compiled
@@ -0,0 +1,32 @@
+from collections import defaultdict
+from types import SimpleNamespace
+
+from sc_client.models import ScAddr
+
+from search_module import label_resolver, scheme_loader
+from search_module.label_resolver import LabelResolver
+from search_module.scheme_loader import load_scheme
+
+
+def test_load_scheme_labels_fall_back_to_other_languages(monkeypatch):
+    resolver = LabelResolver("nrel_image_sign")
+    # Этап 1 подписан на обоих языках, этап 2 - только на английском
+    found_links = {
+        (ScAddr(1), "lang_ru"): ScAddr(11),
+        (ScAddr(1), "lang_en"): ScAddr(12),
+        (ScAddr(2), "lang_en"): ScAddr(22),
+    }
+    monkeypatch.setattr(resolver, "_search_links", lambda node, is_set=False: found_links)
+    monkeypatch.setattr(label_resolver, "ScSet", lambda *elements: SimpleNamespace(set_node=ScAddr(100)))
+    monkeypatch.setattr(label_resolver, "delete_elements", lambda *elements: None)
+    monkeypatch.setattr(
+        label_resolver, "get_link_content", lambda *links: [SimpleNamespace(data=f"label {link.value}") for link in links])
+    monkeypatch.setattr(scheme_loader, "image_sign_labels", resolver)
+    monkeypatch.setattr(scheme_loader, "ScKeynodes", defaultdict(lambda: ScAddr(999)))
+    monkeypatch.setattr(scheme_loader, "classify_elements", lambda nodes, classes, scheme_node=None: {})
+    # Первый поиск - элементы схемы, второй - переходы между ними
+    search_results = iter([[{"node": ScAddr(1)}, {"node": ScAddr(2)}], []])
+    monkeypatch.setattr(scheme_loader, "template_search", lambda template: next(search_results))
+
+    scheme = load_scheme(ScAddr(50))
+    assert scheme.labels == {ScAddr(1): "label 11", ScAddr(2): "label 22"}